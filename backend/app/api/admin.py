@@ -1,23 +1,40 @@
-from fastapi import APIRouter, HTTPException, Depends, status, Body
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Depends, status, Body, Header, Query, Request, Response
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from fastapi.security import OAuth2PasswordRequestForm
-from typing import Dict, Any, List
-from datetime import timedelta
+from pydantic import ValidationError
+from typing import Dict, Any, List, Optional
+from datetime import date, timedelta
 import uuid
 
+from app.api.http_cache import if_match_satisfied
+from app.api.ndjson import NDJSON_MEDIA_TYPE, ndjson_chunks, ndjson_lines
 from app.models.exhibition import Exhibition
+from app.services.admission import registration_admission
 from app.services.json_storage import json_storage_service
-from app.services.google_sheets import google_sheets_service
-from app.services.auth import authenticate_user, create_access_token, verify_admin
+from app.services.executor import STORAGE, blocking_io
+from app.services.images import image_service
+from app.services.profiling import profile_store
+from app.services.registration_queue import registration_worker
+from app.services.registration_store import registration_store
+from app.services.sheets_writer import sheets_batch_writer
+from app.services.auth import authenticate_user, create_access_token, oauth2_scheme, revoke_token, verify_admin
 
 router = APIRouter()
+# Routes reachable without a token (included without the admin dependency)
+login_router = APIRouter()
 
+# Exhibitions validated and written together during an import
+IMPORT_BATCH_SIZE = 500
+# Line errors listed in an import report
+MAX_REPORTED_ERRORS = 100
 
-@router.post("/token")
+
+@login_router.post("/token")
 async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
     """
     Authenticate admin user and generate access token
     """
-    user = authenticate_user(form_data.username, form_data.password)
+    user = await authenticate_user(form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -35,12 +52,108 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
     return {"access_token": access_token, "token_type": "bearer"}
 
 
+@router.post("/logout", status_code=204)
+async def logout(token: str = Depends(oauth2_scheme)):
+    """
+    Revoke the access token the request was made with
+    
+    Revocations are shared by every worker process until the token expires.
+    """
+    await revoke_token(token)
+
+
 @router.get("/registrations", response_model=List[Dict[str, Any]])
-async def get_all_registrations(_: Dict[str, Any] = Depends(verify_admin)):
+async def get_all_registrations(
+    response: Response,
+    status_filter: Optional[str] = Query(None, alias="status"),
+    email: Optional[str] = None,
+    submitted_from: Optional[str] = None,
+    submitted_to: Optional[str] = None,
+    sort: str = "-submitted_at",
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    _: Dict[str, Any] = Depends(verify_admin)
+):
+    """
+    Get artist registrations from the local mirror of the Google Sheet
+    
+    The mirror pulls new sheet rows when it is older than the sync interval.
+    The total number of matches is returned in the X-Total-Count header.
+    """
+    try:
+        await registration_store.sync_if_stale()
+    except Exception as e:
+        # Serve the last synced state rather than failing the request
+        print(f"Error syncing registrations from Google Sheets: {e}")
+    
+    try:
+        registrations, total = await blocking_io.run(
+            STORAGE,
+            registration_store.search,
+            status=status_filter,
+            email=email,
+            submitted_from=submitted_from,
+            submitted_to=submitted_to,
+            sort=sort,
+            limit=limit,
+            offset=offset,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    response.headers["X-Total-Count"] = str(total)
+    return registrations
+
+
+@router.get("/registrations/queue", response_model=Dict[str, Any])
+async def get_registration_queue_stats(_: Dict[str, Any] = Depends(verify_admin)):
+    """
+    Get registration queue depth, undeliverable registrations, Google Sheets
+    flush metrics and this worker's admission counts
+    """
+    depth = await blocking_io.run(STORAGE, registration_worker.queue.depth)
+    dead_letters = await blocking_io.run(STORAGE, registration_worker.queue.dead_letter_report)
+    return {
+        "depth": depth,
+        "dead_letters": dead_letters,
+        **sheets_batch_writer.stats(),
+        "admission": registration_admission.stats(),
+    }
+
+
+@router.post("/registrations/dead-letters/redrive", response_model=Dict[str, int])
+async def redrive_dead_letters(
+    ids: Optional[List[str]] = Body(None, embed=True),
+    _: Dict[str, Any] = Depends(verify_admin)
+):
+    """
+    Queue dead letters for delivery again, those with the given IDs or all
+    of them, with a fresh attempt count
+    """
+    redriven = await registration_worker.redrive(ids)
+    return {"redriven": redriven}
+
+
+@router.get("/profiles", response_model=List[Dict[str, Any]])
+async def get_profiles(_: Dict[str, Any] = Depends(verify_admin)):
+    """
+    List the stored profiles of every worker, newest first
+    
+    Requests sent with X-Profile: 1 and requests slower than
+    SLOW_REQUEST_THRESHOLD are kept, up to PROFILE_BUFFER_SIZE.
+    """
+    return await blocking_io.run(STORAGE, profile_store.list)
+
+
+@router.get("/profiles/{profile_id}", response_class=PlainTextResponse)
+async def get_profile(profile_id: str, _: Dict[str, Any] = Depends(verify_admin)):
     """
-    Get all artist registrations from Google Sheets
+    Get a profile as collapsed stacks, ready for flamegraph.pl or speedscope
     """
-    return await google_sheets_service.get_registrations()
+    profile = await blocking_io.run(STORAGE, profile_store.get, profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(profile["folded"])
 
 
 @router.get("/exhibitions", response_model=List[Exhibition])
@@ -51,8 +164,75 @@ async def get_all_exhibitions_admin(_: Dict[str, Any] = Depends(verify_admin)):
     return await json_storage_service.get_all_exhibitions()
 
 
+@router.get("/exhibitions/export")
+async def export_exhibitions(_: Dict[str, Any] = Depends(verify_admin)):
+    """
+    Stream every exhibition as newline-delimited JSON
+    """
+    entries = await json_storage_service.query_entries()
+    filename = f"exhibitions-{date.today().isoformat()}.ndjson"
+    return StreamingResponse(
+        ndjson_chunks(entries),
+        media_type=NDJSON_MEDIA_TYPE,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@router.post("/exhibitions/import")
+async def import_exhibitions(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    _: Dict[str, Any] = Depends(verify_admin)
+):
+    """
+    Create or replace exhibitions from a newline-delimited JSON body
+    
+    Lines are validated as they arrive and written in batches. Invalid lines
+    are reported by line number and skipped; the rest are still imported.
+    """
+    created = updated = 0
+    errors: List[Dict[str, Any]] = []
+    error_count = 0
+    batch: List[Exhibition] = []
+    imported: List[Exhibition] = []
+    
+    async def flush():
+        nonlocal created, updated
+        if batch:
+            batch_created, batch_updated = await json_storage_service.save_many(batch)
+            created += batch_created
+            updated += batch_updated
+            imported.extend(batch)
+            batch.clear()
+    
+    async for number, line in ndjson_lines(request.stream()):
+        try:
+            batch.append(Exhibition.model_validate_json(line))
+        except ValidationError as e:
+            error_count += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append({
+                    "line": number,
+                    "errors": [{"loc": list(error["loc"]), "msg": error["msg"]} for error in e.errors()],
+                })
+            continue
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            await flush()
+    await flush()
+    
+    background_tasks.add_task(image_service.prepare, imported)
+    return {
+        "created": created,
+        "updated": updated,
+        "error_count": error_count,
+        "errors": errors,
+    }
+
+
 @router.post("/exhibitions", response_model=Exhibition, status_code=201)
 async def create_exhibition(
+    response: Response,
+    background_tasks: BackgroundTasks,
     exhibition_data: Exhibition = Body(...),
     _: Dict[str, Any] = Depends(verify_admin)
 ):
@@ -64,17 +244,27 @@ async def create_exhibition(
         exhibition_data.id = str(uuid.uuid4())
     
     # Save the exhibition
-    return await json_storage_service.save_exhibition(exhibition_data)
+    entry = await json_storage_service.save_entry(exhibition_data)
+    response.headers["ETag"] = f'"{entry.etag}"'
+    # Pre-generate image derivatives once the response is sent
+    background_tasks.add_task(image_service.prepare, [entry.exhibition])
+    return entry.exhibition
 
 
 @router.put("/exhibitions/{exhibition_id}", response_model=Exhibition)
 async def update_exhibition(
     exhibition_id: str,
+    response: Response,
+    background_tasks: BackgroundTasks,
     exhibition_data: Exhibition = Body(...),
+    if_match: Optional[str] = Header(None),
     _: Dict[str, Any] = Depends(verify_admin)
 ):
     """
     Update an existing exhibition
+    
+    With an If-Match header carrying the ETag the exhibition was read with,
+    the update only succeeds if nobody changed it since (412 otherwise).
     """
     # Check if exhibition exists
     existing = await json_storage_service.get_exhibition(exhibition_id)
@@ -85,8 +275,17 @@ async def update_exhibition(
     if exhibition_id != exhibition_data.id:
         raise HTTPException(status_code=400, detail="Exhibition ID mismatch")
     
+    precondition = None
+    if if_match is not None:
+        def precondition(current):
+            return current is not None and if_match_satisfied(if_match, current.etag)
+    
     # Save the updated exhibition
-    return await json_storage_service.save_exhibition(exhibition_data)
+    entry = await json_storage_service.save_entry(exhibition_data, precondition)
+    response.headers["ETag"] = f'"{entry.etag}"'
+    # Pre-generate image derivatives once the response is sent
+    background_tasks.add_task(image_service.prepare, [entry.exhibition])
+    return entry.exhibition
 
 
 @router.delete("/exhibitions/{exhibition_id}", status_code=204)
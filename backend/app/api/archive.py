@@ -1,6 +1,15 @@
-from fastapi import APIRouter, HTTPException, Query
-from typing import List
+from fastapi import APIRouter, HTTPException, Query, Request
+from datetime import date
+from functools import partial
+from typing import List, Optional
 
+from app.api.listing import (
+    MAX_PAGE_SIZE,
+    decode_cursor,
+    cached_list_response,
+    exhibition_response,
+    parse_fields,
+)
 from app.models.exhibition import Exhibition
 from app.services.json_storage import json_storage_service
 
@@ -8,24 +17,49 @@ router = APIRouter()
 
 
 @router.get("/", response_model=List[Exhibition])
-async def get_archived_exhibitions():
+async def get_archived_exhibitions(
+    request: Request,
+    location: Optional[str] = Query(None, description="Filter by location (case-insensitive)"),
+    artist: Optional[str] = Query(None, description="Filter by participating artist name (case-insensitive)"),
+    date_from: Optional[date] = Query(None, description="Only exhibitions running on or after this date"),
+    date_to: Optional[date] = Query(None, description="Only exhibitions running on or before this date"),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Maximum number of exhibitions to return"),
+    cursor: Optional[str] = Query(None, description="Cursor from a previous page's X-Next-Cursor header"),
+    fields: Optional[str] = Query(None, description="Comma-separated list of fields to include"),
+):
     """
-    Get all archived exhibitions
+    Get archived exhibitions ordered by start date, optionally filtered.
+
+    Supports cursor pagination with `limit`/`cursor` and sparse field
+    selection with `fields`.
     """
-    return await json_storage_service.get_all_exhibitions(archived=True)
+    selected = parse_fields(fields)
+    after = decode_cursor(cursor)
+    query = partial(
+        json_storage_service.query_entries,
+        archived=True,
+        location=location,
+        artist=artist,
+        date_from=date_from,
+        date_to=date_to,
+        after=after,
+        # Fetch one extra item to know whether another page follows
+        limit=limit + 1 if limit is not None else None,
+    )
+    return await cached_list_response(request, query, selected, limit)
 
 
 @router.get("/{exhibition_id}", response_model=Exhibition)
-async def get_archived_exhibition(exhibition_id: str):
+async def get_archived_exhibition(exhibition_id: str, request: Request):
     """
     Get a specific archived exhibition by ID
     """
-    exhibition = await json_storage_service.get_exhibition(exhibition_id)
+    entry = await json_storage_service.get_entry(exhibition_id)
     
-    if not exhibition:
+    if not entry:
         raise HTTPException(status_code=404, detail="Exhibition not found")
     
-    if not exhibition.is_archived:
+    if not entry.exhibition.is_archived:
         raise HTTPException(status_code=404, detail="Exhibition is not archived")
     
-    return exhibition 
\ No newline at end of file
+    return exhibition_response(request, entry)
@@ -0,0 +1,245 @@
+import gzip
+import os
+import stat
+import zlib
+from typing import Optional, Tuple
+
+import anyio
+import brotli
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.api.http_cache import representation_etag
+from app.config import settings
+
+# Supported content encodings, most preferred first, with the file suffix
+# of their precompressed static siblings
+ENCODINGS = {
+    "br": ".br",
+    "gzip": ".gz",
+}
+
+# Media types worth compressing; everything else (images, fonts, archives)
+# is already compressed
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+)
+
+
+def is_compressible(content_type: str) -> bool:
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+def accepted_encodings(accept_encoding: Optional[str]) -> Tuple[str, ...]:
+    """
+    Get the supported encodings an Accept-Encoding header allows, best first.
+
+    Higher q-values win; ties go to the server's preference (brotli).
+    """
+    if not accept_encoding:
+        return ()
+
+    qualities = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.partition(";")
+        name = name.strip().lower()
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        qualities[name] = quality
+
+    wildcard = qualities.get("*", 0.0)
+    ranked = [
+        (qualities.get(encoding, wildcard), -preference, encoding)
+        for preference, encoding in enumerate(ENCODINGS)
+    ]
+    return tuple(encoding for quality, _, encoding in sorted(ranked, reverse=True) if quality > 0)
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Get the best supported encoding an Accept-Encoding header allows"""
+    encodings = accepted_encodings(accept_encoding)
+    return encodings[0] if encodings else None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=settings.COMPRESSION_BROTLI_QUALITY)
+    # A fixed mtime keeps the output identical for identical bodies
+    return gzip.compress(body, compresslevel=settings.COMPRESSION_GZIP_LEVEL, mtime=0)
+
+
+def add_vary(headers: MutableHeaders) -> None:
+    """Mark a response as varying with Accept-Encoding"""
+    vary = headers.get("vary")
+    if vary is None:
+        headers["vary"] = "Accept-Encoding"
+    elif "accept-encoding" not in vary.lower():
+        headers["vary"] = f"{vary}, Accept-Encoding"
+
+
+class StreamCompressor:
+    """Incremental compressor that can flush after every chunk"""
+
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            compressor = brotli.Compressor(quality=settings.COMPRESSION_BROTLI_QUALITY)
+            self.compress, self.flush, self.finish = compressor.process, compressor.flush, compressor.finish
+        else:
+            compressor = zlib.compressobj(settings.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            self.compress = compressor.compress
+            self.flush = lambda: compressor.flush(zlib.Z_SYNC_FLUSH)
+            self.finish = compressor.flush
+
+
+class CompressionMiddleware:
+    """
+    Compress compressible responses with the best encoding the client accepts.
+
+    Bodies smaller than ``minimum_size`` are sent as-is. Streamed responses
+    are compressed chunk by chunk and flushed after each one, so clients
+    still receive data as it is produced. Responses that already carry a
+    Content-Encoding, such as pre-compressed cached responses, are left
+    alone.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: Optional[int] = None):
+        self.app = app
+        self.minimum_size = settings.COMPRESSION_MIN_SIZE if minimum_size is None else minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding"))
+        responder = _CompressingResponder(send, encoding, self.minimum_size)
+        await self.app(scope, receive, responder)
+
+
+class _CompressingResponder:
+    def __init__(self, send: Send, encoding: Optional[str], minimum_size: int):
+        self.send = send
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.start: Optional[Message] = None
+        self.passthrough = False
+        self.compressor: Optional[StreamCompressor] = None
+
+    async def __call__(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            headers = Headers(raw=message["headers"])
+            if "content-encoding" in headers or not is_compressible(headers.get("content-type", "")):
+                self.passthrough = True
+                await self.send(message)
+            else:
+                # Held back until the first body chunk shows whether to compress
+                self.start = message
+            return
+
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.compressor is None:
+            headers = MutableHeaders(raw=self.start["headers"])
+            add_vary(headers)
+            if self.encoding is None or (not more_body and len(body) < self.minimum_size):
+                self.passthrough = True
+                await self.send(self.start)
+                await self.send(message)
+                return
+
+            headers["content-encoding"] = self.encoding
+            if not more_body:
+                body = compress(body, self.encoding)
+                headers["content-length"] = str(len(body))
+                await self.send(self.start)
+                await self.send({"type": "http.response.body", "body": body})
+                return
+
+            del headers["content-length"]
+            self.compressor = StreamCompressor(self.encoding)
+            await self.send(self.start)
+
+        chunk = self.compressor.compress(body)
+        chunk += self.compressor.flush() if more_body else self.compressor.finish()
+        await self.send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """
+    Static files that are served from a ``.br`` or ``.gz`` sibling when the
+    client accepts that encoding and the sibling exists.
+
+    The siblings are generated at build time by ``app.services.precompress``;
+    a sibling older than its file is ignored. A sibling is sent with the
+    file's ETag plus an encoding suffix, and conditional requests are
+    checked against the validators of the representation actually sent.
+    """
+
+    def file_response(self, full_path, stat_result: os.stat_result, scope: Scope, status_code: int = 200) -> Response:
+        # Conditional requests are answered in get_response, once the
+        # representation to send is known
+        return FileResponse(full_path, status_code=status_code, stat_result=stat_result, method=scope["method"])
+
+    def is_not_modified(self, response_headers: Headers, request_headers: Headers) -> bool:
+        # If-None-Match takes precedence over If-Modified-Since (RFC 9110)
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match is None:
+            return super().is_not_modified(response_headers, request_headers)
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or response_headers.get("etag") in tags
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        response = await super().get_response(path, scope)
+        if not isinstance(response, FileResponse) or response.status_code != 200:
+            return response
+
+        response = await self.select_representation(path, response, scope)
+        if self.is_not_modified(response.headers, Headers(scope=scope)):
+            return NotModifiedResponse(response.headers)
+        return response
+
+    async def select_representation(self, path: str, response: FileResponse, scope: Scope) -> FileResponse:
+        """Get the precompressed sibling of ``response`` to send, if any"""
+        content_type = response.headers.get("content-type", "")
+        if not is_compressible(content_type):
+            return response
+
+        add_vary(response.headers)
+        for encoding in accepted_encodings(Headers(scope=scope).get("accept-encoding")):
+            full_path, stat_result = await anyio.to_thread.run_sync(self.lookup_path, path + ENCODINGS[encoding])
+            # Ignore siblings left over from an older version of the file
+            if (
+                stat_result is None
+                or not stat.S_ISREG(stat_result.st_mode)
+                or stat_result.st_mtime < response.stat_result.st_mtime
+            ):
+                continue
+            compressed = FileResponse(
+                full_path,
+                stat_result=stat_result,
+                method=scope["method"],
+                headers={"etag": representation_etag(response.headers["etag"], encoding)},
+            )
+            compressed.headers["content-type"] = content_type
+            compressed.headers["content-encoding"] = encoding
+            add_vary(compressed.headers)
+            return compressed
+        return response
@@ -1,6 +1,15 @@
-from fastapi import APIRouter, HTTPException, Query
-from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Query, Request
+from datetime import date
+from functools import partial
+from typing import List, Literal, Optional
 
+from app.api.listing import (
+    MAX_PAGE_SIZE,
+    decode_cursor,
+    cached_list_response,
+    exhibition_response,
+    parse_fields,
+)
 from app.models.exhibition import Exhibition
 from app.services.json_storage import json_storage_service
 
@@ -9,30 +18,82 @@ router = APIRouter()
 
 @router.get("/", response_model=List[Exhibition])
 async def get_exhibitions(
-    archived: Optional[bool] = Query(None, description="Filter by archived status")
+    request: Request,
+    archived: Optional[bool] = Query(None, description="Filter by archived status"),
+    featured: Optional[bool] = Query(None, description="Filter by featured status"),
+    location: Optional[str] = Query(None, description="Filter by location (case-insensitive)"),
+    artist: Optional[str] = Query(None, description="Filter by participating artist name (case-insensitive)"),
+    period: Optional[Literal["current", "upcoming", "past"]] = Query(
+        None, description="Filter by whether the exhibition is running, upcoming or over today"
+    ),
+    date_from: Optional[date] = Query(None, description="Only exhibitions running on or after this date"),
+    date_to: Optional[date] = Query(None, description="Only exhibitions running on or before this date"),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Maximum number of exhibitions to return"),
+    cursor: Optional[str] = Query(None, description="Cursor from a previous page's X-Next-Cursor header"),
+    fields: Optional[str] = Query(None, description="Comma-separated list of fields to include"),
 ):
     """
-    Get all exhibitions, optionally filtered by archived status
+    Get exhibitions ordered by start date, optionally filtered.
+
+    Supports cursor pagination with `limit`/`cursor` and sparse field
+    selection with `fields`.
     """
-    return await json_storage_service.get_all_exhibitions(archived=archived)
+    selected = parse_fields(fields)
+    after = decode_cursor(cursor)
+    query = partial(
+        json_storage_service.query_entries,
+        archived=archived,
+        featured=featured,
+        location=location,
+        artist=artist,
+        period=period,
+        date_from=date_from,
+        date_to=date_to,
+        after=after,
+        # Fetch one extra item to know whether another page follows
+        limit=limit + 1 if limit is not None else None,
+    )
+    return await cached_list_response(request, query, selected, limit, dated=period is not None)
 
 
 @router.get("/featured", response_model=List[Exhibition])
-async def get_featured_exhibitions():
+async def get_featured_exhibitions(request: Request):
     """
     Get featured exhibitions for the homepage
     """
-    return await json_storage_service.get_featured_exhibitions()
+    query = partial(json_storage_service.query_entries, archived=False, featured=True)
+    return await cached_list_response(request, query)
+
+
+@router.get("/search", response_model=List[Exhibition])
+async def search_exhibitions(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=200, description="Words to search for; each may be a prefix"),
+    archived: Optional[bool] = Query(None, description="Filter by archived status"),
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE, description="Maximum number of exhibitions to return"),
+    fields: Optional[str] = Query(None, description="Comma-separated list of fields to include"),
+):
+    """
+    Search exhibitions, their artists and artworks, best matches first.
+
+    Every word must match the title, description, curator or location of
+    the exhibition, or the name or bio of an artist, or the title, medium or
+    description of an artwork. Words also match longer words they start
+    with, ranked lower than exact matches.
+    """
+    selected = parse_fields(fields)
+    query = partial(json_storage_service.search_entries, q, archived=archived, limit=limit)
+    return await cached_list_response(request, query, selected)
 
 
 @router.get("/{exhibition_id}", response_model=Exhibition)
-async def get_exhibition(exhibition_id: str):
+async def get_exhibition(exhibition_id: str, request: Request):
     """
     Get a specific exhibition by ID
     """
-    exhibition = await json_storage_service.get_exhibition(exhibition_id)
+    entry = await json_storage_service.get_entry(exhibition_id)
     
-    if not exhibition:
+    if not entry:
         raise HTTPException(status_code=404, detail="Exhibition not found")
     
-    return exhibition 
\ No newline at end of file
+    return exhibition_response(request, entry)
@@ -0,0 +1,74 @@
+import ipaddress
+from typing import List, Optional, Union
+
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.config import settings
+
+Network = Union[ipaddress.IPv4Network, ipaddress.IPv6Network]
+
+
+def trusted_networks(spec: str) -> Optional[List[Network]]:
+    """Parse comma-separated addresses and networks (CIDR); None for "*", trusting every peer"""
+    items = [item.strip() for item in spec.split(",") if item.strip()]
+    if "*" in items:
+        return None
+    return [ipaddress.ip_network(item, strict=False) for item in items]
+
+
+def is_trusted(address: str, networks: Optional[List[Network]]) -> bool:
+    if networks is None:
+        return True
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in networks)
+
+
+def client_address(peer: str, forwarded_for: Optional[str], networks: Optional[List[Network]]) -> str:
+    """
+    The address a request came from.
+
+    For a request from a trusted proxy this is the rightmost X-Forwarded-For
+    address that is not itself a trusted proxy: every proxy appends the
+    address it received the request from, so anything left of that may
+    have been written by the client. Otherwise it is the peer.
+    """
+    if not forwarded_for or not is_trusted(peer, networks):
+        return peer
+    hops = [hop.strip() for hop in forwarded_for.split(",") if hop.strip()]
+    for hop in reversed(hops):
+        if not is_trusted(hop, networks):
+            return hop
+    # Every hop is a trusted proxy
+    return hops[0] if hops else peer
+
+
+class ForwardedHeadersMiddleware:
+    """
+    Take the client address and scheme of requests from trusted proxies
+    (FORWARDED_ALLOW_IPS) from their X-Forwarded-For and X-Forwarded-Proto
+    headers.
+
+    Unlike uvicorn's proxy header support, trusted proxies may be given as
+    networks, which is how the address of a proxy in another container is
+    known, and clients cannot choose their address by sending their own
+    X-Forwarded-For.
+    """
+
+    def __init__(self, app: ASGIApp, trusted: Optional[str] = None):
+        self.app = app
+        self.networks = trusted_networks(settings.FORWARDED_ALLOW_IPS if trusted is None else trusted)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        client = scope.get("client")
+        if scope["type"] == "http" and client and is_trusted(client[0], self.networks):
+            headers = Headers(scope=scope)
+            scope = dict(scope)
+            scope["client"] = (client_address(client[0], headers.get("x-forwarded-for"), self.networks), 0)
+            scheme = headers.get("x-forwarded-proto", "").strip().lower()
+            if scheme in ("http", "https"):
+                scope["scheme"] = scheme
+        await self.app(scope, receive, send)
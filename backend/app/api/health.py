@@ -0,0 +1,50 @@
+from typing import Any, Dict
+
+from fastapi import APIRouter, Response
+
+from app.services.google_sheets import google_sheets_service
+from app.services.json_storage import json_storage_service
+from app.services.registration_queue import registration_worker
+
+router = APIRouter()
+
+
+def dependencies() -> Dict[str, Dict[str, Any]]:
+    """State of every dependency, from memory so that checks stay cheap"""
+    return {
+        "storage": json_storage_service.status(),
+        "google_sheets": google_sheets_service.status(),
+        "registration_queue": {"state": "running" if registration_worker.running else "stopped"},
+    }
+
+
+@router.get("/health", status_code=200)
+async def health_check():
+    """
+    Health check endpoint for container monitoring.
+
+    Returns a 200 status code whenever the API is running, with the state of
+    each dependency; "degraded" means some of them are not working.
+    """
+    checks = dependencies()
+    healthy = (
+        checks["storage"]["state"] in ("loading", "ready")
+        and checks["google_sheets"]["state"] == "connected"
+    )
+    return {"status": "healthy" if healthy else "degraded", "service": "backend", "dependencies": checks}
+
+
+@router.get("/ready")
+async def readiness_check(response: Response):
+    """
+    Readiness check for load balancers and orchestrators.
+
+    Returns 503 until exhibitions are loaded. Google Sheets being unreachable
+    does not make the API unready: registrations are journaled and delivered
+    once it reconnects.
+    """
+    checks = dependencies()
+    ready = json_storage_service.loaded
+    if not ready:
+        response.status_code = 503
+    return {"status": "ready" if ready else "not ready", "dependencies": checks}
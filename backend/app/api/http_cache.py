@@ -0,0 +1,80 @@
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Dict, Optional
+
+from fastapi import Request, Response
+
+from app.config import settings
+
+
+def cache_headers(etag: str, last_modified: float) -> Dict[str, str]:
+    """Build validator and Cache-Control headers for a public read response"""
+    return {
+        "ETag": f'"{etag}"',
+        "Last-Modified": formatdate(last_modified, usegmt=True),
+        "Cache-Control": (
+            f"public, max-age={settings.HTTP_CACHE_MAX_AGE}, "
+            f"stale-while-revalidate={settings.HTTP_CACHE_STALE_WHILE_REVALIDATE}"
+        ),
+    }
+
+
+def representation_etag(etag: str, encoding: Optional[str]) -> str:
+    """
+    Get the ETag of one content encoding of a resource, given the ETag of
+    its identity representation.
+
+    Each encoding is a different representation and needs its own strong
+    validator (RFC 9110), so the encoding is appended as a suffix.
+    """
+    if encoding is None:
+        return etag
+    if etag.endswith('"'):
+        return f'{etag[:-1]}-{encoding}"'
+    return f"{etag}-{encoding}"
+
+
+def is_not_modified(request: Request, etag: str, last_modified: float) -> bool:
+    """
+    Evaluate If-None-Match / If-Modified-Since against the current validators.
+
+    If-None-Match takes precedence when present, as required by RFC 9110.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = {tag.strip() for tag in if_none_match.split(",")}
+        if "*" in tags:
+            return True
+        # Weak comparison: a W/ prefix does not prevent a match
+        return any(tag.removeprefix("W/") == f'"{etag}"' for tag in tags)
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        # HTTP dates have one second resolution
+        return int(last_modified) <= since
+
+    return False
+
+
+def if_match_satisfied(if_match: str, etag: Optional[str]) -> bool:
+    """
+    Evaluate an If-Match header against the current ETag, or None if the
+    resource does not exist.
+
+    If-Match uses strong comparison, so weak tags never match (RFC 9110).
+    A client may send the ETag of any encoding it was served; they all
+    identify the same state of the resource.
+    """
+    if etag is None:
+        return False
+    tags = {tag.strip() for tag in if_match.split(",")}
+    current = {f'"{representation_etag(etag, encoding)}"' for encoding in (None, "br", "gzip")}
+    return "*" in tags or not tags.isdisjoint(current)
+
+
+def not_modified_response(headers: Dict[str, str]) -> Response:
+    """Build a 304 response carrying the current validators"""
+    return Response(status_code=304, headers=headers)
@@ -0,0 +1,69 @@
+import asyncio
+
+from fastapi import APIRouter, HTTPException, Path, Query, Request
+from fastapi.responses import FileResponse, RedirectResponse
+from typing import Literal, Optional
+
+from app.config import settings
+from app.services.executor import STORAGE, blocking_io
+from app.services.images import FORMATS, image_service
+
+router = APIRouter()
+
+# Derivative names never change content, so clients may keep them forever
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+@router.get("/")
+async def get_image(
+    request: Request,
+    src: str = Query(..., description="URL of an exhibition or artwork image"),
+    w: Optional[int] = Query(None, ge=1, description="Width wanted; rounded up to the nearest generated width"),
+    format: Optional[Literal["webp", "jpeg"]] = Query(None, description="Defaults to WebP if the client accepts it"),
+):
+    """
+    Redirect to a resized derivative of an exhibition image
+
+    Only images referenced by a saved exhibition are available. The target
+    URL is content-addressed and cached by clients for a year. While a
+    derivative evicted from the cache is being generated again, the
+    request is redirected to the source image instead.
+    """
+    fmt = format
+    if fmt is None:
+        fmt = "webp" if "image/webp" in request.headers.get("accept", "") else "jpeg"
+    width = image_service.snap_width(w)
+
+    try:
+        name = await image_service.derivative(src, width, fmt)
+    except asyncio.TimeoutError:
+        return RedirectResponse(src, status_code=302, headers={"Cache-Control": "no-store"})
+    if name is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+
+    return RedirectResponse(
+        request.url_for("get_image_derivative", name=name),
+        status_code=302,
+        headers={
+            "Cache-Control": f"public, max-age={settings.HTTP_CACHE_MAX_AGE}",
+            "Vary": "Accept",
+        },
+    )
+
+
+@router.get("/{name}", name="get_image_derivative")
+async def get_image_derivative(
+    name: str = Path(..., pattern=r"^[0-9a-f]{64}-[0-9]+\.(webp|jpeg)$"),
+):
+    """
+    Get a derivative by its content-addressed name
+    """
+    path = await blocking_io.run(STORAGE, image_service.cache.get, name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+
+    return FileResponse(
+        path,
+        media_type=FORMATS[name.rsplit(".", 1)[1]][1],
+        headers={"Cache-Control": IMMUTABLE_CACHE_CONTROL},
+    )
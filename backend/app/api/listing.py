@@ -0,0 +1,161 @@
+import base64
+import binascii
+import hashlib
+from datetime import date
+from typing import Awaitable, Callable, FrozenSet, List, Optional, Tuple
+
+from fastapi import HTTPException, Request, Response
+
+from app.api.compression import compress, negotiate_encoding
+from app.api.http_cache import cache_headers, is_not_modified, not_modified_response, representation_etag
+from app.config import settings
+from app.models.exhibition import Exhibition
+from app.services.exhibition_catalog import CatalogEntry
+from app.services.json_storage import json_storage_service
+from app.services.response_cache import CachedResponse, list_response_cache
+
+# Largest page a client may request with ``limit``
+MAX_PAGE_SIZE = 200
+
+EXHIBITION_FIELDS = frozenset(Exhibition.model_fields)
+
+
+def encode_cursor(exhibition: Exhibition) -> str:
+    """Encode the (start date, ID) position of an exhibition as an opaque cursor"""
+    raw = f"{exhibition.start_date.isoformat()}|{exhibition.id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[date, str]]:
+    """Decode a cursor produced by encode_cursor"""
+    if cursor is None:
+        return None
+
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        start, exhibition_id = raw.split("|", 1)
+        return date.fromisoformat(start), exhibition_id
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def parse_fields(fields: Optional[str]) -> Optional[FrozenSet[str]]:
+    """Parse a comma-separated ``fields`` projection"""
+    if fields is None:
+        return None
+
+    selected = frozenset(name.strip() for name in fields.split(",") if name.strip())
+    unknown = selected - EXHIBITION_FIELDS
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(sorted(unknown))}"
+        )
+    return selected or None
+
+
+def build_list_response(
+    request: Request,
+    entries: List[CatalogEntry],
+    last_modified: float,
+    fields: Optional[FrozenSet[str]] = None,
+    limit: Optional[int] = None,
+) -> CachedResponse:
+    """
+    Serialize a list of exhibitions, including only the selected fields.
+
+    ``entries`` may hold one item more than ``limit``; that extra item
+    signals another page and is dropped from the body. The next page is
+    advertised through the ``X-Next-Cursor`` and ``Link`` headers so the
+    body stays a plain list.
+
+    The body is assembled from each entry's pre-serialized JSON, so no
+    model is validated or dumped again. The ETag is derived from the query
+    and the ETag of every listed exhibition.
+    """
+    headers = {}
+    if limit is not None and len(entries) > limit:
+        entries = entries[:limit]
+        cursor = encode_cursor(entries[-1].exhibition)
+        next_url = request.url.include_query_params(cursor=cursor)
+        headers["X-Next-Cursor"] = cursor
+        headers["Link"] = f'<{next_url}>; rel="next"'
+
+    digest = hashlib.sha1(request.url.query.encode())
+    for entry in entries:
+        digest.update(entry.etag.encode())
+    digest.update(headers.get("X-Next-Cursor", "").encode())
+
+    # Excluded fields (such as nested artworks) are never serialized
+    body = b"[" + b",".join(entry.project(fields) for entry in entries) + b"]"
+    return CachedResponse(body, digest.hexdigest(), last_modified, headers)
+
+
+def send_cached(request: Request, cached: CachedResponse) -> Response:
+    """
+    Send pre-serialized bytes, or 304 if the client's copy is current.
+
+    Bodies over COMPRESSION_MIN_SIZE are compressed with the best encoding
+    the client accepts; the compressed bytes are kept on ``cached`` so the
+    same response is never compressed twice. Each encoding is sent with its
+    own ETag, and If-None-Match is checked against the one being sent.
+    """
+    encoding = None
+    if len(cached.body) >= settings.COMPRESSION_MIN_SIZE:
+        encoding = negotiate_encoding(request.headers.get("accept-encoding"))
+    etag = representation_etag(cached.etag, encoding)
+
+    headers = {
+        **cached.headers,
+        **cache_headers(etag, cached.last_modified),
+        "Vary": "Accept-Encoding",
+    }
+    if is_not_modified(request, etag, cached.last_modified):
+        return not_modified_response(headers)
+
+    body = cached.body
+    if encoding is not None:
+        body = cached.encoded.get(encoding)
+        if body is None:
+            body = cached.encoded[encoding] = compress(cached.body, encoding)
+        headers["Content-Encoding"] = encoding
+
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+async def cached_list_response(
+    request: Request,
+    query: Callable[[], Awaitable[List[CatalogEntry]]],
+    fields: Optional[FrozenSet[str]] = None,
+    limit: Optional[int] = None,
+    dated: bool = False,
+) -> Response:
+    """
+    Answer a list request from the response cache, running ``query`` and
+    serializing the result only when the catalog changed since it was cached.
+
+    ``dated`` marks queries relative to today, which are cached per day:
+    their results change at midnight without any change to the catalog.
+    """
+    await json_storage_service.refresh()
+    version = json_storage_service.version
+    key = (request.url.path, request.url.query)
+    if dated:
+        key += (date.today(),)
+
+    cached = list_response_cache.get(key, version)
+    if cached is None:
+        entries = await query()
+        cached = build_list_response(
+            request, entries, json_storage_service.last_modified, fields, limit
+        )
+        list_response_cache.put(key, json_storage_service.version, cached)
+
+    return send_cached(request, cached)
+
+
+def exhibition_response(request: Request, entry: CatalogEntry) -> Response:
+    """Send a single exhibition from its pre-serialized payload"""
+    return send_cached(
+        request, CachedResponse(entry.payload, entry.etag, entry.last_modified, encoded=entry.encoded)
+    )
@@ -0,0 +1,131 @@
+import time
+
+from fastapi import APIRouter
+from fastapi.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.services.admission import registration_admission
+from app.services.executor import STORAGE, blocking_io
+from app.services.images import image_service
+from app.services.json_storage import json_storage_service
+from app.services.metrics import (
+    HTTP_REQUEST_DURATION,
+    HTTP_REQUESTS,
+    HTTP_REQUESTS_IN_FLIGHT,
+    metrics_exporter,
+    registry,
+)
+from app.services.registration_queue import registration_worker
+from app.services.response_cache import list_response_cache
+from app.services.sheets_writer import sheets_batch_writer
+
+router = APIRouter()
+
+PROMETHEUS_MEDIA_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Service-level values read from the services at each snapshot
+REGISTRATION_QUEUE_DEPTH = registry.gauge(
+    "registration_queue_depth", "Registrations waiting for delivery to Google Sheets", merge="max"
+)
+REGISTRATION_DEAD_LETTERS = registry.gauge(
+    "registration_dead_letters", "Registrations given up on after REGISTRATION_MAX_ATTEMPTS deliveries", merge="max"
+)
+SHEETS_FLUSHES = registry.counter("sheets_flushes_total", "Batches written to Google Sheets")
+SHEETS_ROWS_WRITTEN = registry.counter("sheets_rows_written_total", "Registrations written to Google Sheets")
+SHEETS_FLUSH_ERRORS = registry.counter(
+    "sheets_flush_errors_total", "Failed Google Sheets batch writes by kind (quota or error)", ("kind",)
+)
+SHEETS_BACKOFF = registry.gauge(
+    "sheets_quota_backoff_seconds", "Current delay before retrying after a Sheets quota error", merge="max"
+)
+REGISTRATIONS_PENDING = registry.gauge("registrations_pending", "Registrations being written")
+REGISTRATIONS_REJECTED = registry.counter(
+    "registrations_rejected_total", "Registrations refused with 429 by reason (rate_limited or shed)", ("reason",)
+)
+REGISTRATION_DUPLICATES = registry.counter(
+    "registration_duplicates_total", "Repeated submissions answered with the original registration"
+)
+RESPONSE_CACHE_HITS = registry.counter("response_cache_hits_total", "List responses served from memory")
+RESPONSE_CACHE_MISSES = registry.counter("response_cache_misses_total", "List responses that had to be built")
+RESPONSE_CACHE_ENTRIES = registry.gauge("response_cache_entries", "List responses held in memory")
+CATALOG_EXHIBITIONS = registry.gauge("catalog_exhibitions", "Exhibitions in the in-memory catalog", merge="max")
+IMAGE_CACHE_BYTES = registry.gauge("image_cache_bytes", "Size of the image derivative cache", merge="max")
+
+
+def collect_service_metrics() -> None:
+    REGISTRATION_QUEUE_DEPTH.set(registration_worker.queue.depth())
+    REGISTRATION_DEAD_LETTERS.set(registration_worker.queue.dead_letter_report(limit=0)["count"])
+
+    stats = sheets_batch_writer.stats()
+    SHEETS_FLUSHES.set(stats["flushes"])
+    SHEETS_ROWS_WRITTEN.set(stats["rows_written"])
+    SHEETS_FLUSH_ERRORS.set(stats["quota_errors"], "quota")
+    SHEETS_FLUSH_ERRORS.set(stats["errors"], "error")
+    SHEETS_BACKOFF.set(stats["current_backoff_seconds"])
+
+    admission = registration_admission.stats()
+    REGISTRATIONS_PENDING.set(admission["pending"])
+    REGISTRATIONS_REJECTED.set(admission["rate_limited"], "rate_limited")
+    REGISTRATIONS_REJECTED.set(admission["shed"], "shed")
+    REGISTRATION_DUPLICATES.set(admission["duplicates"])
+
+    RESPONSE_CACHE_HITS.set(list_response_cache.hits)
+    RESPONSE_CACHE_MISSES.set(list_response_cache.misses)
+    RESPONSE_CACHE_ENTRIES.set(len(list_response_cache))
+    CATALOG_EXHIBITIONS.set(len(json_storage_service.catalog))
+    IMAGE_CACHE_BYTES.set(image_service.cache.stats()["bytes"])
+
+
+registry.add_collector(collect_service_metrics)
+
+
+def route_label(scope: Scope, root_path: str) -> str:
+    """The route template a request matched, so that labels stay few"""
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    mount = scope.get("root_path", "")
+    if mount != root_path:
+        return f"{mount[len(root_path):]}/{{path}}"
+    return "unmatched"
+
+
+class MetricsMiddleware:
+    """Count requests and time responses per route, method and status"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        root_path = scope.get("root_path", "")
+        # Reported if the application fails before responding
+        status = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_REQUESTS_IN_FLIGHT.dec()
+            route = route_label(scope, root_path)
+            HTTP_REQUESTS.inc(scope["method"], route, str(status))
+            HTTP_REQUEST_DURATION.observe(time.perf_counter() - started, scope["method"], route)
+
+
+@router.get("/metrics", response_class=Response)
+async def get_metrics():
+    """
+    Metrics of all workers in the Prometheus text format
+    """
+    body = await blocking_io.run(STORAGE, metrics_exporter.render)
+    return Response(content=body, media_type=PROMETHEUS_MEDIA_TYPE)
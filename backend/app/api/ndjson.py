@@ -0,0 +1,59 @@
+from typing import AsyncIterator, Iterable, Iterator, Tuple
+
+from app.services.exhibition_catalog import CatalogEntry
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# Lines joined into one chunk of a streamed export
+EXPORT_CHUNK_LINES = 100
+
+# Longest line accepted by an import
+MAX_LINE_BYTES = 1024 * 1024
+
+
+def ndjson_chunks(entries: Iterable[CatalogEntry], chunk_lines: int = EXPORT_CHUNK_LINES) -> Iterator[bytes]:
+    """
+    Yield exhibitions as newline-delimited JSON, a few lines at a time.
+
+    Each line is an entry's pre-serialized payload, so only one chunk is
+    ever assembled in memory regardless of the number of exhibitions.
+    """
+    chunk = []
+    for entry in entries:
+        chunk.append(entry.payload)
+        if len(chunk) >= chunk_lines:
+            yield b"\n".join(chunk) + b"\n"
+            chunk = []
+    if chunk:
+        yield b"\n".join(chunk) + b"\n"
+
+
+async def ndjson_lines(stream: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, bytes]]:
+    """
+    Split a byte stream into (line number, line) pairs as it arrives.
+
+    Blank lines are skipped but still counted. A line longer than
+    MAX_LINE_BYTES is cut short and yielded as-is, so it fails validation
+    instead of being buffered without limit.
+    """
+    number = 0
+    buffer = b""
+    # Inside an oversized line that was already yielded
+    skipping = False
+    async for chunk in stream:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            number += 1
+            if skipping:
+                skipping = False
+                continue
+            if line.strip():
+                yield number, line
+        if not skipping and len(buffer) > MAX_LINE_BYTES:
+            yield number + 1, buffer[:MAX_LINE_BYTES]
+            skipping = True
+        if skipping:
+            buffer = b""
+    if not skipping and buffer.strip():
+        yield number + 1, buffer
@@ -1,37 +1,98 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response
 from datetime import datetime
+from typing import Optional
+import asyncio
+import math
 import uuid
 
 from app.models.registration import ArtistRegistration, RegistrationCreate
-from app.services.google_sheets import google_sheets_service
+from app.services.admission import (
+    RegistrationRejected,
+    SubmissionConflict,
+    registration_admission,
+    submission_fingerprint,
+    submission_keys,
+)
+from app.services.executor import STORAGE, blocking_io
+from app.services.registration_queue import registration_worker
+from app.services.registration_store import registration_store
 
 router = APIRouter()
 
+# Seconds a client is asked to wait when the registration journal is too
+# slow to answer
+JOURNAL_BUSY_RETRY_AFTER = 5
+
 @router.post("/register", status_code=201)
 async def register_artist(
     registration: RegistrationCreate,
-    background_tasks: BackgroundTasks
+    request: Request,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, max_length=255),
 ):
     """
     Submit an artist registration for an open call
-    """
-    # Create a new registration object with additional metadata
-    new_registration = ArtistRegistration(
-        id=str(uuid.uuid4()),
-        submitted_at=datetime.now(),
-        status="pending",
-        **registration.dict()
-    )
-    
-    # Add the registration to Google Sheets in the background
-    # This prevents API timeouts if the sheets API is slow
-    background_tasks.add_task(
-        google_sheets_service.add_registration,
-        new_registration
-    )
     
+    Retrying with the same Idempotency-Key and content within
+    REGISTRATION_DEDUP_WINDOW returns the original registration's ID (with
+    an Idempotent-Replayed header); reusing the key for different content
+    gets 422, and resubmitting the same email and statement without the
+    original key gets 409. Clients over their rate, and everyone while the
+    server is overloaded, get 429 with Retry-After; if the journal is too
+    slow to answer, the answer is 503 with Retry-After.
+    """
+    keys = submission_keys(registration, idempotency_key)
+    fingerprint = submission_fingerprint(registration)
+    try:
+        registration_admission.admit(request.client.host if request.client else "unknown")
+        # The duplicate check reads the journal too, so it is pending work
+        with registration_admission.writing():
+            earlier = await registration_worker.find_submission(keys)
+            if earlier is None:
+                # Create a new registration object with additional metadata
+                new_registration = ArtistRegistration(
+                    id=str(uuid.uuid4()),
+                    submitted_at=datetime.now(),
+                    status="pending",
+                    **registration.dict()
+                )
+                # Journal the registration durably before acknowledging it; a
+                # worker delivers it to Google Sheets with retries, even across
+                # restarts. A duplicate journaled meanwhile by another worker
+                # is returned instead
+                earlier = await registration_worker.enqueue(new_registration, keys, fingerprint)
+                if earlier is None:
+                    # Make the registration visible to status lookups straight away;
+                    # otherwise it appears once the mirror syncs it from the sheet
+                    try:
+                        await blocking_io.run(STORAGE, registration_store.add, new_registration)
+                    except Exception as e:
+                        print(f"Error recording registration {new_registration.id} locally: {e}")
+                    return {
+                        "id": new_registration.id,
+                        "message": "Registration submitted successfully"
+                    }
+
+        registration_id = registration_admission.replay(earlier, fingerprint)
+    except RegistrationRejected as e:
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": str(math.ceil(e.retry_after))},
+        )
+    except SubmissionConflict as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    except asyncio.TimeoutError:
+        # Nothing was journaled: the duplicate check timed out
+        raise HTTPException(
+            status_code=503,
+            detail="Registrations are taking too long to process, please retry shortly",
+            headers={"Retry-After": str(JOURNAL_BUSY_RETRY_AFTER)},
+        )
+
+    response.headers["Idempotent-Replayed"] = "true"
     return {
-        "id": new_registration.id,
+        "id": registration_id,
         "message": "Registration submitted successfully"
     }
 
@@ -40,10 +101,12 @@ async def get_registration_status(registration_id: str):
     """
     Check the status of an artist registration
     """
-    # In a real app, you would look up the registration
-    # For now, we'll return a mock response
+    registration = await blocking_io.run(STORAGE, registration_store.get, registration_id)
+    if not registration:
+        raise HTTPException(status_code=404, detail="Registration not found")
+    
     return {
         "id": registration_id,
-        "status": "pending",
+        "status": registration["status"],
         "message": "Your registration is being reviewed"
-    } 
\ No newline at end of file
+    }
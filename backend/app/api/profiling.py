@@ -0,0 +1,91 @@
+import asyncio
+import time
+from typing import Optional
+from urllib.parse import parse_qs
+
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import settings
+from app.services.auth import sync_revocations, user_from_token
+from app.services.executor import STORAGE, blocking_io
+from app.services.profiling import Profile, current_profile, profile_store, sampler
+
+PROFILE_HEADER = "x-profile"
+PROFILE_ID_HEADER = b"x-profile-id"
+FLAG_VALUES = {"1", "true", "yes"}
+
+
+async def profile_requested(scope: Scope) -> bool:
+    """Whether an administrator asked for this request to be profiled"""
+    headers = Headers(scope=scope)
+    flag = headers.get(PROFILE_HEADER)
+    if flag is None:
+        flag = parse_qs(scope.get("query_string", b"").decode("latin-1")).get("profile", [None])[0]
+    if flag is None or flag.lower() not in FLAG_VALUES:
+        return False
+
+    scheme, _, token = headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer":
+        return False
+    await sync_revocations()
+    return user_from_token(token) is not None
+
+
+class ProfilingMiddleware:
+    """
+    Profile requests with the stack sampler.
+
+    Admin requests sent with ``X-Profile: 1`` (or ``?profile=1``) are
+    sampled finely and always stored; their response carries the profile's
+    id in ``X-Profile-Id``. When ``SLOW_REQUEST_THRESHOLD`` is set, every
+    other request is sampled coarsely and stored only if it turns out slower
+    than the threshold. Requests finishing within one sample interval are
+    never sampled at all.
+    """
+
+    def __init__(self, app: ASGIApp, slow_threshold: Optional[float] = None):
+        self.app = app
+        self.slow_threshold = settings.SLOW_REQUEST_THRESHOLD if slow_threshold is None else slow_threshold
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        requested = await profile_requested(scope)
+        if not requested and self.slow_threshold <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        profile = Profile(
+            asyncio.current_task(),
+            settings.PROFILE_SAMPLE_INTERVAL if requested else settings.SLOW_REQUEST_SAMPLE_INTERVAL,
+            scope["method"],
+            scope["path"],
+            "requested" if requested else "slow",
+        )
+        # Reported if the application fails before responding
+        status = 500
+
+        async def send_with_profile_id(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if requested:
+                    message["headers"] = [*message.get("headers", []), (PROFILE_ID_HEADER, profile.id.encode())]
+            await send(message)
+
+        token = current_profile.set(profile)
+        sampler.begin(profile)
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            sampler.end(profile)
+            current_profile.reset(token)
+            duration = time.perf_counter() - profile.started
+            if requested or duration >= self.slow_threshold:
+                try:
+                    await blocking_io.run(STORAGE, profile_store.add, profile, status, duration)
+                except Exception as e:
+                    print(f"Error storing profile {profile.id}: {e}")
@@ -17,13 +17,153 @@ class Settings(BaseSettings):
     GOOGLE_CREDENTIALS_FILE: str = os.getenv("GOOGLE_CREDENTIALS_FILE", "credentials/google-service-account.json")
     REGISTRATION_SHEET_ID: str = os.getenv("REGISTRATION_SHEET_ID", "")
     REGISTRATION_WORKSHEET: str = os.getenv("REGISTRATION_WORKSHEET", "Registrations")
+    # Where registrations are written: "google" or "fake" (in-process, for tests and load tests)
+    REGISTRATION_BACKEND: str = os.getenv("REGISTRATION_BACKEND", "google")
+    # Behaviour of the fake backend: latency and jitter (seconds), fraction of
+    # calls failing, calls allowed per minute (0 = unlimited), data rows kept
+    FAKE_SHEETS_LATENCY: float = float(os.getenv("FAKE_SHEETS_LATENCY", "0"))
+    FAKE_SHEETS_JITTER: float = float(os.getenv("FAKE_SHEETS_JITTER", "0"))
+    FAKE_SHEETS_ERROR_RATE: float = float(os.getenv("FAKE_SHEETS_ERROR_RATE", "0"))
+    FAKE_SHEETS_QUOTA_PER_MINUTE: int = int(os.getenv("FAKE_SHEETS_QUOTA_PER_MINUTE", "0"))
+    FAKE_SHEETS_MAX_ROWS: int = int(os.getenv("FAKE_SHEETS_MAX_ROWS", "100000"))
+    
+    # Registration queue settings
+    REGISTRATION_QUEUE_PATH: str = os.getenv(
+        "REGISTRATION_QUEUE_PATH", os.path.join(os.getenv("DATA_DIR", "data"), "registration_queue.db")
+    )
+    # Seconds the worker sleeps when the queue is idle
+    REGISTRATION_QUEUE_POLL_INTERVAL: float = float(os.getenv("REGISTRATION_QUEUE_POLL_INTERVAL", "5"))
+    # Registrations are written to Sheets in batches of up to this size,
+    # collected for at most this many seconds after the first arrives
+    REGISTRATION_BATCH_SIZE: int = int(os.getenv("REGISTRATION_BATCH_SIZE", "50"))
+    REGISTRATION_BATCH_WINDOW: float = float(os.getenv("REGISTRATION_BATCH_WINDOW", "1.0"))
+    # Retry backoff for failed deliveries (seconds)
+    REGISTRATION_RETRY_BASE_DELAY: float = float(os.getenv("REGISTRATION_RETRY_BASE_DELAY", "2"))
+    REGISTRATION_RETRY_MAX_DELAY: float = float(os.getenv("REGISTRATION_RETRY_MAX_DELAY", "300"))
+    # Failed deliveries after which a registration is moved to the dead
+    # letters (0 retries forever); throttled deliveries do not count
+    REGISTRATION_MAX_ATTEMPTS: int = int(os.getenv("REGISTRATION_MAX_ATTEMPTS", "20"))
+    # Local mirror of the registrations worksheet
+    REGISTRATION_STORE_PATH: str = os.getenv(
+        "REGISTRATION_STORE_PATH", os.path.join(os.getenv("DATA_DIR", "data"), "registrations.db")
+    )
+    # Seconds before admin reads trigger an incremental / full sync of the mirror
+    REGISTRATION_SYNC_INTERVAL: float = float(os.getenv("REGISTRATION_SYNC_INTERVAL", "30"))
+    REGISTRATION_FULL_SYNC_INTERVAL: float = float(os.getenv("REGISTRATION_FULL_SYNC_INTERVAL", "3600"))
+    # Open-call admission control: registrations per second and burst allowed
+    # per client address (0 disables), client addresses remembered, and
+    # registrations being written beyond which new ones get 429 (0 disables)
+    REGISTRATION_RATE_LIMIT: float = float(os.getenv("REGISTRATION_RATE_LIMIT", "1"))
+    REGISTRATION_RATE_BURST: int = int(os.getenv("REGISTRATION_RATE_BURST", "10"))
+    REGISTRATION_RATE_CLIENTS: int = int(os.getenv("REGISTRATION_RATE_CLIENTS", "10000"))
+    REGISTRATION_MAX_PENDING: int = int(os.getenv("REGISTRATION_MAX_PENDING", "200"))
+    # Seconds for which the registration journal remembers submissions (by
+    # Idempotency-Key, and by email and statement) to recognize repeats
+    REGISTRATION_DEDUP_WINDOW: float = float(os.getenv("REGISTRATION_DEDUP_WINDOW", "600"))
+    # Adaptive backoff after Sheets quota (HTTP 429) errors (seconds)
+    SHEETS_QUOTA_BACKOFF_BASE: float = float(os.getenv("SHEETS_QUOTA_BACKOFF_BASE", "5"))
+    SHEETS_QUOTA_BACKOFF_MAX: float = float(os.getenv("SHEETS_QUOTA_BACKOFF_MAX", "120"))
+    # Delay between attempts to connect to Google Sheets, doubling up to the maximum (seconds)
+    SHEETS_RECONNECT_INTERVAL: float = float(os.getenv("SHEETS_RECONNECT_INTERVAL", "5"))
+    SHEETS_RECONNECT_MAX: float = float(os.getenv("SHEETS_RECONNECT_MAX", "300"))
     
     # Data storage settings
     DATA_DIR: str = os.getenv("DATA_DIR", "data")
     EXHIBITIONS_DIR: str = os.path.join(DATA_DIR, "exhibitions")
+    # Where exhibitions are persisted: "json" (one file per exhibition in
+    # EXHIBITIONS_DIR) or "sqlite" (a single database at STORAGE_SQLITE_PATH)
+    STORAGE_BACKEND: str = os.getenv("STORAGE_BACKEND", "json")
+    STORAGE_SQLITE_PATH: str = os.getenv("STORAGE_SQLITE_PATH", os.path.join(DATA_DIR, "exhibitions.db"))
+    # Minimum seconds between checks of EXHIBITIONS_DIR for external changes
+    CATALOG_REFRESH_INTERVAL: float = float(os.getenv("CATALOG_REFRESH_INTERVAL", "2.0"))
+    # Indentation of exhibition files written by the "json" backend; 0 writes them compact
+    STORAGE_JSON_INDENT: int = int(os.getenv("STORAGE_JSON_INDENT", "2"))
+    # Exhibitions read per storage thread call when loading, and calls in flight at once
+    STORAGE_READ_BATCH: int = int(os.getenv("STORAGE_READ_BATCH", "64"))
+    STORAGE_READ_CONCURRENCY: int = int(os.getenv("STORAGE_READ_CONCURRENCY", os.getenv("STORAGE_IO_WORKERS", "4")))
+    # Snapshots (python -m app.services.snapshots): where they are stored,
+    # outside DATA_DIR, and how many prune keeps
+    SNAPSHOT_DIR: str = os.getenv("SNAPSHOT_DIR", "snapshots")
+    SNAPSHOT_KEEP: int = int(os.getenv("SNAPSHOT_KEEP", "14"))
+
+    # Thread pools for blocking I/O: sizes and per-call timeouts (seconds)
+    STORAGE_IO_WORKERS: int = int(os.getenv("STORAGE_IO_WORKERS", "4"))
+    STORAGE_IO_TIMEOUT: float = float(os.getenv("STORAGE_IO_TIMEOUT", "10"))
+    SHEETS_IO_WORKERS: int = int(os.getenv("SHEETS_IO_WORKERS", "4"))
+    SHEETS_IO_TIMEOUT: float = float(os.getenv("SHEETS_IO_TIMEOUT", "30"))
+    IMAGE_WORKERS: int = int(os.getenv("IMAGE_WORKERS", "2"))
+    IMAGE_TIMEOUT: float = float(os.getenv("IMAGE_TIMEOUT", "60"))
+    AUTH_WORKERS: int = int(os.getenv("AUTH_WORKERS", "2"))
+    AUTH_TIMEOUT: float = float(os.getenv("AUTH_TIMEOUT", "5"))
+    
+    # Responsive image derivatives: widths generated for every exhibition image,
+    # (comma-separated), on-disk cache location and size bound (bytes), encoding quality
+    IMAGE_WIDTHS: str = os.getenv("IMAGE_WIDTHS", "320,640,1024,1600")
+    IMAGE_CACHE_DIR: str = os.getenv("IMAGE_CACHE_DIR", os.path.join(DATA_DIR, "image_cache"))
+    IMAGE_CACHE_MAX_BYTES: int = int(os.getenv("IMAGE_CACHE_MAX_BYTES", str(1024 * 1024 * 1024)))
+    IMAGE_QUALITY: int = int(os.getenv("IMAGE_QUALITY", "80"))
+    # Largest source image read (bytes)
+    IMAGE_MAX_SOURCE_BYTES: int = int(os.getenv("IMAGE_MAX_SOURCE_BYTES", str(25 * 1024 * 1024)))
+    # Seconds a request waits for a derivative evicted from the cache to be
+    # generated again before it is redirected to the source image
+    IMAGE_RENDER_WAIT: float = float(os.getenv("IMAGE_RENDER_WAIT", "3"))
+    # Directory served under /static, and the hosts the site is served from:
+    # images under their /static/ path are read from STATIC_DIR, not downloaded
+    STATIC_DIR: str = os.getenv("STATIC_DIR", "static")
+    SITE_HOSTS: List[str] = [
+        host.strip().lower() for host in os.getenv("SITE_HOSTS", "localhost").split(",") if host.strip()
+    ]
+    
+    # HTTP caching for public read endpoints (seconds)
+    HTTP_CACHE_MAX_AGE: int = int(os.getenv("HTTP_CACHE_MAX_AGE", "5"))
+    HTTP_CACHE_STALE_WHILE_REVALIDATE: int = int(os.getenv("HTTP_CACHE_STALE_WHILE_REVALIDATE", "30"))
+    # Number of distinct list responses kept pre-serialized in memory (0 disables)
+    RESPONSE_CACHE_SIZE: int = int(os.getenv("RESPONSE_CACHE_SIZE", "256"))
+    
+    # Response compression: smallest body compressed (bytes) and encoder levels
+    COMPRESSION_MIN_SIZE: int = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+    COMPRESSION_GZIP_LEVEL: int = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+    COMPRESSION_BROTLI_QUALITY: int = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "5"))
+    
+    # Production server (python -m app.server): worker processes (0 = one per
+    # available CPU), and the addresses or networks (CIDR) of proxies trusted
+    # for X-Forwarded-For/-Proto; "*" trusts any peer, letting clients choose
+    # the address they are rate limited by
+    WEB_CONCURRENCY: int = int(os.getenv("WEB_CONCURRENCY", "0"))
+    FORWARDED_ALLOW_IPS: str = os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1,::1")
+    # Files through which worker processes tell each other about changes
+    # (exhibition writes, token revocations) and elect a queue leader
+    SHARED_STATE_DIR: str = os.getenv("SHARED_STATE_DIR", os.path.join(DATA_DIR, "shared"))
+    
+    # Metrics: directory where each worker process shares its snapshot, and
+    # seconds between snapshots (0 disables sharing, e.g. with a single worker)
+    METRICS_DIR: str = os.getenv("METRICS_DIR", os.path.join(DATA_DIR, "metrics"))
+    METRICS_EXPORT_INTERVAL: float = float(os.getenv("METRICS_EXPORT_INTERVAL", "5"))
+    
+    # Request profiling: sampling interval for admin requests sent with
+    # X-Profile: 1 (or ?profile=1); requests slower than SLOW_REQUEST_THRESHOLD
+    # seconds are profiled at SLOW_REQUEST_SAMPLE_INTERVAL (0 disables);
+    # directory where the workers keep profiles, and how many are kept
+    PROFILE_SAMPLE_INTERVAL: float = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.001"))
+    SLOW_REQUEST_THRESHOLD: float = float(os.getenv("SLOW_REQUEST_THRESHOLD", "0"))
+    SLOW_REQUEST_SAMPLE_INTERVAL: float = float(os.getenv("SLOW_REQUEST_SAMPLE_INTERVAL", "0.01"))
+    PROFILE_DIR: str = os.getenv("PROFILE_DIR", os.path.join(DATA_DIR, "profiles"))
+    PROFILE_BUFFER_SIZE: int = int(os.getenv("PROFILE_BUFFER_SIZE", "50"))
     
     # Secret key for tokens
     SECRET_KEY: str = os.getenv("SECRET_KEY", "super-secret-key-for-development-only")
+    # Verified access tokens kept in memory, so that requests skip decoding
+    TOKEN_CACHE_SIZE: int = int(os.getenv("TOKEN_CACHE_SIZE", "1024"))
+    
+    # Admin accounts: "env" (ADMIN_USERNAME with ADMIN_PASSWORD_HASH) or "file"
+    # (a JSON object of usernames to hashes at ADMIN_CREDENTIALS_FILE). Hashes
+    # are made with: python -m app.services.credentials hash
+    ADMIN_CREDENTIALS_BACKEND: str = os.getenv("ADMIN_CREDENTIALS_BACKEND", "env")
+    ADMIN_USERNAME: str = os.getenv("ADMIN_USERNAME", "admin")
+    ADMIN_PASSWORD_HASH: str = os.getenv("ADMIN_PASSWORD_HASH", "")
+    ADMIN_CREDENTIALS_FILE: str = os.getenv(
+        "ADMIN_CREDENTIALS_FILE", os.path.join(DATA_DIR, "admin_credentials.json")
+    )
     
     class Config:
         env_file = ".env"
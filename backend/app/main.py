@@ -1,15 +1,63 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 
-from app.api import exhibitions, archive, open_call, admin
+from app.api import exhibitions, archive, open_call, admin, health, images, metrics
+from app.api.compression import CompressionMiddleware, PrecompressedStaticFiles
+from app.api.forwarded import ForwardedHeadersMiddleware
+from app.api.profiling import ProfilingMiddleware
 from app.config import settings
 from app.services.auth import get_current_user
+from app.services.coherence import leader
+from app.services.executor import STORAGE, blocking_io
+from app.services.google_sheets import google_sheets_service
+from app.services.images import image_service
+from app.services.json_storage import json_storage_service
+from app.services.metrics import metrics_exporter
+from app.services.registration_queue import registration_worker
+
+
+async def load_catalog() -> None:
+    try:
+        await json_storage_service.load()
+    except Exception as e:
+        # Requests retry the load; /api/ready reports the error meanwhile
+        print(f"Error loading exhibitions: {e}")
+        return
+    # Generate derivatives of images not seen before, e.g. after a restore;
+    # one worker process is enough
+    if await blocking_io.run(STORAGE, leader.try_acquire):
+        image_service.schedule(await json_storage_service.get_all_exhibitions(), refresh=False)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Nothing here waits for I/O, so connections are accepted right away.
+    # Exhibitions load in the background; requests arriving meanwhile wait
+    # for the load, and /api/ready answers 503 until it is done
+    loading = asyncio.create_task(load_catalog())
+    # Connect to Google Sheets in the background, retrying until it works
+    google_sheets_service.start()
+    # Deliver journaled registrations, including any left from a previous run
+    registration_worker.start()
+    # Share this worker's metrics with the others for /api/metrics
+    metrics_exporter.start()
+    yield
+    loading.cancel()
+    await metrics_exporter.stop()
+    await registration_worker.stop()
+    await google_sheets_service.stop()
+    image_service.stop()
+    blocking_io.shutdown()
+
 
 app = FastAPI(
     title="Exhibition Platform API",
     description="Backend API for the exhibition platform",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS middleware configuration
@@ -20,11 +68,23 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Compress JSON responses not already compressed from the response cache
+app.add_middleware(CompressionMiddleware)
+# Sample admin requests sent with X-Profile: 1, and slow requests if enabled
+app.add_middleware(ProfilingMiddleware)
+# Around the other middleware, so that request timings include it
+app.add_middleware(metrics.MetricsMiddleware)
+# Before anything sees the request, take the client address from trusted proxies
+app.add_middleware(ForwardedHeadersMiddleware)
 
 # API routes
 app.include_router(exhibitions.router, prefix="/api/exhibitions", tags=["exhibitions"])
 app.include_router(archive.router, prefix="/api/archive", tags=["archive"])
+app.include_router(images.router, prefix="/api/images", tags=["images"])
 app.include_router(open_call.router, prefix="/api/open-call", tags=["open-call"])
+app.include_router(metrics.router, prefix="/api", tags=["monitoring"])
+app.include_router(health.router, prefix="/api", tags=["monitoring"])
+app.include_router(admin.login_router, prefix="/api/admin", tags=["admin"])
 app.include_router(
     admin.router, 
     prefix="/api/admin", 
@@ -32,16 +92,8 @@ app.include_router(
     dependencies=[Depends(get_current_user)]
 )
 
-# Mount static files if needed
-app.mount("/static", StaticFiles(directory="static"), name="static")
-
-@app.get("/api/health", status_code=200)
-async def health_check():
-    """
-    Health check endpoint for container monitoring.
-    Returns a 200 status code if the API is running.
-    """
-    return {"status": "healthy", "service": "backend"}
+# Mount static files if needed, preferring precompressed .br/.gz siblings
+app.mount("/static", PrecompressedStaticFiles(directory=settings.STATIC_DIR), name="static")
 
 if __name__ == "__main__":
     import uvicorn
@@ -33,4 +33,5 @@ class Exhibition(BaseModel):
     artworks: List[Artwork] = Field(default=[], description="Exhibited artworks")
     featured_image_url: Optional[HttpUrl] = Field(None, description="URL to featured image")
     is_featured: bool = Field(False, description="Whether exhibition is featured on homepage")
-    is_archived: bool = Field(False, description="Whether exhibition is archived") 
\ No newline at end of file
+    is_archived: bool = Field(False, description="Whether exhibition is archived")
+    version: int = Field(0, description="Revision number, set by the server and incremented on every save") 
\ No newline at end of file
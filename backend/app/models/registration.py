@@ -3,13 +3,18 @@ from typing import List, Optional
 from datetime import datetime
 from uuid import UUID
 
+# Google Sheets rejects cells longer than this
+MAX_CELL_LENGTH = 50000
+
 
 class RegistrationCreate(BaseModel):
     """Schema for creating a new artist registration"""
     name: str = Field(..., min_length=2, description="Artist's full name")
     email: EmailStr = Field(..., description="Artist's email address")
     website: Optional[HttpUrl] = Field(None, description="Artist's website URL")
-    artist_statement: str = Field(..., min_length=50, description="Artist's statement or bio")
+    artist_statement: str = Field(
+        ..., min_length=50, max_length=MAX_CELL_LENGTH, description="Artist's statement or bio"
+    )
     work_sample_urls: List[HttpUrl] = Field(..., min_items=1, description="URLs to work samples")
 
 
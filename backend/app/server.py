@@ -0,0 +1,67 @@
+"""
+Production entry point: several uvicorn worker processes, no reloader,
+uvloop and httptools.
+
+Usage (from backend/):
+    python -m app.server [--host 0.0.0.0] [--port 8000] [--workers N]
+
+Worker processes share exhibition changes, token revocations and the
+registration queue through the files in SHARED_STATE_DIR (see
+``app.services.coherence``), so any number of them can serve the API.
+"""
+import argparse
+import math
+import os
+import sys
+from typing import List, Optional
+
+import uvicorn
+
+from app.config import settings
+
+
+def available_cpus() -> int:
+    """CPUs this process may use, honouring affinity and cgroup (container) quotas"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    try:
+        with open("/sys/fs/cgroup/cpu.max", mode='r') as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            cpus = min(cpus, math.ceil(int(quota) / int(period)))
+    except (OSError, ValueError):
+        pass
+    return max(cpus, 1)
+
+
+def default_workers() -> int:
+    """One event loop per CPU: requests are I/O bound and blocking work runs in thread pools"""
+    return settings.WEB_CONCURRENCY or available_cpus()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=None, help="defaults to WEB_CONCURRENCY or the CPU count")
+    args = parser.parse_args(argv)
+
+    workers = args.workers or default_workers()
+    print(f"Starting {workers} worker process{'es' if workers > 1 else ''} on {args.host}:{args.port}")
+    uvicorn.run(
+        "app.main:app",
+        host=args.host,
+        port=args.port,
+        workers=workers,
+        loop="uvloop",
+        http="httptools",
+        # X-Forwarded-* headers from nginx are applied by ForwardedHeadersMiddleware
+        proxy_headers=False,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,171 @@
+import hashlib
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from app.config import settings
+from app.models.registration import RegistrationCreate
+from app.services.registration_queue import Submission
+
+
+class RegistrationRejected(Exception):
+    """A registration was refused before any work was done; it may be retried after ``retry_after`` seconds"""
+
+    def __init__(self, retry_after: float, message: str):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class SubmissionConflict(Exception):
+    """A submission repeats an earlier one that cannot be replayed to it"""
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class TokenBucketLimiter:
+    """
+    A token bucket per client: ``burst`` requests at once, refilled at
+    ``rate`` per second.
+
+    Buckets of the least recently seen clients are dropped beyond
+    ``max_clients``; a dropped client starts again with a full bucket.
+    """
+
+    def __init__(self, rate: float, burst: int, max_clients: int):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        # Client -> (tokens, time of last refill)
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    def acquire(self, client: str, now: Optional[float] = None) -> float:
+        """Take a token, returning 0, or the seconds until one is available"""
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic() if now is None else now
+        tokens, refilled_at = self._buckets.pop(client, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - refilled_at) * self.rate)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / self.rate
+        self._buckets[client] = (tokens, now)
+        while len(self._buckets) > self.max_clients:
+            self._buckets.popitem(last=False)
+        return wait
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+def submission_keys(registration: RegistrationCreate, idempotency_key: Optional[str] = None) -> List[str]:
+    """
+    Keys identifying a submission: the client's idempotency key, if any, and
+    a digest of the email address and artist statement, compared without
+    regard to case and whitespace.
+    """
+    statement = " ".join(registration.artist_statement.split()).casefold()
+    content = hashlib.sha256(f"{registration.email.casefold()}\0{statement}".encode()).hexdigest()
+    keys = [f"content:{content}"]
+    if idempotency_key:
+        keys.insert(0, f"key:{idempotency_key}")
+    return keys
+
+
+def submission_fingerprint(registration: RegistrationCreate) -> str:
+    """Digest of everything submitted, to tell a retry from a reused Idempotency-Key"""
+    return hashlib.sha256(registration.model_dump_json().encode()).hexdigest()
+
+
+class RegistrationAdmission:
+    """
+    Admission control for open-call registrations.
+
+    A submission is refused with ``RegistrationRejected`` if its client
+    exceeds its rate, or if more than ``max_pending`` registrations are
+    already being checked or written, which sheds load before it piles up
+    behind the storage pool. Admitted submissions that repeat an earlier
+    one are recognized by the registration journal, which all worker
+    processes share, and answered by ``replay``, so retries and double
+    clicks cost neither a journal write nor a Sheets row.
+
+    Rates and counts are kept in memory per worker process, so with N
+    workers a client may submit up to N times its rate, and up to N times
+    ``max_pending`` registrations may be in progress. Everything runs on
+    the event loop, so no locking is needed.
+    """
+
+    def __init__(
+        self,
+        rate: Optional[float] = None,
+        burst: Optional[int] = None,
+        max_clients: Optional[int] = None,
+        max_pending: Optional[int] = None,
+    ):
+        self.limiter = TokenBucketLimiter(
+            settings.REGISTRATION_RATE_LIMIT if rate is None else rate,
+            settings.REGISTRATION_RATE_BURST if burst is None else burst,
+            settings.REGISTRATION_RATE_CLIENTS if max_clients is None else max_clients,
+        )
+        self.max_pending = settings.REGISTRATION_MAX_PENDING if max_pending is None else max_pending
+        self.pending = 0
+        self.duplicates = 0
+        self.conflicts = 0
+        self.rate_limited = 0
+        self.shed = 0
+
+    def replay(self, earlier: Submission, fingerprint: str) -> str:
+        """
+        The ID to answer a repeated submission with.
+
+        Only a retry with the same Idempotency-Key and the same content gets
+        the original ID. The key is a secret of the client that sent it, but
+        an email address and statement are not, so a submission repeating
+        only those is refused without revealing the ID, which status lookups
+        accept. So is a key reused for different content.
+        """
+        key, registration_id, earlier_fingerprint = earlier
+        if key.startswith("key:") and earlier_fingerprint != fingerprint:
+            self.conflicts += 1
+            raise SubmissionConflict(422, "This Idempotency-Key was already used for a different registration")
+        self.duplicates += 1
+        if not key.startswith("key:"):
+            raise SubmissionConflict(409, "This registration was already submitted")
+        return registration_id
+
+    def admit(self, client: str) -> None:
+        """Refuse a new registration if its client or the server is over its limit"""
+        if 0 < self.max_pending <= self.pending:
+            self.shed += 1
+            raise RegistrationRejected(1.0, "Too many registrations are being processed, please retry shortly")
+        wait = self.limiter.acquire(client)
+        if wait > 0:
+            self.rate_limited += 1
+            raise RegistrationRejected(wait, "Too many registrations from this address, please retry shortly")
+
+    @contextmanager
+    def writing(self) -> Iterator[None]:
+        """Count a registration as pending while it is checked for duplicates and written"""
+        self.pending += 1
+        try:
+            yield
+        finally:
+            self.pending -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": self.pending,
+            "clients": len(self.limiter),
+            "duplicates": self.duplicates,
+            "conflicts": self.conflicts,
+            "rate_limited": self.rate_limited,
+            "shed": self.shed,
+        }
+
+
+# Initialize the admission controller as a singleton
+registration_admission = RegistrationAdmission()
@@ -1,18 +1,156 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
 
 from app.config import settings
+from app.services.coherence import SharedCounter, revocation_changes, shared_path
+from app.services.credentials import CredentialStore, create_credential_store, hash_password, verify_password
+from app.services.executor import AUTH, STORAGE, blocking_io
 
 # OAuth2 scheme for token authentication
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/admin/token")
 
-# Admin credentials would typically be stored in a database
-# For simplicity, we'll use a hardcoded admin in this example
-ADMIN_USERNAME = "admin"
-ADMIN_PASSWORD = "password"  # In production, this would be hashed
+
+class TokenCache:
+    """
+    Recently verified access tokens, keyed by the SHA-256 of the token.
+
+    Admin pages send many requests at once with the same token; only the
+    first is decoded. Entries expire with the token's ``exp`` and the least
+    recently used are dropped beyond ``max_entries``. Revoked tokens are
+    remembered until they would have expired anyway.
+
+    Given a ``revocations_path`` and ``changes`` counter, revocations are
+    shared with the other worker processes: each one is added to the file
+    and the counter incremented, and the file is read again by any process
+    that sees the counter move.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        revocations_path: Optional[str] = None,
+        changes: Optional[SharedCounter] = None,
+    ):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[Dict[str, Any], float]]" = OrderedDict()
+        self._revoked: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self.revocations_path = revocations_path
+        self.changes = changes
+        self.shared = revocations_path is not None and changes is not None
+        self._seen_changes: Optional[int] = None
+
+    @staticmethod
+    def key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """The user of a verified, unexpired and unrevoked token"""
+        now = time.time()
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is None:
+                return None
+            user, expires_at = cached
+            if expires_at <= now:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return user
+
+    def put(self, key: str, user: Dict[str, Any], expires_at: float) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            if key in self._revoked:
+                return
+            self._entries[key] = (user, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def revoke(self, key: str, expires_at: float) -> None:
+        """Reject a token from now on, until it expires"""
+        now = time.time()
+        with self._lock:
+            self._entries.pop(key, None)
+            # Forget revocations of tokens that expired in the meantime
+            for expired in [k for k, until in self._revoked.items() if until <= now]:
+                del self._revoked[expired]
+            self._revoked[key] = expires_at
+
+    def is_revoked(self, key: str) -> bool:
+        with self._lock:
+            return key in self._revoked
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._revoked.clear()
+
+    @property
+    def revocations_changed(self) -> bool:
+        """Whether another process may have revoked tokens since they were last read"""
+        return self.shared and (self.changes.value is None or self.changes.value != self._seen_changes)
+
+    def _read_revocations(self) -> Dict[str, float]:
+        try:
+            with open(self.revocations_path, mode='r') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def load_revocations(self) -> None:
+        """Adopt the revocations of every process (blocking)"""
+        try:
+            self.changes.open()
+        except OSError as e:
+            print(f"Warning: Could not share token revocations: {e}")
+            self.shared = False
+            return
+        # Read before the file, so that a revocation made meanwhile is not missed
+        seen = self.changes.value
+        now = time.time()
+        revoked = {key: until for key, until in self._read_revocations().items() if until > now}
+        with self._lock:
+            for key in revoked:
+                self._entries.pop(key, None)
+            self._revoked.update(revoked)
+        self._seen_changes = seen
+
+    def share_revocation(self, key: str, expires_at: float) -> None:
+        """Add a revocation to the shared file (blocking)"""
+        def update() -> None:
+            now = time.time()
+            revoked = {k: until for k, until in self._read_revocations().items() if until > now}
+            revoked[key] = expires_at
+            temp_path = f"{self.revocations_path}.{uuid.uuid4().hex}.tmp"
+            with open(temp_path, mode='w') as f:
+                json.dump(revoked, f)
+            os.replace(temp_path, self.revocations_path)
+
+        changes = self.changes.increment(update)
+        # Only our own revocation happened since the last read: nothing to reload
+        if self._seen_changes is not None and changes == self._seen_changes + 1:
+            self._seen_changes = changes
+
+
+# Initialize the token cache and credential store as singletons
+token_cache = TokenCache(settings.TOKEN_CACHE_SIZE, shared_path("revoked_tokens.json"), revocation_changes)
+credential_store: CredentialStore = create_credential_store()
+
+# Checked for unknown usernames, so that they take as long as wrong passwords
+_unknown_user_hash: Optional[str] = None
 
 
 def create_access_token(data: Dict[str, Any], expires_delta: Optional[timedelta] = None) -> str:
@@ -25,34 +163,76 @@ def create_access_token(data: Dict[str, Any], expires_delta: Optional[timedelta]
     else:
         expire = datetime.utcnow() + timedelta(minutes=30)
     
-    to_encode.update({"exp": expire})
+    # A unique ID, so that revoking one token never revokes another
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex})
     
     # Create JWT token
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm="HS256")
     return encoded_jwt
 
 
-async def get_current_user(token: str = Depends(oauth2_scheme)) -> Dict[str, Any]:
-    """Validate the access token and return the current user"""
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    
+def decode_token(token: str) -> Optional[Dict[str, Any]]:
+    """The claims of a validly signed, unexpired access token, or None"""
     try:
-        # Decode and validate JWT token
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
-        username: str = payload.get("sub")
-        
-        if username is None:
-            raise credentials_exception
-        
-        # Return user information
-        return {"username": username, "is_admin": True}
-        
+        return jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
     except JWTError:
-        raise credentials_exception
+        return None
+
+
+def user_from_token(token: str) -> Optional[Dict[str, Any]]:
+    """Get the user an access token was issued to, or None if it is not valid"""
+    key = TokenCache.key(token)
+    user = token_cache.get(key)
+    if user is not None:
+        return user
+    if token_cache.is_revoked(key):
+        return None
+    
+    # Decode and validate JWT token
+    payload = decode_token(token)
+    if payload is None:
+        return None
+    
+    username: str = payload.get("sub")
+    if username is None:
+        return None
+    
+    # Return user information
+    user = {"username": username, "is_admin": True}
+    # Tokens always carry exp (see create_access_token)
+    token_cache.put(key, user, float(payload.get("exp", 0)))
+    return user
+
+
+async def sync_revocations() -> None:
+    """Pick up tokens revoked by other worker processes"""
+    if token_cache.revocations_changed:
+        await blocking_io.run(STORAGE, token_cache.load_revocations)
+
+
+async def revoke_token(token: str) -> None:
+    """Reject a token from now on, in every worker process, e.g. on logout"""
+    payload = decode_token(token)
+    if payload is None:
+        return
+    key = TokenCache.key(token)
+    expires_at = float(payload.get("exp", 0))
+    token_cache.revoke(key, expires_at)
+    if token_cache.shared:
+        await blocking_io.run(STORAGE, token_cache.share_revocation, key, expires_at)
+
+
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> Dict[str, Any]:
+    """Validate the access token and return the current user"""
+    await sync_revocations()
+    user = user_from_token(token)
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return user
 
 
 async def verify_admin(user: Dict[str, Any] = Depends(get_current_user)) -> Dict[str, Any]:
@@ -65,8 +245,21 @@ async def verify_admin(user: Dict[str, Any] = Depends(get_current_user)) -> Dict
     return user
 
 
-def authenticate_user(username: str, password: str) -> Optional[Dict[str, Any]]:
+def check_credentials(username: str, password: str) -> bool:
+    """Check a username and password against the credential store (blocking)"""
+    global _unknown_user_hash
+    password_hash = credential_store.password_hash(username)
+    if password_hash is None:
+        if _unknown_user_hash is None:
+            _unknown_user_hash = hash_password(password)
+        verify_password(password, _unknown_user_hash)
+        return False
+    return verify_password(password, password_hash)
+
+
+async def authenticate_user(username: str, password: str) -> Optional[Dict[str, Any]]:
     """Authenticate a user with username and password"""
-    if username == ADMIN_USERNAME and password == ADMIN_PASSWORD:
+    # The slow hash runs in the auth thread pool, off the event loop
+    if await blocking_io.run(AUTH, check_credentials, username, password):
         return {"username": username, "is_admin": True}
-    return None 
\ No newline at end of file
+    return None
@@ -0,0 +1,207 @@
+import asyncio
+import fcntl
+import mmap
+import os
+import struct
+import threading
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncContextManager, AsyncIterator, Callable, ContextManager, Iterator, Optional
+
+from app.config import settings
+
+COUNTER = struct.Struct("<Q")
+
+
+class SharedCounter:
+    """
+    A counter shared by the worker processes of one host through a
+    memory-mapped file.
+
+    Processes increment it after changing shared state and compare it with
+    the last value they saw before serving from their own caches. Reading
+    it is a memory access, cheap enough for every request, so a change made
+    by one worker is noticed by the others on their next request. ``value``
+    is None until ``open()`` (blocking) has been called.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd: Optional[int] = None
+        self._map: Optional[mmap.mmap] = None
+        self._lock = threading.Lock()
+
+    def open(self) -> None:
+        with self._lock:
+            if self._map is not None:
+                return
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            # Extending to the counter's size is idempotent, so racing processes agree
+            if os.fstat(fd).st_size < COUNTER.size:
+                os.ftruncate(fd, COUNTER.size)
+            self._map = mmap.mmap(fd, COUNTER.size)
+            self._fd = fd
+
+    @property
+    def value(self) -> Optional[int]:
+        if self._map is None:
+            return None
+        return COUNTER.unpack_from(self._map)[0]
+
+    def increment(self, update: Optional[Callable[[], None]] = None) -> int:
+        """
+        Increment the counter, returning the new value (blocking).
+
+        ``update`` is called first while holding the counter's lock, which
+        serializes changes to a shared file across processes.
+        """
+        self.open()
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            if update is not None:
+                update()
+            value = COUNTER.unpack_from(self._map)[0] + 1
+            COUNTER.pack_into(self._map, 0, value)
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        return value
+
+    def close(self) -> None:
+        with self._lock:
+            if self._map is not None:
+                self._map.close()
+                os.close(self._fd)
+                self._map = None
+                self._fd = None
+
+
+class LeaderLock:
+    """
+    Elects one worker process for work that must not run in every worker,
+    such as draining the registration queue.
+
+    The leader holds an exclusive lock on a file; the lock is released by
+    the kernel when the process exits, so another worker takes over on its
+    next attempt.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd: Optional[int] = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_leader(self) -> bool:
+        return self._fd is not None
+
+    def try_acquire(self) -> bool:
+        """Become the leader if no other process is (blocking, but never waits)"""
+        with self._lock:
+            if self._fd is not None:
+                return True
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                return False
+            self._fd = fd
+            return True
+
+    def release(self) -> None:
+        with self._lock:
+            if self._fd is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+                os.close(self._fd)
+                self._fd = None
+
+
+class SharedLock:
+    """
+    A lock on a file that many processes may hold shared, or one exclusively.
+
+    Exhibition writers hold it shared while they write, so they never wait
+    for each other; a snapshot holds it exclusively while it catches up
+    with the writes made during its read, so it sees either all or none of
+    a batch of writes. Each acquisition opens its own descriptor, so
+    threads of one process hold it independently.
+    """
+
+    # Longest wait between attempts of the async acquisitions (seconds)
+    MAX_POLL_INTERVAL = 0.05
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def _open(self) -> int:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        return os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+
+    @contextmanager
+    def _held(self, operation: int) -> Iterator[None]:
+        fd = self._open()
+        try:
+            fcntl.flock(fd, operation)
+            yield
+        finally:
+            # Closing the descriptor releases the lock
+            os.close(fd)
+
+    def shared(self) -> ContextManager[None]:
+        """Hold the lock shared (blocking)"""
+        return self._held(fcntl.LOCK_SH)
+
+    def exclusive(self) -> ContextManager[None]:
+        """Hold the lock exclusively (blocking)"""
+        return self._held(fcntl.LOCK_EX)
+
+    @asynccontextmanager
+    async def _held_async(self, operation: int) -> AsyncIterator[None]:
+        """
+        Hold the lock from async code, polling until it is free.
+
+        Waiting in a thread instead could leave the lock taken by a thread
+        whose caller timed out; polling never blocks the event loop and
+        gives up the descriptor however the wait ends.
+        """
+        fd = self._open()
+        try:
+            interval = 0.001
+            while True:
+                try:
+                    fcntl.flock(fd, operation | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    await asyncio.sleep(interval)
+                    interval = min(interval * 2, self.MAX_POLL_INTERVAL)
+            yield
+        finally:
+            os.close(fd)
+
+    def shared_async(self) -> AsyncContextManager[None]:
+        """Hold the lock shared from async code"""
+        return self._held_async(fcntl.LOCK_SH)
+
+    def exclusive_async(self) -> AsyncContextManager[None]:
+        """Hold the lock exclusively from async code"""
+        return self._held_async(fcntl.LOCK_EX)
+
+
+def shared_path(name: str) -> str:
+    return os.path.join(settings.SHARED_STATE_DIR, name)
+
+
+# Initialize the cross-process channels as singletons
+catalog_changes = SharedCounter(shared_path("catalog.version"))
+revocation_changes = SharedCounter(shared_path("revocations.version"))
+registration_signal = SharedCounter(shared_path("registrations.signal"))
+leader = LeaderLock(shared_path("leader.lock"))
+storage_lock = SharedLock(shared_path("storage.lock"))
+exhibition_writers = SharedLock(shared_path("writers.lock"))
@@ -0,0 +1,193 @@
+"""
+Admin credentials: salted password hashes and the stores that hold them.
+
+Usage (from backend/):
+    python -m app.services.credentials hash
+    python -m app.services.credentials set <username> [--file PATH]
+
+``hash`` prints a hash to put in ADMIN_PASSWORD_HASH; ``set`` adds or
+replaces an account in the credentials file used when
+ADMIN_CREDENTIALS_BACKEND=file. Passwords are prompted for, never passed
+as arguments.
+"""
+import argparse
+import base64
+import getpass
+import hashlib
+import hmac
+import json
+import os
+import sys
+import threading
+import uuid
+from typing import Dict, List, Optional, Protocol
+
+from app.config import settings
+
+# scrypt cost: about 50 ms and 16 MiB per check, which makes guessing slow
+# while a login still feels instant
+SCRYPT_N = 2 ** 14
+SCRYPT_R = 8
+SCRYPT_P = 1
+# Upper bound on the memory a stored hash's parameters may ask for (bytes)
+SCRYPT_MAX_MEMORY = 128 * 1024 * 1024
+
+# Password accepted in development when no hash is configured
+DEVELOPMENT_PASSWORD = "password"
+
+
+def _encode(data: bytes) -> str:
+    return base64.b64encode(data).decode("ascii")
+
+
+def hash_password(password: str) -> str:
+    """Hash a password with scrypt and a random salt, in a self-describing format"""
+    salt = os.urandom(16)
+    digest = hashlib.scrypt(password.encode(), salt=salt, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P, dklen=32)
+    return f"scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${_encode(salt)}${_encode(digest)}"
+
+
+def verify_password(password: str, encoded: str) -> bool:
+    """
+    Check a password against a stored hash (blocking: tens of milliseconds).
+
+    Both ``scrypt$n$r$p$salt$hash`` and ``pbkdf2_sha256$iterations$salt$hash``
+    hashes are understood; anything else never matches.
+    """
+    try:
+        algorithm, *params = encoded.split("$")
+        if algorithm == "scrypt":
+            n, r, p, salt, expected = params
+            expected = base64.b64decode(expected)
+            digest = hashlib.scrypt(
+                password.encode(), salt=base64.b64decode(salt), n=int(n), r=int(r), p=int(p),
+                maxmem=SCRYPT_MAX_MEMORY, dklen=len(expected),
+            )
+        elif algorithm == "pbkdf2_sha256":
+            iterations, salt, expected = params
+            expected = base64.b64decode(expected)
+            digest = hashlib.pbkdf2_hmac(
+                "sha256", password.encode(), base64.b64decode(salt), int(iterations), len(expected)
+            )
+        else:
+            return False
+    except ValueError:
+        return False
+    return hmac.compare_digest(digest, expected)
+
+
+class CredentialStore(Protocol):
+    """Where admin password hashes come from"""
+
+    def password_hash(self, username: str) -> Optional[str]:
+        """The stored hash for a username, or None if there is no such account"""
+        ...
+
+
+class EnvCredentialStore:
+    """
+    A single admin account from ADMIN_USERNAME and ADMIN_PASSWORD_HASH.
+
+    Without a hash, development setups accept DEVELOPMENT_PASSWORD and
+    other environments accept no password at all.
+    """
+
+    def __init__(self, username: Optional[str] = None, password_hash: Optional[str] = None):
+        self.username = username or settings.ADMIN_USERNAME
+        self.hash = password_hash if password_hash is not None else settings.ADMIN_PASSWORD_HASH
+        self._lock = threading.Lock()
+
+    def password_hash(self, username: str) -> Optional[str]:
+        if not hmac.compare_digest(username.encode(), self.username.encode()):
+            return None
+        if not self.hash and settings.ENVIRONMENT == "development":
+            with self._lock:
+                if not self.hash:
+                    print("Warning: ADMIN_PASSWORD_HASH is not set, accepting the development password")
+                    self.hash = hash_password(DEVELOPMENT_PASSWORD)
+        return self.hash or None
+
+
+class FileCredentialStore:
+    """
+    Admin accounts in a JSON file mapping usernames to hashes.
+
+    The file is read again whenever it changes, so accounts can be added
+    or changed without a restart.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or settings.ADMIN_CREDENTIALS_FILE
+        self._hashes: Dict[str, str] = {}
+        self._mtime: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def _read(self) -> Dict[str, str]:
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            return {}
+        with self._lock:
+            if mtime != self._mtime:
+                with open(self.path, mode='r') as f:
+                    self._hashes = json.load(f)
+                self._mtime = mtime
+            return self._hashes
+
+    def password_hash(self, username: str) -> Optional[str]:
+        return self._read().get(username)
+
+    def set(self, username: str, password_hash: str) -> None:
+        """Add or replace an account, writing the file atomically"""
+        hashes = {**self._read(), username: password_hash}
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{self.path}.{uuid.uuid4().hex}.tmp"
+        # Readable by the owner only
+        fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, mode='w') as f:
+            json.dump(hashes, f, indent=2, sort_keys=True)
+        os.replace(temp_path, self.path)
+
+
+def create_credential_store(name: Optional[str] = None) -> CredentialStore:
+    """Create the credential store selected by ``name`` or ADMIN_CREDENTIALS_BACKEND"""
+    name = name or settings.ADMIN_CREDENTIALS_BACKEND
+    if name == "env":
+        return EnvCredentialStore()
+    if name == "file":
+        return FileCredentialStore()
+    raise ValueError(f"Unknown admin credentials backend: {name}")
+
+
+def _prompt_password() -> str:
+    password = getpass.getpass("Password: ")
+    if password != getpass.getpass("Repeat password: "):
+        raise SystemExit("Passwords do not match")
+    if not password:
+        raise SystemExit("Password must not be empty")
+    return password
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("hash", help="print the hash of a password")
+    set_parser = commands.add_parser("set", help="add or replace an account in the credentials file")
+    set_parser.add_argument("username")
+    set_parser.add_argument("--file", default=None, help="defaults to ADMIN_CREDENTIALS_FILE")
+    args = parser.parse_args(argv)
+
+    password_hash = hash_password(_prompt_password())
+    if args.command == "hash":
+        print(password_hash)
+    else:
+        store = FileCredentialStore(args.file)
+        store.set(args.username, password_hash)
+        print(f"Saved {args.username} to {store.path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
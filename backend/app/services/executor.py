@@ -0,0 +1,126 @@
+import asyncio
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+from app.config import settings
+from app.services.metrics import (
+    BLOCKING_IO_DURATION,
+    BLOCKING_IO_ERRORS,
+    BLOCKING_IO_TIMEOUTS,
+    BLOCKING_IO_WAIT,
+)
+from app.services.profiling import current_profile, working_for
+
+T = TypeVar("T")
+
+# Pool names
+STORAGE = "storage"
+SHEETS = "sheets"
+IMAGES = "images"
+AUTH = "auth"
+
+# Timeout for calls whose outcome the caller must know, such as durable
+# writes: they are awaited until the thread finishes
+UNBOUNDED = math.inf
+
+
+class BlockingExecutor:
+    """
+    Bounded thread pools for blocking calls made from async code.
+
+    Each kind of I/O gets its own pool so that, for example, a slow Google
+    Sheets call can occupy at most the Sheets pool and never the threads
+    that serve file reads. Every call is bounded by a timeout; the caller
+    gets ``asyncio.TimeoutError`` while the thread finishes in the
+    background.
+    """
+
+    def __init__(self, sizes: Dict[str, int], timeouts: Dict[str, float]):
+        self.sizes = sizes
+        self.timeouts = timeouts
+        self._pools: Dict[str, ThreadPoolExecutor] = {}
+        self._lock = threading.Lock()
+
+    def pool(self, name: str) -> ThreadPoolExecutor:
+        """Get the pool for a kind of I/O, creating it on first use"""
+        pool = self._pools.get(name)
+        if pool is None:
+            with self._lock:
+                pool = self._pools.get(name)
+                if pool is None:
+                    pool = ThreadPoolExecutor(
+                        max_workers=self.sizes[name], thread_name_prefix=f"{name}-io"
+                    )
+                    self._pools[name] = pool
+        return pool
+
+    async def run(
+        self,
+        name: str,
+        func: Callable[..., T],
+        *args: Any,
+        timeout: Optional[float] = None,
+        **kwargs: Any,
+    ) -> T:
+        """
+        Run a blocking function in the named pool and await its result.
+
+        The time spent waiting for a thread and running, errors and
+        timeouts are recorded per pool and function. When the calling
+        request is being profiled, the thread is sampled with it. A
+        ``timeout`` of UNBOUNDED waits for the call however long it takes.
+        """
+        loop = asyncio.get_running_loop()
+        operation = getattr(func, "__qualname__", type(func).__name__)
+        # Lets a profiled request's samples include its blocking work
+        profile = current_profile.get()
+        submitted = time.perf_counter()
+
+        def call() -> T:
+            started = time.perf_counter()
+            BLOCKING_IO_WAIT.observe(started - submitted, name)
+            try:
+                with working_for(profile):
+                    return func(*args, **kwargs)
+            except Exception:
+                BLOCKING_IO_ERRORS.inc(name, operation)
+                raise
+            finally:
+                BLOCKING_IO_DURATION.observe(time.perf_counter() - started, name, operation)
+
+        future = loop.run_in_executor(self.pool(name), call)
+        timeout = timeout or self.timeouts[name]
+        if timeout == UNBOUNDED:
+            return await future
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            BLOCKING_IO_TIMEOUTS.inc(name, operation)
+            raise
+
+    def shutdown(self) -> None:
+        """Stop accepting work; running calls are left to finish"""
+        with self._lock:
+            for pool in self._pools.values():
+                pool.shutdown(wait=False)
+            self._pools.clear()
+
+
+# Initialize the executor as a singleton
+blocking_io = BlockingExecutor(
+    sizes={
+        STORAGE: settings.STORAGE_IO_WORKERS,
+        SHEETS: settings.SHEETS_IO_WORKERS,
+        IMAGES: settings.IMAGE_WORKERS,
+        AUTH: settings.AUTH_WORKERS,
+    },
+    timeouts={
+        STORAGE: settings.STORAGE_IO_TIMEOUT,
+        SHEETS: settings.SHEETS_IO_TIMEOUT,
+        IMAGES: settings.IMAGE_TIMEOUT,
+        AUTH: settings.AUTH_TIMEOUT,
+    },
+)
@@ -0,0 +1,372 @@
+import hashlib
+import itertools
+import time
+from bisect import bisect_left, bisect_right, insort
+from datetime import date
+from operator import itemgetter
+from typing import Any, Callable, Dict, FrozenSet, Iterable, Iterator, List, Optional, Set, Tuple
+
+from app.models.exhibition import Exhibition
+from app.services.search_index import SearchIndex
+
+# A stamp identifies the on-disk revision of a stored exhibition
+# (modification time in nanoseconds and size in bytes)
+Stamp = Tuple[int, int]
+
+_first = itemgetter(0)
+
+# Intervals per block of an IntervalIndex's start order (a block is split in
+# two once it holds twice as many)
+BLOCK_SIZE = 256
+
+# Versions are drawn from one sequence so that they never repeat, even
+# across catalog instances
+_versions = itertools.count(1)
+
+
+def _normalize(value: str) -> str:
+    """Normalize a lookup key so index matches are case-insensitive"""
+    return " ".join(value.split()).casefold()
+
+
+class IntervalIndex:
+    """
+    Index of [start, end] date intervals.
+
+    Intervals are kept sorted by start and by end, so "starts after" and
+    "ends before" lookups are a binary search plus a slice. The start order
+    is split into blocks of at most 2 * BLOCK_SIZE intervals, each recording
+    the latest end date in it: overlap queries skip whole blocks that end
+    too early and stop at the first block starting too late, and adding or
+    removing an interval only updates its own block.
+    """
+
+    def __init__(self):
+        self._intervals: Dict[str, Tuple[date, date]] = {}
+        # Start order as consecutive sorted blocks of (start, key)
+        self._blocks: List[List[Tuple[date, str]]] = []
+        # Latest end date per block
+        self._max_end: List[date] = []
+        self._by_end: List[Tuple[date, str]] = []
+
+    def __len__(self) -> int:
+        return len(self._intervals)
+
+    def _block_index(self, position: Any, key: Optional[Callable] = None) -> int:
+        """The block a position in the start order falls in, compared by ``key``"""
+        first = _first if key is None else (lambda block: key(block[0]))
+        return max(0, bisect_right(self._blocks, position, key=first) - 1)
+
+    def _latest_end(self, block: List[Tuple[date, str]]) -> date:
+        return max(self._intervals[key][1] for _, key in block)
+
+    def add(self, key: str, start: date, end: date) -> None:
+        """Add or replace the interval for a key"""
+        self.remove(key)
+        self._intervals[key] = (start, end)
+        insort(self._by_end, (end, key))
+        if not self._blocks:
+            self._blocks.append([(start, key)])
+            self._max_end.append(end)
+            return
+
+        index = self._block_index((start, key))
+        block = self._blocks[index]
+        insort(block, (start, key))
+        if end > self._max_end[index]:
+            self._max_end[index] = end
+        if len(block) > 2 * BLOCK_SIZE:
+            halves = [block[:BLOCK_SIZE], block[BLOCK_SIZE:]]
+            self._blocks[index:index + 1] = halves
+            self._max_end[index:index + 1] = [self._latest_end(half) for half in halves]
+
+    def remove(self, key: str) -> None:
+        """Remove the interval for a key if present"""
+        interval = self._intervals.pop(key, None)
+        if interval is None:
+            return
+
+        start, end = interval
+        del self._by_end[bisect_left(self._by_end, (end, key))]
+        index = self._block_index((start, key))
+        block = self._blocks[index]
+        del block[bisect_left(block, (start, key))]
+        if not block:
+            del self._blocks[index]
+            del self._max_end[index]
+        elif end == self._max_end[index]:
+            self._max_end[index] = self._latest_end(block)
+
+    def _starts(self, after: Any = None, key: Optional[Callable] = None) -> Iterator[Tuple[date, str]]:
+        """(start, key) pairs in start order, after a position compared by ``key``"""
+        if after is None:
+            return itertools.chain.from_iterable(self._blocks)
+        index = self._block_index(after, key)
+        if index >= len(self._blocks):
+            return iter(())
+        block = self._blocks[index]
+        return itertools.chain(
+            block[bisect_right(block, after, key=key):],
+            itertools.chain.from_iterable(self._blocks[index + 1:]),
+        )
+
+    def sort_key(self, key: str) -> Tuple[date, str]:
+        """Get the (start, key) position of a key in the start order"""
+        return self._intervals[key][0], key
+
+    def ordered(self, after: Optional[Tuple[date, str]] = None, limit: Optional[int] = None) -> List[str]:
+        """Get keys ordered by (start date, key), optionally after a position"""
+        return [key for _, key in itertools.islice(self._starts(after), limit)]
+
+    def starting_after(self, day: date) -> List[str]:
+        """Get keys whose interval starts strictly after the given day"""
+        return [key for _, key in self._starts(day, _first)]
+
+    def ending_before(self, day: date) -> List[str]:
+        """Get keys whose interval ends strictly before the given day"""
+        index = bisect_left(self._by_end, day, key=_first)
+        return [key for _, key in self._by_end[:index]]
+
+    def overlapping(self, low: date, high: date) -> List[str]:
+        """Get keys whose interval overlaps [low, high], ordered by start date"""
+        found: List[str] = []
+        for block, latest in zip(self._blocks, self._max_end):
+            # Everything from here on starts too late
+            if block[0][0] > high:
+                break
+            # Nothing in this block ends late enough
+            if latest < low:
+                continue
+            for start, key in block:
+                if start > high:
+                    break
+                if self._intervals[key][1] >= low:
+                    found.append(key)
+        return found
+
+
+class CatalogEntry:
+    """An exhibition held in the catalog, with its serialized form and HTTP validators"""
+
+    __slots__ = ("exhibition", "stamp", "payload", "etag", "last_modified", "encoded", "_projections")
+
+    # Distinct field projections kept serialized per entry
+    MAX_PROJECTIONS = 8
+
+    def __init__(self, exhibition: Exhibition, stamp: Stamp):
+        self.exhibition = exhibition
+        self.stamp = stamp
+        # Response body, serialized once when the entry is stored
+        self.payload = exhibition.model_dump_json().encode()
+        # Strong validator: the exhibition's revision plus a digest of its content
+        self.etag = f"v{exhibition.version}-{hashlib.sha1(self.payload).hexdigest()}"
+        self.last_modified = stamp[0] / 1e9
+        # Payload per content encoding, compressed on first request
+        self.encoded: Dict[str, bytes] = {}
+        self._projections: Dict[FrozenSet[str], bytes] = {}
+
+    def project(self, fields: Optional[FrozenSet[str]]) -> bytes:
+        """Get the serialized exhibition restricted to the given fields"""
+        if fields is None:
+            return self.payload
+
+        payload = self._projections.get(fields)
+        if payload is None:
+            payload = self.exhibition.model_dump_json(include=set(fields)).encode()
+            if len(self._projections) < self.MAX_PROJECTIONS:
+                self._projections[fields] = payload
+        return payload
+
+
+class ExhibitionCatalog:
+    """In-memory catalog of exhibitions keyed by ID, with secondary indexes"""
+
+    def __init__(self):
+        self._entries: Dict[str, CatalogEntry] = {}
+        # Changes on every change so callers can detect stale views
+        self.version = next(_versions)
+        # Wall-clock time of the last change, used as Last-Modified for lists
+        self.changed_at = time.time()
+
+        # Secondary indexes
+        self._flags: Dict[Tuple[str, bool], Set[str]] = {
+            (flag, value): set()
+            for flag in ("is_archived", "is_featured")
+            for value in (True, False)
+        }
+        # The same IDs as (start date, ID), in order, to page through a flag
+        self._flag_order: Dict[Tuple[str, bool], List[Tuple[date, str]]] = {
+            flag: [] for flag in self._flags
+        }
+        self._by_location: Dict[str, Set[str]] = {}
+        self._by_artist: Dict[str, Set[str]] = {}
+        self._dates = IntervalIndex()
+        self._search = SearchIndex()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, exhibition_id: str) -> bool:
+        return exhibition_id in self._entries
+
+    def get(self, exhibition_id: str) -> Optional[Exhibition]:
+        """Get an exhibition by ID"""
+        entry = self._entries.get(exhibition_id)
+        return entry.exhibition if entry is not None else None
+
+    def entry(self, exhibition_id: str) -> Optional[CatalogEntry]:
+        """Get the catalog entry for an exhibition by ID"""
+        return self._entries.get(exhibition_id)
+
+    def all(self) -> List[Exhibition]:
+        """Get all exhibitions in the catalog, ordered by start date"""
+        return [self._entries[key].exhibition for key in self._dates.ordered()]
+
+    def stamps(self) -> Dict[str, Stamp]:
+        """Get the stamp of every exhibition in the catalog"""
+        return {key: entry.stamp for key, entry in self._entries.items()}
+
+    def stamp(self, exhibition_id: str) -> Optional[Stamp]:
+        """Get the stamp of an exhibition, None if it is not in the catalog"""
+        entry = self._entries.get(exhibition_id)
+        return entry.stamp if entry is not None else None
+
+    def put(self, exhibition_id: str, exhibition: Exhibition, stamp: Stamp) -> CatalogEntry:
+        """Add or replace an exhibition"""
+        self._unindex(exhibition_id)
+        entry = CatalogEntry(exhibition, stamp)
+        self._entries[exhibition_id] = entry
+        self._index(exhibition_id, exhibition)
+        self._changed()
+        return entry
+
+    def remove(self, exhibition_id: str) -> bool:
+        """Remove an exhibition, returning whether it was present"""
+        if exhibition_id not in self._entries:
+            return False
+
+        self._unindex(exhibition_id)
+        del self._entries[exhibition_id]
+        self._changed()
+        return True
+
+    def _changed(self) -> None:
+        self.version = next(_versions)
+        self.changed_at = time.time()
+
+    def query(
+        self,
+        archived: Optional[bool] = None,
+        featured: Optional[bool] = None,
+        location: Optional[str] = None,
+        artist: Optional[str] = None,
+        overlapping: Optional[Tuple[date, date]] = None,
+        starts_after: Optional[date] = None,
+        ends_before: Optional[date] = None,
+        after: Optional[Tuple[date, str]] = None,
+        limit: Optional[int] = None,
+    ) -> List[CatalogEntry]:
+        """
+        Find catalog entries matching every given filter, ordered by (start date, ID).
+
+        Location and artist name match case-insensitively. Each filter is
+        answered from its own index and the smallest result set drives the
+        intersection, so no exhibition outside the matches is examined.
+        ``after`` and ``limit`` select a page of the ordered results, starting
+        after the given (start date, ID) position. With only flag filters,
+        the page is read from the flag's ordered IDs, from the position on.
+        """
+        matches: List[Iterable[str]] = []
+        flags: List[Tuple[str, bool]] = []
+
+        if archived is not None:
+            flags.append(("is_archived", archived))
+        if featured is not None:
+            flags.append(("is_featured", featured))
+        matches.extend(self._flags[flag] for flag in flags)
+        if location is not None:
+            matches.append(self._by_location.get(_normalize(location), set()))
+        if artist is not None:
+            matches.append(self._by_artist.get(_normalize(artist), set()))
+        if overlapping is not None:
+            matches.append(self._dates.overlapping(*overlapping))
+        if starts_after is not None:
+            matches.append(self._dates.starting_after(starts_after))
+        if ends_before is not None:
+            matches.append(self._dates.ending_before(ends_before))
+
+        if not matches:
+            keys = self._dates.ordered(after, limit)
+        elif len(matches) == len(flags):
+            # Only flags: page through the smallest flag's ordered IDs
+            order = min((self._flag_order[flag] for flag in flags), key=len)
+            index = bisect_right(order, after) if after is not None else 0
+            keys = list(itertools.islice(
+                (key for _, key in itertools.islice(order, index, None)
+                 if all(key in self._flags[flag] for flag in flags)),
+                limit,
+            ))
+        else:
+            sets = sorted((m if isinstance(m, set) else set(m) for m in matches), key=len)
+            keys = sorted(sets[0].intersection(*sets[1:]), key=self._dates.sort_key)
+            if after is not None:
+                keys = keys[bisect_right(keys, after, key=self._dates.sort_key):]
+            if limit is not None:
+                keys = keys[:limit]
+
+        return [self._entries[key] for key in keys]
+
+    def search(
+        self,
+        query: str,
+        archived: Optional[bool] = None,
+        limit: Optional[int] = None,
+    ) -> List[CatalogEntry]:
+        """Find catalog entries matching a full-text query, best match first"""
+        if archived is None:
+            results = self._search.search(query, limit)
+        else:
+            allowed = self._flags[("is_archived", archived)]
+            results = [item for item in self._search.search(query) if item[0] in allowed][:limit]
+        return [self._entries[key] for key, _ in results]
+
+    def _index(self, exhibition_id: str, exhibition: Exhibition) -> None:
+        for flag in _flags_of(exhibition):
+            self._flags[flag].add(exhibition_id)
+            insort(self._flag_order[flag], (exhibition.start_date, exhibition_id))
+        self._by_location.setdefault(_normalize(exhibition.location), set()).add(exhibition_id)
+        for name in {_normalize(artist.name) for artist in exhibition.artists}:
+            self._by_artist.setdefault(name, set()).add(exhibition_id)
+        self._dates.add(exhibition_id, exhibition.start_date, exhibition.end_date)
+        self._search.add(exhibition_id, exhibition)
+
+    def _unindex(self, exhibition_id: str) -> None:
+        entry = self._entries.get(exhibition_id)
+        if entry is None:
+            return
+
+        exhibition = entry.exhibition
+        for flag in _flags_of(exhibition):
+            self._flags[flag].discard(exhibition_id)
+            order = self._flag_order[flag]
+            del order[bisect_left(order, (exhibition.start_date, exhibition_id))]
+        _discard(self._by_location, _normalize(exhibition.location), exhibition_id)
+        for artist in exhibition.artists:
+            _discard(self._by_artist, _normalize(artist.name), exhibition_id)
+        self._dates.remove(exhibition_id)
+        self._search.remove(exhibition_id)
+
+
+def _flags_of(exhibition: Exhibition) -> Tuple[Tuple[str, bool], ...]:
+    """The flag index buckets an exhibition belongs in"""
+    return ("is_archived", exhibition.is_archived), ("is_featured", exhibition.is_featured)
+
+
+def _discard(index: Dict[str, Set[str]], value: str, exhibition_id: str) -> None:
+    """Remove an ID from an index bucket, dropping the bucket once empty"""
+    ids = index.get(value)
+    if ids is None:
+        return
+    ids.discard(exhibition_id)
+    if not ids:
+        del index[value]
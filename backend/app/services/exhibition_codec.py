@@ -0,0 +1,24 @@
+from typing import Optional, Union
+
+import orjson
+
+from app.models.exhibition import Exhibition
+
+
+def encode_exhibition(exhibition: Exhibition, indent: Optional[int] = None) -> bytes:
+    """Serialize an exhibition to JSON, compact unless ``indent`` is given"""
+    # pydantic-core's serializer is faster than dumping to a dict for orjson
+    return exhibition.__pydantic_serializer__.to_json(exhibition, indent=indent or None)
+
+
+def decode_exhibition(data: Union[bytes, str]) -> Exhibition:
+    """
+    Parse and validate a stored exhibition.
+
+    orjson parses and pydantic-core then validates the resulting dict,
+    which together is faster than either ``json.loads`` or pydantic's own
+    JSON parser. Stored exhibitions are validated like any other input:
+    files may be edited outside the server, and building models with
+    ``model_construct`` in Python measures slower than validating them.
+    """
+    return Exhibition.model_validate(orjson.loads(data))
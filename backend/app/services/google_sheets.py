@@ -1,80 +1,170 @@
+import asyncio
 import os
-from typing import Dict, List, Any
-import gspread
-from google.oauth2.service_account import Credentials
+import time
+from typing import Dict, List, Any, Optional
 from pydantic import BaseModel
 
 from app.config import settings
 from app.models.registration import ArtistRegistration
+from app.services.executor import SHEETS, blocking_io
+from app.services.registration_backends import (
+    REGISTRATION_COLUMNS,
+    RegistrationBackend,
+    fake_backend,
+    google_backend,
+)
+
+
+class SheetsUnavailable(Exception):
+    """Raised when Google Sheets is used before a connection could be made"""
+
 
 class GoogleSheetsService:
-    def __init__(self):
+    """
+    Registrations in a Google Sheets worksheet.
+
+    Creating the service does no I/O. ``start()`` connects in the
+    background and keeps retrying, with exponential backoff, until it
+    succeeds; until then calls raise ``SheetsUnavailable``, and
+    registrations wait in the journal rather than being lost.
+    """
+
+    def __init__(self, backend: Optional[RegistrationBackend] = None):
         # Check if we're in testing mode
-        self.testing_mode = os.getenv("TESTING", "false").lower() == "true"
-        
-        if not self.testing_mode:
-            try:
-                # Set up credentials for Google Sheets API
-                scopes = [
-                    'https://www.googleapis.com/auth/spreadsheets',
-                    'https://www.googleapis.com/auth/drive'
-                ]
-                
-                credentials = Credentials.from_service_account_file(
-                    settings.GOOGLE_CREDENTIALS_FILE,
-                    scopes=scopes
-                )
-                
-                self.client = gspread.authorize(credentials)
-                self.sheet = self.client.open_by_key(settings.REGISTRATION_SHEET_ID)
-                self.worksheet = self.sheet.worksheet(settings.REGISTRATION_WORKSHEET)
-            except Exception as e:
-                print(f"Warning: Could not initialize Google Sheets service: {e}")
-                self.testing_mode = True
-        
-        # In testing mode, we'll use a mock data store
-        if self.testing_mode:
-            self.mock_data = []
+        self.testing_mode = (
+            os.getenv("TESTING", "false").lower() == "true"
+            or settings.REGISTRATION_BACKEND == "fake"
+        )
+        self.worksheet: Optional[RegistrationBackend] = None
+        self.state = "disconnected"
+        self.last_error: Optional[str] = None
+        self.attempts = 0
+        self.connected_at: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
         
-    async def add_registration(self, registration: ArtistRegistration) -> Dict[str, Any]:
-        """Add an artist registration to the Google Sheet"""
-        # If in testing mode, use mock data
-        if self.testing_mode:
-            self.mock_data.append({
-                "name": registration.name,
-                "email": registration.email,
-                "website": registration.website or "",
-                "artist_statement": registration.artist_statement,
-                "work_sample_urls": ", ".join(registration.work_sample_urls) if registration.work_sample_urls else "",
-                "submitted_at": registration.submitted_at.isoformat()
-            })
-            return {"success": True, "id": registration.id}
-        
-        # Convert the registration data to a row format
-        row = [
+        if backend is not None:
+            self._connected(backend)
+        elif self.testing_mode:
+            # In testing mode, we'll use an in-process fake worksheet
+            self._connected(fake_backend())
+    
+    def _connected(self, worksheet: RegistrationBackend) -> None:
+        self.worksheet = worksheet
+        self.state = "connected"
+        self.last_error = None
+        self.connected_at = time.time()
+    
+    def _worksheet(self) -> RegistrationBackend:
+        if self.worksheet is None:
+            raise SheetsUnavailable(f"Google Sheets is not connected: {self.last_error or self.state}")
+        return self.worksheet
+    
+    async def connect(self) -> bool:
+        """Try once to open the registrations worksheet, returning whether it worked"""
+        self.state = "connecting"
+        self.attempts += 1
+        try:
+            worksheet = await blocking_io.run(SHEETS, google_backend)
+        except Exception as e:
+            self.state = "unavailable"
+            self.last_error = str(e) or type(e).__name__
+            print(f"Warning: Could not connect to Google Sheets (attempt {self.attempts}): {self.last_error}")
+            return False
+        self._connected(worksheet)
+        return True
+    
+    async def run(self) -> None:
+        """Connect, retrying with exponential backoff until it works"""
+        delay = settings.SHEETS_RECONNECT_INTERVAL
+        while not await self.connect():
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, settings.SHEETS_RECONNECT_MAX)
+    
+    def start(self) -> None:
+        """Start connecting in the running event loop, unless already connected"""
+        if self.worksheet is None:
+            self._task = asyncio.create_task(self.run())
+    
+    async def stop(self) -> None:
+        """Stop connection attempts"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+    
+    def status(self) -> Dict[str, Any]:
+        """Connection state for the health endpoints"""
+        return {
+            "state": "connected" if self.worksheet is not None else self.state,
+            "backend": "fake" if self.testing_mode else "google",
+            "attempts": self.attempts,
+            "connected_at": self.connected_at,
+            "error": self.last_error,
+        }
+    
+    @staticmethod
+    def registration_row(registration: ArtistRegistration) -> List[str]:
+        """Convert the registration data to a row format"""
+        return [
             registration.name,
             registration.email,
-            registration.website or "",
+            str(registration.website) if registration.website else "",
             registration.artist_statement,
-            ", ".join(registration.work_sample_urls) if registration.work_sample_urls else "",
-            registration.submitted_at.isoformat()
+            ", ".join(str(url) for url in registration.work_sample_urls) if registration.work_sample_urls else "",
+            registration.submitted_at.isoformat(),
+            registration.id,
+            registration.status
         ]
         
-        # Append the row to the worksheet
-        self.worksheet.append_row(row)
-        
+    async def add_registration(self, registration: ArtistRegistration) -> Dict[str, Any]:
+        """Add an artist registration to the Google Sheet"""
+        await self.add_registrations([registration])
         return {"success": True, "id": registration.id}
     
+    async def add_registrations(self, registrations: List[ArtistRegistration]) -> None:
+        """Add several artist registrations to the Google Sheet in one API call"""
+        rows = [self.registration_row(registration) for registration in registrations]
+        
+        # Append the rows to the worksheet without blocking the event loop
+        await blocking_io.run(SHEETS, self._worksheet().append_rows, rows)
+    
     async def get_registrations(self) -> List[Dict[str, Any]]:
         """Get all artist registrations from the Google Sheet"""
-        # If in testing mode, return mock data
-        if self.testing_mode:
-            return self.mock_data
-            
         # Get all records from the worksheet
-        records = self.worksheet.get_all_records()
+        records = await blocking_io.run(SHEETS, self._worksheet().get_all_records)
         
         return records
+    
+    async def get_rows_after(self, offset: int) -> List[Dict[str, str]]:
+        """
+        Get the registrations after the first ``offset`` data rows.
+
+        Only the new rows are downloaded, which lets a local mirror sync
+        incrementally. Each record carries its sheet ``row_number``.
+        """
+        first_row = offset + 2  # Row 1 holds the header
+        last_column = chr(ord("A") + len(REGISTRATION_COLUMNS) - 1)
+        values = await blocking_io.run(
+            SHEETS, self._worksheet().get_values, f"A{first_row}:{last_column}"
+        )
+        
+        records = []
+        for index, row in enumerate(values):
+            row = list(row) + [""] * (len(REGISTRATION_COLUMNS) - len(row))
+            record = dict(zip(REGISTRATION_COLUMNS, row))
+            record["row_number"] = first_row + index
+            records.append(record)
+        return records
+
+    async def set_registration_ids(self, ids: Dict[int, str]) -> None:
+        """Write registration IDs into the ID column of the given sheet rows"""
+        column = chr(ord("A") + REGISTRATION_COLUMNS.index("id"))
+        data = [{"range": f"{column}{row}", "values": [[registration_id]]} for row, registration_id in ids.items()]
+        await blocking_io.run(SHEETS, self._worksheet().batch_update, data)
 
 # Initialize the service as a singleton
 google_sheets_service = GoogleSheetsService() 
\ No newline at end of file
@@ -0,0 +1,437 @@
+import asyncio
+import hashlib
+import io
+import ipaddress
+import os
+import socket
+import time
+import uuid
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import httpx
+from PIL import Image, ImageOps
+
+from app.config import settings
+from app.models.exhibition import Exhibition
+from app.services.executor import IMAGES, STORAGE, blocking_io
+
+# Derivative formats: PIL encoder and media type
+FORMATS = {
+    "webp": ("WEBP", "image/webp"),
+    "jpeg": ("JPEG", "image/jpeg"),
+}
+
+# EXIF orientations that turn the stored image by 90 degrees
+_TRANSPOSED_ORIENTATIONS = {5, 6, 7, 8}
+
+# Redirects followed when fetching a source image
+MAX_SOURCE_REDIRECTS = 5
+
+# URL path under which STATIC_DIR is served
+STATIC_PREFIX = "/static/"
+
+
+class UnsafeSourceError(ValueError):
+    """Raised for a source image URL the server must not fetch"""
+
+
+def parse_widths(value: str) -> List[int]:
+    """Parse a comma-separated list of widths"""
+    return sorted({int(width) for width in value.split(",") if width.strip()})
+
+
+def derivative_name(digest: str, width: int, fmt: str) -> str:
+    """File name of a derivative, unique for its source content, width and format"""
+    return f"{digest}-{width}.{fmt}"
+
+
+def image_urls(exhibition: Exhibition) -> Iterator[str]:
+    """The image URLs an exhibition refers to"""
+    if exhibition.featured_image_url:
+        yield str(exhibition.featured_image_url)
+    for artwork in exhibition.artworks:
+        if artwork.image_url:
+            yield str(artwork.image_url)
+
+
+def _is_public(address: str) -> bool:
+    """Whether an IP address is publicly routable (not loopback, private, link-local, ...)"""
+    return ipaddress.ip_address(address.split("%", 1)[0]).is_global
+
+
+def _check_source_url(url: httpx.URL) -> None:
+    """Refuse URLs that are not http(s) or whose host resolves to a non-public address"""
+    if url.scheme not in ("http", "https"):
+        raise UnsafeSourceError(f"Unsupported image URL scheme: {url.scheme or 'none'}")
+    if not url.host:
+        raise UnsafeSourceError("Image URL has no host")
+    port = url.port or (443 if url.scheme == "https" else 80)
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(url.host, port, type=socket.SOCK_STREAM)}
+    except socket.gaierror as e:
+        raise ValueError(f"Cannot resolve image host {url.host}: {e}")
+    if not all(_is_public(address) for address in addresses):
+        raise UnsafeSourceError(f"Image host {url.host} is not a public address")
+
+
+def _check_peer(response: httpx.Response, host: str) -> None:
+    """Refuse a connection that went to a non-public address after all (the name resolved differently)"""
+    stream = response.extensions.get("network_stream")
+    peer = stream.get_extra_info("server_addr") if stream is not None else None
+    if peer and not _is_public(peer[0]):
+        raise UnsafeSourceError(f"Image host {host} is not a public address")
+
+
+def fetch_source(url: str) -> bytes:
+    """
+    Download a source image, refusing anything over IMAGE_MAX_SOURCE_BYTES.
+
+    Exhibition image URLs are supplied by editors, so only http(s) URLs of
+    hosts with public addresses are fetched, and redirects are only
+    followed within the same host: the server cannot be made to request
+    itself or services on its internal networks.
+    """
+    target = httpx.URL(url)
+    with httpx.Client(timeout=10) as client:
+        for _ in range(MAX_SOURCE_REDIRECTS + 1):
+            _check_source_url(target)
+            with client.stream("GET", target) as response:
+                _check_peer(response, target.host)
+                if response.is_redirect:
+                    location = target.join(response.headers["location"])
+                    if location.host != target.host:
+                        raise UnsafeSourceError(f"Image redirected to another host: {location.host}")
+                    target = location
+                    continue
+                response.raise_for_status()
+                data = bytearray()
+                for chunk in response.iter_bytes():
+                    data += chunk
+                    if len(data) > settings.IMAGE_MAX_SOURCE_BYTES:
+                        raise ValueError(f"Image larger than {settings.IMAGE_MAX_SOURCE_BYTES} bytes")
+                return bytes(data)
+    raise ValueError(f"Image redirected more than {MAX_SOURCE_REDIRECTS} times")
+
+
+def static_source_path(url: str) -> Optional[str]:
+    """
+    Get the file under STATIC_DIR that a source URL refers to, or None if
+    the URL is not one of the site's own static files (a ``/static/`` path,
+    relative or on one of SITE_HOSTS).
+
+    Raises UnsafeSourceError for a path that leads outside STATIC_DIR.
+    """
+    target = httpx.URL(url)
+    if target.host and target.host not in settings.SITE_HOSTS:
+        return None
+    if not target.path.startswith(STATIC_PREFIX):
+        return None
+    root = os.path.realpath(settings.STATIC_DIR)
+    path = os.path.realpath(os.path.join(root, target.path[len(STATIC_PREFIX):]))
+    if os.path.commonpath([root, path]) != root:
+        raise UnsafeSourceError(f"Image path is outside the static directory: {target.path}")
+    return path
+
+
+def read_source(url: str) -> bytes:
+    """
+    Get a source image: the site's own static files are read from disk,
+    anything else is downloaded with fetch_source.
+    """
+    path = static_source_path(url)
+    if path is None:
+        return fetch_source(url)
+    if os.path.getsize(path) > settings.IMAGE_MAX_SOURCE_BYTES:
+        raise ValueError(f"Image larger than {settings.IMAGE_MAX_SOURCE_BYTES} bytes")
+    with open(path, mode='rb') as f:
+        return f.read()
+
+
+def _encode(image: Image.Image, fmt: str, quality: int) -> bytes:
+    out = io.BytesIO()
+    if fmt == "jpeg":
+        if image.mode == "RGBA":
+            background = Image.new("RGB", image.size, "white")
+            background.paste(image, mask=image.getchannel("A"))
+            image = background
+        image.save(out, FORMATS[fmt][0], quality=quality, optimize=True, progressive=True)
+    else:
+        image.save(out, FORMATS[fmt][0], quality=quality, method=4)
+    return out.getvalue()
+
+
+def render(source: bytes, wanted: Iterable[Tuple[int, str]], quality: int) -> Dict[Tuple[int, str], bytes]:
+    """
+    Resize and re-encode a source image to each (width, format) wanted.
+
+    The source is decoded once; each width is scaled down from the next
+    larger one, and JPEG sources are already reduced while decoding. Images
+    are never scaled up: widths beyond the source's are re-encoded at the
+    source's own size.
+    """
+    wanted = set(wanted)
+    largest = max(width for width, _ in wanted)
+    with Image.open(io.BytesIO(source)) as original:
+        # Decode no larger than needed, judging by the displayed orientation
+        if original.getexif().get(0x0112) in _TRANSPOSED_ORIENTATIONS:
+            original.draft("RGB", (max(1, largest * original.width // original.height), largest))
+        else:
+            original.draft("RGB", (largest, max(1, largest * original.height // original.width)))
+        image = ImageOps.exif_transpose(original)
+        has_alpha = image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info
+        image = image.convert("RGBA" if has_alpha else "RGB")
+
+    results = {}
+    for width in sorted({width for width, _ in wanted}, reverse=True):
+        if image.width > width:
+            height = max(1, round(image.height * width / image.width))
+            image = image.resize((width, height), Image.Resampling.LANCZOS)
+        for fmt in sorted(fmt for w, fmt in wanted if w == width):
+            results[(width, fmt)] = _encode(image, fmt, quality)
+    return results
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    """Write a file under a temporary name and rename it into place"""
+    temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(temp_path, mode='wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+class DerivativeCache:
+    """
+    Content-addressed files bounded by total size, evicting the least
+    recently used first.
+
+    Recency is kept in the files' modification times, and the total size is
+    measured on the directory itself whenever a file is added, so the bound
+    holds for all worker processes sharing the directory. Methods are
+    blocking.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.directory, name[:2], name)
+
+    def _files(self) -> List[Tuple[int, int, str]]:
+        """(modification time, size, path) of every cached file"""
+        found = []
+        for root, _, files in os.walk(self.directory):
+            for file_name in files:
+                if file_name.endswith(".tmp"):
+                    continue
+                path = os.path.join(root, file_name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                found.append((stat.st_mtime_ns, stat.st_size, path))
+        return found
+
+    def _touch(self, path: str) -> None:
+        # From the precise clock: file systems stamp writes with a coarse one
+        now = time.time_ns()
+        os.utime(path, ns=(now, now))
+
+    def has(self, name: str) -> bool:
+        return os.path.exists(self.path(name))
+
+    def get(self, name: str) -> Optional[str]:
+        """Get the path of a cached file and mark it as recently used"""
+        path = self.path(name)
+        try:
+            self._touch(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def put(self, name: str, data: bytes) -> None:
+        """Store a file, then evict the least recently used ones over the limit"""
+        path = self.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        _write_atomic(path, data)
+        self._touch(path)
+        files = self._files()
+        size = sum(file_size for _, file_size, _ in files)
+        for _, file_size, file_path in sorted(files):
+            if size <= self.max_bytes:
+                break
+            # Never evict the file just written
+            if file_path == path:
+                continue
+            try:
+                os.remove(file_path)
+            except FileNotFoundError:
+                # Evicted by another process
+                pass
+            size -= file_size
+
+    def stats(self) -> Dict[str, int]:
+        files = self._files()
+        return {
+            "files": len(files),
+            "bytes": sum(file_size for _, file_size, _ in files),
+            "max_bytes": self.max_bytes,
+        }
+
+
+class ImageService:
+    """
+    Responsive derivatives of exhibition images.
+
+    Every image an exhibition refers to is read once (from STATIC_DIR for
+    the site's own images, downloaded otherwise), identified by the
+    SHA-256 of its content, and resized to each of IMAGE_WIDTHS in
+    every format. Derivatives are generated in the image thread pool when
+    exhibitions are saved, so requests only ever read finished files. The
+    source URL is remembered with its digest, which is all a request needs
+    to find the derivatives; URLs that no exhibition referred to are never
+    fetched.
+    """
+
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        max_bytes: Optional[int] = None,
+        widths: Optional[List[int]] = None,
+        fetch: Callable[[str], bytes] = read_source,
+    ):
+        directory = directory or settings.IMAGE_CACHE_DIR
+        self.cache = DerivativeCache(
+            os.path.join(directory, "derivatives"),
+            max_bytes if max_bytes is not None else settings.IMAGE_CACHE_MAX_BYTES,
+        )
+        self.sources_dir = os.path.join(directory, "sources")
+        self.widths = sorted(widths or parse_widths(settings.IMAGE_WIDTHS))
+        self.fetch = fetch
+        self._tasks = set()
+        # Renderings of single derivatives requested after an eviction
+        self._renders: Dict[Tuple[str, int, str], asyncio.Future] = {}
+
+    def snap_width(self, width: Optional[int]) -> int:
+        """The smallest configured width at least as wide as requested"""
+        if width is not None:
+            for candidate in self.widths:
+                if candidate >= width:
+                    return candidate
+        return self.widths[-1]
+
+    def _source_path(self, url: str) -> str:
+        return os.path.join(self.sources_dir, hashlib.sha1(url.encode()).hexdigest())
+
+    def source_digest(self, url: str) -> Optional[str]:
+        """Get the content digest of a prepared source URL"""
+        try:
+            with open(self._source_path(url), mode='r') as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            return None
+
+    def generate(
+        self, url: str, refresh: bool = True, only: Optional[Tuple[int, str]] = None
+    ) -> str:
+        """
+        Fetch a source image and create any derivatives not yet cached, or
+        only the (width, format) given by ``only``.
+
+        Without ``refresh``, a URL that was prepared before is not fetched
+        again. Returns the source's digest.
+        """
+        if not refresh:
+            digest = self.source_digest(url)
+            if digest is not None:
+                return digest
+
+        data = self.fetch(url)
+        digest = hashlib.sha256(data).hexdigest()
+        candidates = [only] if only else [(width, fmt) for width in self.widths for fmt in FORMATS]
+        wanted = [
+            (width, fmt) for width, fmt in candidates
+            if not self.cache.has(derivative_name(digest, width, fmt))
+        ]
+        if wanted:
+            for (width, fmt), payload in render(data, wanted, settings.IMAGE_QUALITY).items():
+                self.cache.put(derivative_name(digest, width, fmt), payload)
+
+        os.makedirs(self.sources_dir, exist_ok=True)
+        _write_atomic(self._source_path(url), digest.encode())
+        return digest
+
+    async def prepare(self, exhibitions: Iterable[Exhibition], refresh: bool = True) -> None:
+        """Generate the derivatives of every image of the given exhibitions"""
+        urls = iter(list(dict.fromkeys(url for exhibition in exhibitions for url in image_urls(exhibition))))
+
+        async def work():
+            for url in urls:
+                try:
+                    await blocking_io.run(IMAGES, self.generate, url, refresh)
+                except Exception as e:
+                    print(f"Error generating derivatives of {url}: {e}")
+
+        # One consumer per pool thread, so no call waits in the pool's queue
+        await asyncio.gather(*(work() for _ in range(blocking_io.sizes[IMAGES])))
+
+    def schedule(self, exhibitions: Iterable[Exhibition], refresh: bool = True) -> None:
+        """Prepare derivatives in the background"""
+        task = asyncio.create_task(self.prepare(list(exhibitions), refresh))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def stop(self) -> None:
+        """Cancel background preparation; running conversions finish in their threads"""
+        for task in list(self._tasks):
+            task.cancel()
+
+    async def derivative(self, url: str, width: int, fmt: str) -> Optional[str]:
+        """
+        Get the name of a derivative of a prepared source URL, or None if the
+        URL was never prepared.
+
+        A derivative evicted from the cache since is generated again, by
+        itself: the request waits for one rendering, not every width and
+        format, and for no longer than IMAGE_RENDER_WAIT seconds. Past that,
+        asyncio.TimeoutError is raised while the rendering goes on in the
+        background, shared by every request for the same derivative.
+        """
+        digest = await blocking_io.run(STORAGE, self.source_digest, url)
+        if digest is None:
+            return None
+        name = derivative_name(digest, width, fmt)
+        if not await blocking_io.run(STORAGE, self.cache.has, name):
+            digest = await asyncio.wait_for(
+                asyncio.shield(self._render(url, width, fmt)), settings.IMAGE_RENDER_WAIT
+            )
+            name = derivative_name(digest, width, fmt)
+        return name
+
+    def _render(self, url: str, width: int, fmt: str) -> asyncio.Future:
+        """Start generating one derivative, unless it is already being generated"""
+        key = (url, width, fmt)
+        render = self._renders.get(key)
+        if render is None:
+            render = self._renders[key] = asyncio.ensure_future(
+                blocking_io.run(IMAGES, self.generate, url, True, (width, fmt))
+            )
+
+            def done(future: asyncio.Future) -> None:
+                del self._renders[key]
+                if not future.cancelled() and future.exception() is not None:
+                    print(f"Error generating derivative of {url}: {future.exception()}")
+
+            render.add_done_callback(done)
+        return render
+
+
+# Initialize the service as a singleton
+image_service = ImageService()
@@ -1,88 +1,417 @@
-import os
-import json
-from typing import Dict, List, Any, Optional
-import aiofiles
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from datetime import date
+from typing import AsyncIterator, Callable, Dict, List, Any, Optional, Tuple, TypeVar
 from fastapi import HTTPException
 
 from app.config import settings
 from app.models.exhibition import Exhibition
+from app.services.coherence import SharedCounter, SharedLock, catalog_changes, exhibition_writers, storage_lock
+from app.services.exhibition_catalog import CatalogEntry, ExhibitionCatalog
+from app.services.executor import STORAGE, UNBOUNDED, blocking_io
+from app.services.storage_backends import ReadResult, StorageBackend, create_storage_backend
+
+T = TypeVar("T")
 
 
 class JSONStorageService:
-    """Service for storing and retrieving data in JSON files"""
-    
-    def __init__(self):
-        """Initialize the service and ensure data directories exist"""
-        os.makedirs(settings.EXHIBITIONS_DIR, exist_ok=True)
-    
-    async def get_exhibition(self, exhibition_id: str) -> Optional[Exhibition]:
-        """Get an exhibition by ID"""
-        file_path = os.path.join(settings.EXHIBITIONS_DIR, f"{exhibition_id}.json")
-        
-        if not os.path.exists(file_path):
-            return None
-        
+    """Service for storing and retrieving exhibitions through a storage backend"""
+
+    def __init__(
+        self,
+        backend: Optional[StorageBackend] = None,
+        refresh_interval: Optional[float] = None,
+        changes: Optional[SharedCounter] = None,
+        lock: Optional[SharedLock] = None,
+        writers: Optional[SharedLock] = None,
+    ):
+        """Initialize the service; the configured storage backend is opened on first use"""
+        self.backend = backend
+        # Incremented by every worker process after it writes, so that the
+        # others refresh right away instead of after the refresh interval
+        self.changes = changes or catalog_changes
+        # Held shared while writing, so that snapshots see whole batches
+        self.lock = lock or storage_lock
+        # Held exclusively by one writer across all worker processes, from
+        # the refresh before a write until the write is announced
+        self.writers = writers or exhibition_writers
+        self._seen_changes: Optional[int] = None
+        self.refresh_interval = (
+            settings.CATALOG_REFRESH_INTERVAL if refresh_interval is None else refresh_interval
+        )
+
+        # Exhibitions are served from memory and kept in sync with the backend
+        self.catalog = ExhibitionCatalog()
+        self._loaded = False
+        self._last_refresh = 0.0
+        self._loading: Optional[asyncio.Task] = None
+        # Why the last check of the backend failed, if it did
+        self.last_error: Optional[str] = None
+
+        # Serializes writers; readers never take it
+        self._lock: Optional[asyncio.Lock] = None
+        self._lock_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def version(self) -> int:
+        """Version of the catalog, changed on every change to any exhibition"""
+        return self.catalog.version
+
+    @property
+    def last_modified(self) -> float:
+        """Time of the most recent change to any exhibition"""
+        return self.catalog.changed_at
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def status(self) -> Dict[str, Any]:
+        """State of the catalog and backend for the health endpoints"""
+        if not self._loaded:
+            state = "unavailable" if self.last_error else "loading"
+        else:
+            # A loaded catalog keeps being served if the backend fails
+            state = "degraded" if self.last_error else "ready"
+        return {
+            "state": state,
+            "backend": settings.STORAGE_BACKEND,
+            "exhibitions": len(self.catalog),
+            "error": self.last_error,
+        }
+
+    async def _open_backend(self) -> StorageBackend:
+        if self.backend is None:
+            self.backend = await blocking_io.run(STORAGE, create_storage_backend)
+        if self.changes.value is None:
+            try:
+                await blocking_io.run(STORAGE, self.changes.open)
+            except OSError as e:
+                # Other workers' writes are then seen within the refresh interval
+                print(f"Warning: Could not open {self.changes.path}: {e}")
+        return self.backend
+
+    async def _store(self, func: Callable[..., T], *args: Any) -> T:
+        """
+        Run a backend write in the storage pool while holding the storage
+        lock shared.
+
+        The lock is taken here rather than in the thread, so waiting for a
+        snapshot does not count against the call's timeout. The write itself
+        is awaited without a timeout: once started it may commit, and the
+        writer lock and the version it checked must be held until it did,
+        so a failure is only reported for a write that really failed.
+        """
+        async with self.lock.shared_async():
+            return await blocking_io.run(STORAGE, func, *args, timeout=UNBOUNDED)
+
+    async def _read_batch(self, backend: StorageBackend, exhibition_ids: List[str]) -> Dict[str, ReadResult]:
         try:
-            async with aiofiles.open(file_path, mode='r') as f:
-                content = await f.read()
-                data = json.loads(content)
-                return Exhibition(**data)
+            return await blocking_io.run(STORAGE, backend.read_many, exhibition_ids)
         except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Error reading exhibition: {str(e)}")
-    
+            # A failed or timed out call fails every exhibition in it
+            return dict.fromkeys(exhibition_ids, e)
+
+    async def _read_changed(self, backend: StorageBackend, exhibition_ids: List[str]) -> AsyncIterator[Dict[str, ReadResult]]:
+        """
+        Read exhibitions in batches, several batches at a time, yielding
+        each batch as it completes.
+
+        Batching saves a thread round trip per exhibition, and the catalog
+        indexes one batch while the storage threads read the next ones.
+        """
+        size = max(1, settings.STORAGE_READ_BATCH)
+        semaphore = asyncio.Semaphore(max(1, settings.STORAGE_READ_CONCURRENCY))
+
+        async def read(batch: List[str]) -> Dict[str, ReadResult]:
+            async with semaphore:
+                return await self._read_batch(backend, batch)
+
+        reads = [read(exhibition_ids[start:start + size]) for start in range(0, len(exhibition_ids), size)]
+        for done in asyncio.as_completed(reads):
+            yield await done
+
+    async def _announce_change(self) -> None:
+        """Tell the other worker processes that exhibitions changed"""
+        try:
+            changes = await blocking_io.run(STORAGE, self.changes.increment)
+        except Exception as e:
+            # They still pick the change up within the refresh interval
+            print(f"Error announcing exhibition change: {e}")
+            return
+        # Only our own change happened since the last refresh: nothing to reload
+        if self._seen_changes is not None and changes == self._seen_changes + 1:
+            self._seen_changes = changes
+
+    async def load(self) -> None:
+        """
+        Load every stored exhibition into memory.
+
+        Callers arriving while a load is in progress wait for that load
+        instead of starting another one.
+        """
+        loop = asyncio.get_running_loop()
+        if self._loading is None or self._loading.done() or self._loading.get_loop() is not loop:
+            self._loading = loop.create_task(self.refresh(force=True))
+        await asyncio.shield(self._loading)
+
+    async def refresh(self, force: bool = False) -> None:
+        """
+        Bring the in-memory catalog up to date with the storage backend.
+
+        Only exhibitions whose stamp changed since the last refresh are
+        read. Unless forced, the backend is checked at most once per
+        refresh interval, or right away after another worker process
+        wrote.
+        """
+        if not force and not self._loaded:
+            await self.load()
+            return
+
+        now = time.monotonic()
+        changes = self.changes.value
+        if (
+            not force
+            and now - self._last_refresh < self.refresh_interval
+            and changes == self._seen_changes
+        ):
+            return
+        self._last_refresh = now
+
+        try:
+            backend = await self._open_backend()
+            # Read before scanning, so that a write during the scan is not missed
+            changes = self.changes.value
+            stored = await blocking_io.run(STORAGE, backend.scan)
+        except Exception as e:
+            self.last_error = str(e) or type(e).__name__
+            raise
+        self.last_error = None
+        self._seen_changes = changes
+        known = self.catalog.stamps()
+
+        # Drop exhibitions that were removed
+        for exhibition_id in known.keys() - stored.keys():
+            self.catalog.remove(exhibition_id)
+
+        # (Re)load new and modified exhibitions
+        changed = [exhibition_id for exhibition_id, stamp in stored.items() if known.get(exhibition_id) != stamp]
+        async for results in self._read_changed(backend, changed):
+            for exhibition_id, result in results.items():
+                if self.catalog.stamp(exhibition_id) != known.get(exhibition_id):
+                    # Saved, deleted or reloaded since the scan while this batch
+                    # was being read: the catalog already holds a newer state
+                    continue
+                if isinstance(result, Exception):
+                    # Log error but continue processing other exhibitions
+                    print(f"Error processing exhibition {exhibition_id}: {str(result)}")
+                    self.catalog.remove(exhibition_id)
+                    continue
+                self.catalog.put(exhibition_id, result, stored[exhibition_id])
+
+        self._loaded = True
+
+    async def get_exhibition(self, exhibition_id: str) -> Optional[Exhibition]:
+        """Get an exhibition by ID"""
+        await self.refresh()
+        return self.catalog.get(exhibition_id)
+
+    async def get_entry(self, exhibition_id: str) -> Optional[CatalogEntry]:
+        """Get the catalog entry (exhibition and validators) for an exhibition by ID"""
+        await self.refresh()
+        return self.catalog.entry(exhibition_id)
+
     async def get_all_exhibitions(self, archived: Optional[bool] = None) -> List[Exhibition]:
         """Get all exhibitions, optionally filtered by archived status"""
-        exhibitions = []
-        
-        for filename in os.listdir(settings.EXHIBITIONS_DIR):
-            if filename.endswith('.json'):
-                file_path = os.path.join(settings.EXHIBITIONS_DIR, filename)
-                try:
-                    async with aiofiles.open(file_path, mode='r') as f:
-                        content = await f.read()
-                        data = json.loads(content)
-                        exhibition = Exhibition(**data)
-                        
-                        # Filter by archived status if specified
-                        if archived is not None and exhibition.is_archived != archived:
-                            continue
-                            
-                        exhibitions.append(exhibition)
-                except Exception as e:
-                    # Log error but continue processing other files
-                    print(f"Error processing {filename}: {str(e)}")
-        
-        return exhibitions
-    
+        return await self.query_exhibitions(archived=archived)
+
     async def get_featured_exhibitions(self) -> List[Exhibition]:
         """Get featured exhibitions for the homepage"""
-        exhibitions = await self.get_all_exhibitions(archived=False)
-        return [ex for ex in exhibitions if ex.is_featured]
-    
-    async def save_exhibition(self, exhibition: Exhibition) -> Exhibition:
-        """Save an exhibition to a JSON file"""
-        file_path = os.path.join(settings.EXHIBITIONS_DIR, f"{exhibition.id}.json")
-        
-        try:
-            async with aiofiles.open(file_path, mode='w') as f:
-                await f.write(exhibition.json(indent=2))
-            return exhibition
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Error saving exhibition: {str(e)}")
-    
+        return await self.query_exhibitions(archived=False, featured=True)
+
+    async def query_exhibitions(self, **filters) -> List[Exhibition]:
+        """Find exhibitions using the catalog indexes, see query_entries"""
+        return [entry.exhibition for entry in await self.query_entries(**filters)]
+
+    async def query_entries(
+        self,
+        archived: Optional[bool] = None,
+        featured: Optional[bool] = None,
+        location: Optional[str] = None,
+        artist: Optional[str] = None,
+        period: Optional[str] = None,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None,
+        after: Optional[Tuple[date, str]] = None,
+        limit: Optional[int] = None,
+    ) -> List[CatalogEntry]:
+        """
+        Find catalog entries using the catalog indexes, ordered by start date.
+
+        ``period`` is one of "current", "upcoming" or "past" relative to
+        today. ``date_from``/``date_to`` select exhibitions running at any
+        point within the given range; either bound may be omitted.
+        ``after`` and ``limit`` return a page of results following the
+        given (start date, ID) position.
+        """
+        await self.refresh()
+
+        today = date.today()
+        filters: Dict[str, Any] = {}
+        if period == "current":
+            filters["overlapping"] = (today, today)
+        elif period == "upcoming":
+            filters["starts_after"] = today
+        elif period == "past":
+            filters["ends_before"] = today
+
+        if date_from is not None or date_to is not None:
+            low = date_from or date.min
+            high = date_to or date.max
+            if "overlapping" in filters:
+                # Intersect with the current-period window
+                low = max(low, today)
+                high = min(high, today)
+            filters["overlapping"] = (low, high)
+
+        if "overlapping" in filters and filters["overlapping"][0] > filters["overlapping"][1]:
+            return []
+
+        return self.catalog.query(
+            archived=archived,
+            featured=featured,
+            location=location,
+            artist=artist,
+            after=after,
+            limit=limit,
+            **filters
+        )
+
+    async def search_entries(
+        self,
+        query: str,
+        archived: Optional[bool] = None,
+        limit: Optional[int] = None,
+    ) -> List[CatalogEntry]:
+        """
+        Full-text search over exhibitions, their artists and artworks.
+
+        Results are ranked by relevance. Query words also match longer
+        words they are a prefix of, with a lower score.
+        """
+        await self.refresh()
+        return self.catalog.search(query, archived=archived, limit=limit)
+
+    def _write_lock(self) -> asyncio.Lock:
+        # Locks belong to one event loop; tests run several in turn
+        loop = asyncio.get_running_loop()
+        if self._lock_loop is not loop:
+            self._lock = asyncio.Lock()
+            self._lock_loop = loop
+        return self._lock
+
+    @asynccontextmanager
+    async def _writing(self) -> AsyncIterator[None]:
+        """
+        Serialize a write with every other writer, in this and in the other
+        worker processes, after bringing the catalog up to date, so that
+        preconditions and versions are checked against what is stored.
+        """
+        async with self._write_lock(), self.writers.exclusive_async():
+            await self.refresh(force=True)
+            yield
+
+    async def save_exhibition(
+        self,
+        exhibition: Exhibition,
+        precondition: Optional[Callable[[Optional[CatalogEntry]], bool]] = None,
+    ) -> Exhibition:
+        """Save an exhibition as its next version, see save_entry"""
+        return (await self.save_entry(exhibition, precondition)).exhibition
+
+    async def save_entry(
+        self,
+        exhibition: Exhibition,
+        precondition: Optional[Callable[[Optional[CatalogEntry]], bool]] = None,
+    ) -> CatalogEntry:
+        """
+        Save an exhibition as its next version, returning its catalog entry.
+
+        Writes are serialized across worker processes, and ``precondition``
+        is checked against the current stored entry (None if the exhibition
+        does not exist yet) right before writing; if it fails nothing is
+        written and a 412 is raised. This makes an If-Match check a
+        compare-and-swap. Readers keep being served from the catalog and
+        never wait for a writer.
+        """
+        async with self._writing():
+            current = self.catalog.entry(exhibition.id)
+            if precondition is not None and not precondition(current):
+                raise HTTPException(
+                    status_code=412,
+                    detail="Exhibition was modified since it was read"
+                )
+
+            version = (current.exhibition.version if current is not None else 0) + 1
+            exhibition = exhibition.model_copy(update={"version": version})
+            try:
+                [stamp] = (await self._store(self.backend.write_many, [exhibition])).values()
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=f"Error saving exhibition: {str(e)}")
+
+            # Record the new stamp so the next refresh does not read it back
+            entry = self.catalog.put(exhibition.id, exhibition, stamp)
+            await self._announce_change()
+            return entry
+
+    async def save_many(self, exhibitions: List[Exhibition]) -> Tuple[int, int]:
+        """
+        Upsert a batch of exhibitions, each as its next version.
+
+        The batch is written with one backend call (a single transaction
+        for SQLite). Returns the number of exhibitions created and updated.
+        """
+        created = updated = 0
+        async with self._writing():
+            versions: Dict[str, int] = {}
+            batch: Dict[str, Exhibition] = {}
+            for exhibition in exhibitions:
+                if exhibition.id not in versions:
+                    current = self.catalog.get(exhibition.id)
+                    versions[exhibition.id] = current.version if current is not None else 0
+                    if current is None:
+                        created += 1
+                    else:
+                        updated += 1
+                # A later line for the same exhibition replaces an earlier one
+                batch[exhibition.id] = exhibition.model_copy(update={"version": versions[exhibition.id] + 1})
+
+            try:
+                stamps = await self._store(self.backend.write_many, list(batch.values()))
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=f"Error saving exhibitions: {str(e)}")
+
+            for exhibition_id, exhibition in batch.items():
+                self.catalog.put(exhibition_id, exhibition, stamps[exhibition_id])
+            await self._announce_change()
+        return created, updated
+
     async def delete_exhibition(self, exhibition_id: str) -> bool:
         """Delete an exhibition"""
-        file_path = os.path.join(settings.EXHIBITIONS_DIR, f"{exhibition_id}.json")
-        
-        if not os.path.exists(file_path):
-            return False
-        
-        try:
-            os.remove(file_path)
-            return True
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Error deleting exhibition: {str(e)}")
+        async with self._writing():
+            try:
+                removed = await self._store(self.backend.delete, exhibition_id)
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=f"Error deleting exhibition: {str(e)}")
+
+            if not removed:
+                return False
+
+            self.catalog.remove(exhibition_id)
+            await self._announce_change()
+        return True
 
 
 # Initialize the service as a singleton
-json_storage_service = JSONStorageService() 
\ No newline at end of file
+json_storage_service = JSONStorageService()
@@ -0,0 +1,312 @@
+import asyncio
+import json
+import math
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from app.config import settings
+
+# Latency histogram bucket bounds (seconds)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+Labels = Tuple[str, ...]
+# Metric name to [labels, value] pairs, as written to per-process files
+Snapshot = Dict[str, List[List[Any]]]
+
+
+class Metric:
+    """
+    A named family of samples, one per combination of label values.
+
+    ``merge`` says how samples from several worker processes combine:
+    "sum" for per-process quantities, "max" for gauges every process
+    reports the same value of (such as the shared queue depth).
+    """
+
+    type = "untyped"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), merge: str = "sum"):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.merge = merge
+        self._values: Dict[Labels, Any] = {}
+        self._lock = threading.Lock()
+
+    def samples(self) -> List[List[Any]]:
+        with self._lock:
+            return [[list(labels), self._copy(value)] for labels, value in self._values.items()]
+
+    @staticmethod
+    def _copy(value: Any) -> Any:
+        return value
+
+    def combine(self, a: Any, b: Any) -> Any:
+        return max(a, b) if self.merge == "max" else a + b
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def set(self, value: float, *labels: str) -> None:
+        """Record a total that is counted elsewhere"""
+        with self._lock:
+            self._values[labels] = value
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value: float, *labels: str) -> None:
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(Metric):
+    """Counts of observations per bucket, plus their sum (the last item)"""
+
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            state[index] += 1
+            state[-1] += value
+
+    @staticmethod
+    def _copy(value: Any) -> Any:
+        return list(value)
+
+    def combine(self, a: Any, b: Any) -> Any:
+        return [x + y for x, y in zip(a, b)]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class MetricsRegistry:
+    """
+    In-process metrics, rendered in the Prometheus text format.
+
+    Recording a sample is a dictionary update under a lock, cheap enough
+    for every request. Values maintained elsewhere (queue depth, cache
+    counters) are read by collectors right before a snapshot is taken.
+    """
+
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+        self._collectors: List[Callable[[], None]] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help, labels))
+
+    def gauge(self, name: str, help: str, labels: Sequence[str] = (), merge: str = "sum") -> Gauge:
+        return self.register(Gauge(name, help, labels, merge))
+
+    def histogram(
+        self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def add_collector(self, collector: Callable[[], None]) -> None:
+        """Register a function that updates metrics before each snapshot (blocking)"""
+        self._collectors.append(collector)
+
+    def collect(self) -> None:
+        for collector in self._collectors:
+            try:
+                collector()
+            except Exception as e:
+                print(f"Error collecting metrics: {e}")
+
+    def snapshot(self) -> Snapshot:
+        return {name: metric.samples() for name, metric in self.metrics.items()}
+
+    def render(self, snapshots: List[Snapshot]) -> str:
+        """Merge snapshots from one or more processes into Prometheus text"""
+        lines = []
+        for name, metric in self.metrics.items():
+            merged: Dict[Labels, Any] = {}
+            for snapshot in snapshots:
+                for labels, value in snapshot.get(name, []):
+                    labels = tuple(labels)
+                    merged[labels] = metric.combine(merged[labels], value) if labels in merged else value
+
+            lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {metric.type}")
+            for labels, value in sorted(merged.items()):
+                if isinstance(metric, Histogram):
+                    cumulative = 0
+                    bounds = [*(_format_value(bound) for bound in metric.buckets), "+Inf"]
+                    for bound, count in zip(bounds, value[:-1]):
+                        cumulative += count
+                        bucket_labels = _format_labels((*metric.labels, "le"), (*labels, bound))
+                        lines.append(f"{name}_bucket{bucket_labels} {cumulative}")
+                    label_text = _format_labels(metric.labels, labels)
+                    lines.append(f"{name}_sum{label_text} {_format_value(value[-1])}")
+                    lines.append(f"{name}_count{label_text} {cumulative}")
+                else:
+                    lines.append(f"{name}{_format_labels(metric.labels, labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+class MetricsExporter:
+    """
+    Shares this process's metrics with the other workers of the server.
+
+    Each process writes a snapshot to ``<directory>/<pid>.json`` every
+    ``interval`` seconds; a scrape, answered by whichever worker receives
+    it, merges its own live metrics with the other workers' snapshots.
+    Snapshots not refreshed for three intervals belong to workers that
+    exited and are ignored, so their counters drop out (Prometheus treats
+    that as a counter reset).
+    """
+
+    def __init__(self, registry: MetricsRegistry, directory: Optional[str] = None, interval: Optional[float] = None):
+        self.registry = registry
+        self.directory = directory or settings.METRICS_DIR
+        self.interval = settings.METRICS_EXPORT_INTERVAL if interval is None else interval
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def path(self) -> str:
+        return os.path.join(self.directory, f"{os.getpid()}.json")
+
+    def write(self) -> None:
+        """Write this process's snapshot"""
+        self.registry.collect()
+        data = json.dumps(self.registry.snapshot())
+        os.makedirs(self.directory, exist_ok=True)
+        temp_path = os.path.join(self.directory, f".{os.getpid()}.{uuid.uuid4().hex}.tmp")
+        with open(temp_path, mode='w') as f:
+            f.write(data)
+        os.replace(temp_path, self.path)
+
+    def other_snapshots(self) -> List[Snapshot]:
+        """Read the recent snapshots of every other process"""
+        snapshots = []
+        own = os.path.basename(self.path)
+        stale_before = time.time() - 3 * self.interval
+        try:
+            entries = list(os.scandir(self.directory))
+        except FileNotFoundError:
+            return snapshots
+        for entry in entries:
+            if not entry.name.endswith(".json") or entry.name == own:
+                continue
+            try:
+                if entry.stat().st_mtime < stale_before:
+                    continue
+                with open(entry.path, mode='r') as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                # Removed or replaced while reading
+                continue
+        return snapshots
+
+    def render(self) -> str:
+        """Render the metrics of all workers (blocking)"""
+        self.registry.collect()
+        return self.registry.render([self.registry.snapshot(), *self.other_snapshots()])
+
+    async def run(self) -> None:
+        # Imported here: the executor itself records metrics
+        from app.services.executor import STORAGE, blocking_io
+
+        while True:
+            try:
+                await blocking_io.run(STORAGE, self.write)
+            except Exception as e:
+                print(f"Error exporting metrics: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        """Start exporting in the running event loop"""
+        if self.interval > 0:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        """Stop exporting and withdraw this process's snapshot"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+# Initialize the registry as a singleton
+registry = MetricsRegistry()
+
+# Metrics recorded by the HTTP middleware and the blocking I/O pools
+HTTP_REQUESTS = registry.counter(
+    "http_requests_total", "HTTP requests by route and status", ("method", "route", "status")
+)
+HTTP_REQUEST_DURATION = registry.histogram(
+    "http_request_duration_seconds", "Time to complete HTTP responses", ("method", "route")
+)
+HTTP_REQUESTS_IN_FLIGHT = registry.gauge(
+    "http_requests_in_flight", "HTTP requests being served"
+)
+BLOCKING_IO_DURATION = registry.histogram(
+    "blocking_io_duration_seconds",
+    "Time spent in blocking calls (storage, Google Sheets, images) by pool and operation",
+    ("pool", "operation"),
+)
+BLOCKING_IO_WAIT = registry.histogram(
+    "blocking_io_wait_seconds", "Time blocking calls waited for a free thread", ("pool",)
+)
+BLOCKING_IO_ERRORS = registry.counter(
+    "blocking_io_errors_total", "Blocking calls that raised, by pool and operation", ("pool", "operation")
+)
+BLOCKING_IO_TIMEOUTS = registry.counter(
+    "blocking_io_timeouts_total", "Blocking calls abandoned after their timeout", ("pool", "operation")
+)
+
+# Initialize the exporter as a singleton
+metrics_exporter = MetricsExporter(registry)
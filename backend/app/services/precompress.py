@@ -0,0 +1,97 @@
+"""
+Write .br and .gz siblings next to compressible static files.
+
+Usage (from backend/):
+    python -m app.services.precompress [directory]
+
+Run at build time; the /static mount serves a sibling instead of the
+original when the client accepts its encoding. Files are compressed at
+the highest levels since this happens once, siblings already newer than
+their file are kept, siblings that would not be smaller are not written,
+and siblings whose file is gone are removed. Only files this tool could
+have written count as siblings: a compressed file whose name without
+.br/.gz does not have a compressible extension (such as a shipped
+dataset.csv.gz) is left alone.
+"""
+import argparse
+import gzip
+import os
+import sys
+from typing import Dict, List, Optional
+
+import brotli
+
+# File extensions worth compressing
+COMPRESSIBLE_EXTENSIONS = {
+    ".css", ".html", ".js", ".json", ".map", ".mjs", ".svg", ".txt", ".xml",
+}
+
+# Files smaller than this gain nothing from compression (bytes)
+MIN_SIZE = 256
+
+SIBLINGS = {
+    ".br": lambda data: brotli.compress(data, quality=11),
+    ".gz": lambda data: gzip.compress(data, compresslevel=9, mtime=0),
+}
+
+
+def precompress(directory: str) -> Dict[str, List[str]]:
+    """Bring the compressed siblings of every file in a directory up to date"""
+    report: Dict[str, List[str]] = {"written": [], "unchanged": [], "removed": []}
+    for root, _, files in os.walk(directory):
+        names = set(files)
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            base, suffix = os.path.splitext(name)
+            if suffix in SIBLINGS:
+                generated = os.path.splitext(base)[1].lower() in COMPRESSIBLE_EXTENSIONS
+                if generated and base not in names:
+                    os.remove(path)
+                    report["removed"].append(path)
+                continue
+            if suffix.lower() not in COMPRESSIBLE_EXTENSIONS:
+                continue
+
+            stat = os.stat(path)
+            if stat.st_size < MIN_SIZE:
+                continue
+            data = None
+            for sibling_suffix, compress in SIBLINGS.items():
+                sibling = path + sibling_suffix
+                try:
+                    if os.stat(sibling).st_mtime >= stat.st_mtime:
+                        report["unchanged"].append(sibling)
+                        continue
+                except FileNotFoundError:
+                    pass
+
+                if data is None:
+                    with open(path, mode='rb') as f:
+                        data = f.read()
+                compressed = compress(data)
+                if len(compressed) >= len(data):
+                    if os.path.exists(sibling):
+                        os.remove(sibling)
+                        report["removed"].append(sibling)
+                    continue
+                with open(sibling, mode='wb') as f:
+                    f.write(compressed)
+                report["written"].append(sibling)
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("directory", nargs="?", default="static")
+    args = parser.parse_args(argv)
+
+    report = precompress(args.directory)
+    print(
+        f"Wrote {len(report['written'])} compressed files, kept {len(report['unchanged'])}, "
+        f"removed {len(report['removed'])} stale ones"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,284 @@
+import asyncio
+import contextvars
+import json
+import math
+import os
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from types import CodeType, FrameType
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from app.config import settings
+
+# Distinct stacks kept per profile; further new stacks are counted as truncated
+MAX_STACKS = 5000
+# Deepest stack recorded
+MAX_DEPTH = 128
+
+TRUNCATED = ("[truncated]",)
+
+# The profile of the request being handled, if it is being profiled
+current_profile: contextvars.ContextVar[Optional["Profile"]] = contextvars.ContextVar(
+    "current_profile", default=None
+)
+
+_labels: Dict[CodeType, str] = {}
+
+
+def _label(code: CodeType) -> str:
+    """Frame name in flame graphs: function and where it is defined"""
+    label = _labels.get(code)
+    if label is None:
+        path = code.co_filename
+        short = os.path.join(os.path.basename(os.path.dirname(path)), os.path.basename(path))
+        label = _labels[code] = f"{code.co_qualname} ({short}:{code.co_firstlineno})"
+    return label
+
+
+def _thread_stack(frame: Optional[FrameType], root: Optional[FrameType] = None) -> Tuple[str, ...]:
+    """Labels of a thread's frames, outermost first, starting at ``root`` if it is on the stack"""
+    labels = []
+    while frame is not None and len(labels) < MAX_DEPTH:
+        labels.append(_label(frame.f_code))
+        if frame is root:
+            break
+        frame = frame.f_back
+    labels.reverse()
+    return tuple(labels)
+
+
+def _await_stack(coro: Any) -> Tuple[str, ...]:
+    """Labels of the coroutines a suspended task is awaiting through, outermost first"""
+    labels = []
+    while coro is not None and len(labels) < MAX_DEPTH:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None)
+        if frame is None:
+            break
+        labels.append(_label(frame.f_code))
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None)
+    labels.append("[awaiting]")
+    return tuple(labels)
+
+
+class Profile:
+    """
+    Stack samples of one request.
+
+    At each sample the request is either running on the event loop (its
+    stack from the task's coroutine down is recorded), suspended (the
+    chain of awaits it is waiting in is recorded, ending in
+    ``[awaiting]``), or both, when threads doing blocking work for it are
+    busy; their stacks are recorded under ``[thread]``.
+    """
+
+    def __init__(self, task: asyncio.Task, interval: float, method: str, path: str, trigger: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.task = task
+        self.loop = task.get_loop()
+        self.loop_thread = threading.get_ident()
+        self.interval = interval
+        self.method = method
+        self.path = path
+        self.trigger = trigger
+        self.started_at = time.time()
+        self.started = time.perf_counter()
+        self.next_due = self.started + interval
+        self.threads: Set[int] = set()
+        self.stacks: Dict[Tuple[str, ...], int] = {}
+        self.samples = 0
+
+    def _add(self, stack: Tuple[str, ...]) -> None:
+        if stack not in self.stacks and len(self.stacks) >= MAX_STACKS:
+            stack = TRUNCATED
+        self.stacks[stack] = self.stacks.get(stack, 0) + 1
+
+    def sample(self, frames: Dict[int, FrameType]) -> None:
+        """Record where the request is now, given every thread's current frame"""
+        self.samples += 1
+        for thread in list(self.threads):
+            frame = frames.get(thread)
+            if frame is not None:
+                self._add(("[thread]",) + _thread_stack(frame))
+
+        coro = self.task.get_coro()
+        if asyncio.current_task(self.loop) is self.task:
+            self._add(_thread_stack(frames.get(self.loop_thread), getattr(coro, "cr_frame", None)))
+        elif not self.threads:
+            self._add(_await_stack(coro))
+
+    def folded(self) -> str:
+        """The samples in the collapsed-stack format read by flamegraph.pl, speedscope and inferno"""
+        lines = [f"{';'.join(stack)} {count}" for stack, count in sorted(self.stacks.items()) if stack]
+        return "\n".join(lines) + "\n"
+
+
+class Sampler:
+    """
+    A single background thread sampling every active profile at its interval.
+
+    The thread sleeps while nothing is being profiled, so an idle profiler
+    costs nothing. Profiles are sampled while holding the lock that
+    ``end`` takes, so once ``end`` returns a profile is no longer changed
+    and its samples can be read.
+    """
+
+    def __init__(self):
+        self._profiles: Set[Profile] = set()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._wake_at = math.inf
+
+    def begin(self, profile: Profile) -> None:
+        with self._lock:
+            self._profiles.add(profile)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+                self._thread.start()
+            # Waking the thread is most of the cost; it is only needed when
+            # the new profile is due before the thread would wake anyway
+            wake = profile.next_due < self._wake_at
+        if wake:
+            self._wakeup.set()
+
+    def end(self, profile: Profile) -> None:
+        with self._lock:
+            self._profiles.discard(profile)
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                idle = not self._profiles
+                if idle:
+                    self._wake_at = math.inf
+            if idle:
+                self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+
+            now = time.perf_counter()
+            with self._lock:
+                due = [profile for profile in self._profiles if profile.next_due <= now]
+                if due:
+                    frames = sys._current_frames()
+                    for profile in due:
+                        try:
+                            profile.sample(frames)
+                        except Exception as e:
+                            print(f"Error sampling request {profile.path}: {e}")
+                        profile.next_due = max(profile.next_due + profile.interval, now)
+                    del frames
+                self._wake_at = min((profile.next_due for profile in self._profiles), default=now)
+            delay = self._wake_at - time.perf_counter()
+            if delay > 0:
+                self._wakeup.wait(delay)
+                self._wakeup.clear()
+
+
+class ProfileStore:
+    """
+    The most recent finished profiles, shared by every worker process.
+
+    Each profile is written to ``<directory>/<id>.json``, so an
+    ``X-Profile-Id`` can be fetched from whichever worker answers. Beyond
+    ``size`` profiles, the oldest files are removed. Reads and writes are
+    blocking.
+    """
+
+    def __init__(self, directory: str, size: int):
+        self.directory = directory
+        self.size = size
+
+    def _path(self, profile_id: str) -> str:
+        return os.path.join(self.directory, f"{profile_id}.json")
+
+    def _entries(self) -> List[os.DirEntry]:
+        """The stored profile files, newest first"""
+        try:
+            entries = [entry for entry in os.scandir(self.directory) if entry.name.endswith(".json")]
+        except FileNotFoundError:
+            return []
+        dated = []
+        for entry in entries:
+            try:
+                dated.append((entry.stat().st_mtime_ns, entry))
+            except FileNotFoundError:
+                # Removed by another worker meanwhile
+                continue
+        dated.sort(key=lambda item: item[0], reverse=True)
+        return [entry for _, entry in dated]
+
+    def add(self, profile: Profile, status: int, duration: float) -> None:
+        record = {
+            "id": profile.id,
+            "trigger": profile.trigger,
+            "method": profile.method,
+            "path": profile.path,
+            "status": status,
+            "duration_seconds": round(duration, 6),
+            "started_at": profile.started_at,
+            "samples": profile.samples,
+            "sample_interval_seconds": profile.interval,
+            "folded": profile.folded(),
+        }
+        os.makedirs(self.directory, exist_ok=True)
+        temp_path = os.path.join(self.directory, f".{profile.id}.tmp")
+        with open(temp_path, mode='w') as f:
+            json.dump(record, f)
+        os.replace(temp_path, self._path(profile.id))
+        for entry in self._entries()[self.size:]:
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+
+    def _read(self, path: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(path, mode='r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            # Removed meanwhile
+            return None
+
+    def list(self) -> List[Dict[str, Any]]:
+        """Summaries of the stored profiles, newest first"""
+        records = [self._read(entry.path) for entry in self._entries()[:self.size]]
+        return [
+            {key: value for key, value in record.items() if key != "folded"}
+            for record in records
+            if record is not None
+        ]
+
+    def get(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        if not profile_id.isalnum():
+            return None
+        return self._read(self._path(profile_id))
+
+    def clear(self) -> None:
+        for entry in self._entries():
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+
+
+@contextmanager
+def working_for(profile: Optional[Profile]) -> Iterator[None]:
+    """Mark the current thread as doing blocking work for a profiled request"""
+    if profile is None:
+        yield
+        return
+    thread = threading.get_ident()
+    profile.threads.add(thread)
+    try:
+        yield
+    finally:
+        profile.threads.discard(thread)
+
+
+# Initialize the sampler and profile store as singletons
+sampler = Sampler()
+profile_store = ProfileStore(settings.PROFILE_DIR, settings.PROFILE_BUFFER_SIZE)
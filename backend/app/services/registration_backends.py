@@ -0,0 +1,198 @@
+import random
+import re
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Protocol
+
+import gspread
+from google.oauth2.service_account import Credentials
+from gspread.exceptions import APIError
+
+from app.config import settings
+
+# Column order of the registrations worksheet
+REGISTRATION_COLUMNS = [
+    "name",
+    "email",
+    "website",
+    "artist_statement",
+    "work_sample_urls",
+    "submitted_at",
+    "id",
+    "status",
+]
+
+
+class RegistrationBackend(Protocol):
+    """
+    The subset of the gspread worksheet API the registration services use.
+
+    A gspread ``Worksheet`` satisfies it as-is; ``FakeWorksheet`` stands in
+    for it in tests and load tests. Methods are blocking and are called
+    from the Sheets thread pool.
+    """
+
+    def append_rows(self, values: List[List[Any]], **kwargs) -> Any:
+        ...
+
+    def get_all_records(self, **kwargs) -> List[Dict[str, Any]]:
+        ...
+
+    def get_values(self, range_name: str, **kwargs) -> List[List[str]]:
+        ...
+
+    def batch_update(self, data: List[Dict[str, Any]], **kwargs) -> Any:
+        ...
+
+
+class FakeResponse:
+    """Minimal HTTP response carried by the APIErrors a fake backend raises"""
+
+    def __init__(self, status_code: int, message: str):
+        self.status_code = status_code
+        self.text = message
+
+    def json(self) -> Dict[str, Any]:
+        return {"error": {"code": self.status_code, "message": self.text}}
+
+
+class FakeWorksheet:
+    """
+    In-process stand-in for a gspread worksheet.
+
+    Safe to call from several threads at once. Only the most recent
+    ``max_rows`` data rows are kept in memory; row numbers keep counting
+    past dropped rows, so incremental reads still line up. Every call can
+    be made to behave like the real API under load:
+
+    - ``latency`` seconds (plus up to ``jitter`` more) of blocking delay
+    - ``error_rate``: fraction of calls failing with HTTP 500
+    - ``quota_per_minute``: calls allowed in any 60 second window before
+      further calls fail with HTTP 429, like the Sheets per-user quota
+    """
+
+    def __init__(
+        self,
+        header: List[str] = REGISTRATION_COLUMNS,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        quota_per_minute: int = 0,
+        max_rows: Optional[int] = None,
+        seed: Optional[int] = None,
+    ):
+        self._lock = threading.Lock()
+        self.header = list(header)
+        self.rows: List[List[Any]] = [list(header)]
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.quota_per_minute = quota_per_minute
+        self.max_rows = max_rows
+        # Data rows dropped to stay within max_rows
+        self.dropped = 0
+        self._random = random.Random(seed)
+        self._calls: Deque[float] = deque()
+
+        # Counters for load tests
+        self.requests = 0
+        self.quota_errors = 0
+        self.errors = 0
+
+    def _request(self) -> None:
+        """Simulate the cost and failure modes of one API request"""
+        with self._lock:
+            self.requests += 1
+            now = time.monotonic()
+            if self.quota_per_minute:
+                while self._calls and self._calls[0] <= now - 60:
+                    self._calls.popleft()
+                if len(self._calls) >= self.quota_per_minute:
+                    self.quota_errors += 1
+                    raise APIError(FakeResponse(429, "Quota exceeded for quota metric 'Write requests'"))
+                self._calls.append(now)
+            fails = self.error_rate and self._random.random() < self.error_rate
+            delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0)
+
+        if delay:
+            time.sleep(delay)
+        if fails:
+            with self._lock:
+                self.errors += 1
+            raise APIError(FakeResponse(500, "Internal error encountered."))
+
+    def append_row(self, values: List[Any], **kwargs) -> None:
+        self.append_rows([values])
+
+    def append_rows(self, values: List[List[Any]], **kwargs) -> None:
+        self._request()
+        with self._lock:
+            self.rows.extend(list(row) for row in values)
+            excess = len(self.rows) - 1 - self.max_rows if self.max_rows is not None else 0
+            if excess > 0:
+                del self.rows[1:excess + 1]
+                self.dropped += excess
+
+    def get_all_records(self, **kwargs) -> List[Dict[str, Any]]:
+        self._request()
+        with self._lock:
+            header, *rows = self.rows
+            return [dict(zip(header, row)) for row in rows]
+
+    def get_values(self, range_name: str, **kwargs) -> List[List[str]]:
+        # Only "A<row>:<column>" ranges, as used by get_rows_after, are supported
+        start = int(re.match(r"[A-Z]+(\d+)", range_name).group(1))
+        self._request()
+        with self._lock:
+            # Sheet row 2 is the first data row; skip rows no longer kept
+            first = max(start - 2 - self.dropped, 0) + 1
+            return [[str(value) for value in row] for row in self.rows[first:]]
+
+    def batch_update(self, data: List[Dict[str, Any]], **kwargs) -> None:
+        # Only single-cell "<column><row>" ranges are supported
+        self._request()
+        with self._lock:
+            for update in data:
+                column, row = re.fullmatch(r"([A-Z])(\d+)", update["range"]).groups()
+                index = int(row) - 1 - self.dropped
+                if index < 1:
+                    continue
+                cells = self.rows[index]
+                position = ord(column) - ord("A")
+                cells.extend([""] * (position + 1 - len(cells)))
+                cells[position] = update["values"][0][0]
+
+    def row_count(self) -> int:
+        """Number of data rows appended so far, including dropped ones"""
+        with self._lock:
+            return len(self.rows) - 1 + self.dropped
+
+
+def fake_backend() -> FakeWorksheet:
+    """Create a fake backend configured from the FAKE_SHEETS_* settings"""
+    return FakeWorksheet(
+        latency=settings.FAKE_SHEETS_LATENCY,
+        jitter=settings.FAKE_SHEETS_JITTER,
+        error_rate=settings.FAKE_SHEETS_ERROR_RATE,
+        quota_per_minute=settings.FAKE_SHEETS_QUOTA_PER_MINUTE,
+        max_rows=settings.FAKE_SHEETS_MAX_ROWS,
+    )
+
+
+def google_backend() -> RegistrationBackend:
+    """Open the registrations worksheet in Google Sheets"""
+    # Set up credentials for Google Sheets API
+    scopes = [
+        'https://www.googleapis.com/auth/spreadsheets',
+        'https://www.googleapis.com/auth/drive'
+    ]
+
+    credentials = Credentials.from_service_account_file(
+        settings.GOOGLE_CREDENTIALS_FILE,
+        scopes=scopes
+    )
+
+    client = gspread.authorize(credentials)
+    sheet = client.open_by_key(settings.REGISTRATION_SHEET_ID)
+    return sheet.worksheet(settings.REGISTRATION_WORKSHEET)
@@ -0,0 +1,567 @@
+import asyncio
+import os
+import random
+import sqlite3
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from app.config import settings
+from app.models.registration import ArtistRegistration
+from app.services.coherence import LeaderLock, SharedCounter, leader, registration_signal
+from app.services.executor import STORAGE, UNBOUNDED, blocking_io
+
+# Delivers a batch of registrations to their final destination, raising on failure
+Deliver = Callable[[List[ArtistRegistration]], Awaitable[object]]
+
+# An earlier submission found by one of its keys: (key, registration ID, payload fingerprint)
+Submission = Tuple[str, str, str]
+
+# A claimed registration: (journal sequence number, registration)
+Claimed = Tuple[int, ArtistRegistration]
+
+# How often the leader checks for registrations journaled by other workers (seconds)
+SIGNAL_CHECK_INTERVAL = 0.1
+
+# Dead letters listed by dead_letter_report
+MAX_REPORTED_DEAD_LETTERS = 20
+
+
+class DeliveryThrottled(Exception):
+    """Raised by a delivery function when the destination asks to slow down"""
+
+    def __init__(self, retry_after: float, message: str = "Delivery throttled"):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class DeliveryRejected(Exception):
+    """Raised by a delivery function when the destination rejects the data of a batch"""
+
+
+class RegistrationQueue:
+    """
+    Durable write-ahead queue of artist registrations.
+
+    Registrations are committed to a SQLite journal (WAL mode with
+    synchronous=FULL, so every commit is fsynced) before the request is
+    acknowledged. A worker drains the journal and only removes an entry
+    after it was delivered, which gives at-least-once delivery across
+    crashes and restarts. A registration that still fails after
+    REGISTRATION_MAX_ATTEMPTS deliveries is moved to a dead-letter table,
+    where it is kept with its last error until an administrator redrives
+    it.
+
+    The journal also remembers recent submissions by key, so that every
+    worker process recognizes a repeated submission, whichever worker got
+    the first one.
+
+    The journal file is opened on first use, or by ``open`` when the worker
+    starts, so importing the module touches no files.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or settings.REGISTRATION_QUEUE_PATH
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+
+    @property
+    def opened(self) -> bool:
+        return self._connection is not None
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        """The journal connection, opened on first use; callers hold ``_lock``"""
+        if self._connection is None:
+            self._connection = self._open()
+        return self._connection
+
+    def _open(self) -> sqlite3.Connection:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=FULL")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS registration_queue (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                registration_id TEXT NOT NULL UNIQUE,
+                payload TEXT NOT NULL,
+                enqueued_at REAL NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL,
+                last_error TEXT
+            )
+            """
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS registration_queue_due ON registration_queue (next_attempt_at)"
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS dead_letters (
+                registration_id TEXT PRIMARY KEY,
+                payload TEXT NOT NULL,
+                enqueued_at REAL NOT NULL,
+                attempts INTEGER NOT NULL,
+                failed_at REAL NOT NULL,
+                last_error TEXT
+            )
+            """
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS submissions (
+                key TEXT PRIMARY KEY,
+                registration_id TEXT NOT NULL,
+                fingerprint TEXT NOT NULL,
+                submitted_at REAL NOT NULL
+            )
+            """
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS submissions_submitted_at ON submissions (submitted_at)"
+        )
+        return conn
+
+    def open(self) -> None:
+        """Open the journal now rather than on first use"""
+        with self._lock:
+            if self._connection is None:
+                self._connection = self._open()
+
+    def _find_submission(self, keys: Sequence[str], since: float) -> Optional[Submission]:
+        if not keys:
+            return None
+        rows: Dict[str, Tuple[str, str]] = {
+            key: (registration_id, fingerprint)
+            for key, registration_id, fingerprint in self._conn.execute(
+                "SELECT key, registration_id, fingerprint FROM submissions "
+                f"WHERE submitted_at >= ? AND key IN ({', '.join('?' * len(keys))})",
+                (since, *keys),
+            )
+        }
+        for key in keys:
+            if key in rows:
+                return (key, *rows[key])
+        return None
+
+    def find_submission(self, keys: Sequence[str], window: float) -> Optional[Submission]:
+        """The submission recorded within the last ``window`` seconds under the first of ``keys`` that has one"""
+        with self._lock:
+            return self._find_submission(keys, time.time() - window)
+
+    def enqueue(
+        self,
+        registration: ArtistRegistration,
+        keys: Sequence[str] = (),
+        fingerprint: str = "",
+        window: float = 0.0,
+    ) -> Optional[Submission]:
+        """
+        Durably append a registration to the journal.
+
+        With a ``window``, the registration is recorded under ``keys`` and
+        its payload ``fingerprint`` in the same transaction, unless one of
+        the keys was recorded within the last ``window`` seconds: then
+        nothing is journaled and the earlier submission is returned.
+        Transactions are serialized across processes, so of concurrent
+        duplicates exactly one is journaled.
+        """
+        now = time.time()
+        keys = keys if window > 0 else ()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                earlier = self._find_submission(keys, now - window)
+                if earlier is None:
+                    self._conn.execute(
+                        "INSERT OR IGNORE INTO registration_queue "
+                        "(registration_id, payload, enqueued_at, next_attempt_at) VALUES (?, ?, ?, ?)",
+                        (registration.id, registration.model_dump_json(), now, now),
+                    )
+                    if keys:
+                        self._conn.execute("DELETE FROM submissions WHERE submitted_at < ?", (now - window,))
+                        self._conn.executemany(
+                            "INSERT OR REPLACE INTO submissions "
+                            "(key, registration_id, fingerprint, submitted_at) VALUES (?, ?, ?, ?)",
+                            [(key, registration.id, fingerprint, now) for key in keys],
+                        )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return earlier
+
+    def claim(self, limit: int, lease: float) -> List[Claimed]:
+        """
+        Claim up to ``limit`` due registrations, oldest first.
+
+        Claimed entries are not due again until ``lease`` seconds have
+        passed, so an entry whose delivery was interrupted by a crash is
+        retried once the lease expires.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute(
+                    "SELECT seq, payload FROM registration_queue "
+                    "WHERE next_attempt_at <= ? ORDER BY seq LIMIT ?",
+                    (now, limit),
+                ).fetchall()
+                self._conn.executemany(
+                    "UPDATE registration_queue SET next_attempt_at = ? WHERE seq = ?",
+                    [(now + lease, seq) for seq, _ in rows],
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+        return [(seq, ArtistRegistration.model_validate_json(payload)) for seq, payload in rows]
+
+    def ack(self, seqs: List[int]) -> None:
+        """Remove delivered registrations from the journal"""
+        with self._lock:
+            self._conn.executemany("DELETE FROM registration_queue WHERE seq = ?", [(seq,) for seq in seqs])
+
+    def release(self, seqs: List[int], delay: float) -> None:
+        """Make claimed registrations due again after ``delay`` without counting an attempt"""
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE registration_queue SET next_attempt_at = ? WHERE seq = ?",
+                [(time.time() + delay, seq) for seq in seqs],
+            )
+
+    def fail(self, seqs: List[int], error: str, max_attempts: Optional[int] = None) -> int:
+        """
+        Record a failed delivery and schedule retries with exponential backoff.
+
+        Registrations that have failed ``max_attempts`` times (default
+        REGISTRATION_MAX_ATTEMPTS, 0 retries forever) are moved to the
+        dead-letter table instead. Returns how many were.
+        """
+        max_attempts = settings.REGISTRATION_MAX_ATTEMPTS if max_attempts is None else max_attempts
+        now = time.time()
+        dead = 0
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for seq in seqs:
+                    row = self._conn.execute(
+                        "SELECT attempts FROM registration_queue WHERE seq = ?", (seq,)
+                    ).fetchone()
+                    if row is None:
+                        continue
+                    attempts = row[0] + 1
+                    if max_attempts and attempts >= max_attempts:
+                        self._conn.execute(
+                            "INSERT OR REPLACE INTO dead_letters "
+                            "(registration_id, payload, enqueued_at, attempts, failed_at, last_error) "
+                            "SELECT registration_id, payload, enqueued_at, ?, ?, ? FROM registration_queue WHERE seq = ?",
+                            (attempts, now, error, seq),
+                        )
+                        self._conn.execute("DELETE FROM registration_queue WHERE seq = ?", (seq,))
+                        dead += 1
+                    else:
+                        self._conn.execute(
+                            "UPDATE registration_queue SET attempts = ?, next_attempt_at = ?, last_error = ? "
+                            "WHERE seq = ?",
+                            (attempts, now + retry_delay(attempts), error, seq),
+                        )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return dead
+
+    def redrive(self, ids: Optional[Sequence[str]] = None) -> int:
+        """
+        Move dead letters, all of them or those with ``ids``, back into the
+        journal to be delivered again with a fresh attempt count. Returns
+        how many were moved.
+        """
+        if ids is not None and not ids:
+            return 0
+        where = "" if ids is None else f" WHERE registration_id IN ({', '.join('?' * len(ids))})"
+        params = () if ids is None else tuple(ids)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                moved = self._conn.execute(
+                    "INSERT OR IGNORE INTO registration_queue (registration_id, payload, enqueued_at, next_attempt_at) "
+                    "SELECT registration_id, payload, enqueued_at, ? FROM dead_letters" + where,
+                    (time.time(), *params),
+                ).rowcount
+                self._conn.execute("DELETE FROM dead_letters" + where, params)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return moved
+
+    def depth(self) -> int:
+        """Number of registrations waiting for delivery"""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM registration_queue").fetchone()[0]
+
+    def dead_letter_report(self, limit: int = MAX_REPORTED_DEAD_LETTERS) -> Dict[str, Any]:
+        """Number of undeliverable registrations and the most recent ones, without their payload"""
+        with self._lock:
+            count = self._conn.execute("SELECT COUNT(*) FROM dead_letters").fetchone()[0]
+            rows = self._conn.execute(
+                "SELECT registration_id, attempts, failed_at, last_error FROM dead_letters "
+                "ORDER BY failed_at DESC LIMIT ?",
+                (limit,),
+            ).fetchall()
+        return {
+            "count": count,
+            "recent": [
+                {"id": registration_id, "attempts": attempts, "failed_at": failed_at, "error": error}
+                for registration_id, attempts, failed_at, error in rows
+            ],
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+def retry_delay(attempts: int) -> float:
+    """Exponential backoff with jitter, capped at the configured maximum"""
+    ceiling = min(
+        settings.REGISTRATION_RETRY_MAX_DELAY,
+        settings.REGISTRATION_RETRY_BASE_DELAY * 2 ** (attempts - 1),
+    )
+    return random.uniform(ceiling / 2, ceiling)
+
+
+class RegistrationQueueWorker:
+    """
+    Background task that drains the registration queue in batches.
+
+    After being woken by a new registration the worker waits for the batch
+    window so that a burst of submissions is coalesced into a few deliveries
+    of up to ``batch_size`` registrations each.
+
+    With several server processes, only the one holding ``leader`` drains,
+    so batches stay large and quota backoff applies to all deliveries.
+    The others journal registrations and wake the leader through
+    ``signal``; they retry for leadership every poll interval, so one of
+    them takes over within seconds if the leader exits.
+    """
+
+    def __init__(
+        self,
+        queue: RegistrationQueue,
+        deliver: Deliver,
+        batch_size: Optional[int] = None,
+        batch_window: Optional[float] = None,
+        lease: float = 300.0,
+        leader: Optional[LeaderLock] = None,
+        signal: Optional[SharedCounter] = None,
+    ):
+        self.queue = queue
+        self.deliver = deliver
+        self.batch_size = batch_size or settings.REGISTRATION_BATCH_SIZE
+        self.batch_window = settings.REGISTRATION_BATCH_WINDOW if batch_window is None else batch_window
+        self.lease = lease
+        self.leader = leader
+        self.signal = signal
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def is_leader(self) -> bool:
+        return self.leader is None or self.leader.is_leader
+
+    async def find_submission(self, keys: Sequence[str]) -> Optional[Submission]:
+        """A submission journaled under one of ``keys`` within REGISTRATION_DEDUP_WINDOW"""
+        return await blocking_io.run(
+            STORAGE, self.queue.find_submission, keys, settings.REGISTRATION_DEDUP_WINDOW
+        )
+
+    async def enqueue(
+        self, registration: ArtistRegistration, keys: Sequence[str] = (), fingerprint: str = ""
+    ) -> Optional[Submission]:
+        """
+        Journal a registration and wake the worker, unless a submission with
+        one of ``keys`` was journaled within REGISTRATION_DEDUP_WINDOW, which
+        is returned instead.
+
+        The journal write is awaited without a timeout: once it started it
+        may commit, and the caller must not report a failure for a
+        registration that was accepted.
+        """
+        earlier = await blocking_io.run(
+            STORAGE,
+            self.queue.enqueue,
+            registration,
+            keys,
+            fingerprint,
+            settings.REGISTRATION_DEDUP_WINDOW,
+            timeout=UNBOUNDED,
+        )
+        if earlier is not None:
+            return earlier
+        await self._notify()
+        return None
+
+    async def redrive(self, ids: Optional[Sequence[str]] = None) -> int:
+        """Move dead letters back into the journal and wake the worker, returning how many were moved"""
+        moved = await blocking_io.run(STORAGE, self.queue.redrive, ids, timeout=UNBOUNDED)
+        if moved:
+            await self._notify()
+        return moved
+
+    async def _notify(self) -> None:
+        """Wake the draining worker, in this process or the leader's"""
+        if self.is_leader:
+            if self._wakeup is not None:
+                self._wakeup.set()
+        elif self.signal is not None:
+            try:
+                await blocking_io.run(STORAGE, self.signal.increment)
+            except Exception as e:
+                # The leader still finds it within the poll interval
+                print(f"Error signalling a new registration: {e}")
+
+    async def drain_once(self) -> int:
+        """Deliver every due registration once, returning how many were delivered"""
+        delivered = 0
+        while True:
+            batch = await blocking_io.run(STORAGE, self.queue.claim, self.batch_size, self.lease)
+            if not batch:
+                return delivered
+            delivered += await self._deliver_batch(batch)
+
+    async def _deliver_batch(self, batch: List[Claimed]) -> int:
+        """
+        Deliver a claimed batch, returning how many registrations were delivered.
+
+        A batch the destination rejects is split in halves that are
+        delivered in turn, down to single registrations, so one registration
+        with bad data does not hold back (and use up the attempts of) the
+        rest of its batch; only single registrations are recorded as
+        rejected. Any other error, such as a server error or a lost
+        connection, is not the data's fault: the whole remaining batch is
+        retried later with backoff.
+        """
+        delivered = 0
+        parts = [batch]
+        while parts:
+            part = parts.pop(0)
+            seqs = [seq for seq, _ in part]
+            try:
+                await self.deliver([registration for _, registration in part])
+            except DeliveryThrottled as e:
+                # Not the batch's fault: put the rest back and pause all deliveries
+                print(f"Registration delivery throttled, retrying in {e.retry_after:.1f}s")
+                seqs += [seq for rest in parts for seq, _ in rest]
+                await blocking_io.run(STORAGE, self.queue.release, seqs, e.retry_after)
+                await asyncio.sleep(e.retry_after)
+                return delivered
+            except DeliveryRejected as e:
+                if len(part) > 1:
+                    print(f"{len(part)} registrations rejected, retrying them in halves: {e}")
+                    middle = len(part) // 2
+                    parts[:0] = [part[:middle], part[middle:]]
+                    continue
+                print(f"Registration {part[0][1].id} rejected: {e}")
+                if await blocking_io.run(STORAGE, self.queue.fail, seqs, str(e)):
+                    print(f"Registration {part[0][1].id} moved to dead letters after its last attempt")
+            except Exception as e:
+                seqs += [seq for rest in parts for seq, _ in rest]
+                print(f"Error delivering {len(seqs)} registrations, retrying them later: {e}")
+                dead = await blocking_io.run(STORAGE, self.queue.fail, seqs, str(e))
+                if dead:
+                    print(f"{dead} registrations moved to dead letters after their last attempt")
+                return delivered
+            else:
+                await blocking_io.run(STORAGE, self.queue.ack, seqs)
+                delivered += len(part)
+        return delivered
+
+    async def _wait(self) -> None:
+        """Sleep until woken, signalled by another worker, or the poll interval passes"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.REGISTRATION_QUEUE_POLL_INTERVAL
+        watch = self.signal is not None and self.signal.value is not None and self.is_leader
+        seen = self.signal.value if watch else None
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return
+            try:
+                await asyncio.wait_for(
+                    self._wakeup.wait(), timeout=min(remaining, SIGNAL_CHECK_INTERVAL) if watch else remaining
+                )
+                return
+            except asyncio.TimeoutError:
+                pass
+            if watch and self.signal.value != seen:
+                return
+
+    async def run(self) -> None:
+        """Drain the queue until cancelled"""
+        while True:
+            self._wakeup.clear()
+            try:
+                if not self.queue.opened:
+                    await blocking_io.run(STORAGE, self.queue.open)
+                if self.signal is not None and self.signal.value is None:
+                    await blocking_io.run(STORAGE, self.signal.open)
+                if not self.is_leader:
+                    await blocking_io.run(STORAGE, self.leader.try_acquire)
+                if self.is_leader:
+                    # Give a burst time to accumulate unless a full batch is waiting
+                    if self.batch_window and await blocking_io.run(STORAGE, self.queue.depth) < self.batch_size:
+                        await asyncio.sleep(self.batch_window)
+                    await self.drain_once()
+            except Exception as e:
+                # Keep the worker alive if the journal itself is unavailable
+                print(f"Registration queue worker error: {e}")
+            await self._wait()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        """Start draining in the running event loop"""
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        """Stop the worker; undelivered registrations stay in the journal"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self._wakeup = None
+        if self.leader is not None:
+            # Let another worker take over right away
+            self.leader.release()
+
+
+def _deliver_to_sheets(registrations: List[ArtistRegistration]) -> Awaitable[object]:
+    # Resolved per call so the writer can be swapped (e.g. in tests)
+    from app.services.sheets_writer import sheets_batch_writer
+    return sheets_batch_writer(registrations)
+
+
+# Initialize the queue and its worker as singletons
+registration_queue = RegistrationQueue()
+registration_worker = RegistrationQueueWorker(
+    registration_queue, _deliver_to_sheets, leader=leader, signal=registration_signal
+)
@@ -0,0 +1,287 @@
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.models.registration import ArtistRegistration
+from app.services.executor import STORAGE, blocking_io
+from app.services.google_sheets import google_sheets_service
+
+# Columns kept in the mirror, in the order they are returned
+COLUMNS = [
+    "id",
+    "name",
+    "email",
+    "website",
+    "artist_statement",
+    "work_sample_urls",
+    "submitted_at",
+    "status",
+    "row_number",
+]
+
+# Columns the admin listing can be sorted by
+SORTABLE_COLUMNS = {"submitted_at", "email", "status", "name"}
+
+
+class RegistrationStore:
+    """
+    Local SQLite mirror of the registrations worksheet.
+
+    New registrations are recorded as soon as they are accepted, and rows
+    appended to the sheet are pulled in incrementally: the store remembers
+    how many sheet rows it has seen and only downloads rows after that
+    offset. Rows are keyed by registration ID, so a periodic full sync,
+    which replaces what the mirror holds from the sheet, undoes any drift
+    from rows being sorted or deleted in the sheet. Admin listings and
+    status lookups are served from the mirror using indexed queries. The
+    database is opened on first use.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or settings.REGISTRATION_STORE_PATH
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+        self._last_sync: Optional[float] = None
+        self._last_full_sync: Optional[float] = None
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        """The mirror connection, opened on first use; callers hold ``_lock``"""
+        if self._connection is None:
+            self._connection = self._open()
+        return self._connection
+
+    def _open(self) -> sqlite3.Connection:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS registrations (
+                id TEXT PRIMARY KEY,
+                name TEXT NOT NULL DEFAULT '',
+                email TEXT NOT NULL DEFAULT '',
+                website TEXT NOT NULL DEFAULT '',
+                artist_statement TEXT NOT NULL DEFAULT '',
+                work_sample_urls TEXT NOT NULL DEFAULT '',
+                submitted_at TEXT NOT NULL DEFAULT '',
+                status TEXT NOT NULL DEFAULT 'pending',
+                row_number INTEGER
+            );
+            CREATE INDEX IF NOT EXISTS registrations_email ON registrations (email COLLATE NOCASE);
+            CREATE INDEX IF NOT EXISTS registrations_status ON registrations (status, submitted_at);
+            CREATE INDEX IF NOT EXISTS registrations_submitted_at ON registrations (submitted_at);
+            CREATE TABLE IF NOT EXISTS sync_state (
+                key TEXT PRIMARY KEY,
+                value REAL NOT NULL
+            );
+            """
+        )
+        return conn
+
+    def add(self, registration: ArtistRegistration) -> None:
+        """Record a newly accepted registration"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO registrations "
+                "(id, name, email, website, artist_statement, work_sample_urls, submitted_at, status) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    registration.id,
+                    registration.name,
+                    registration.email,
+                    str(registration.website) if registration.website else "",
+                    registration.artist_statement,
+                    ", ".join(str(url) for url in registration.work_sample_urls),
+                    registration.submitted_at.isoformat(),
+                    registration.status,
+                ),
+            )
+
+    def get(self, registration_id: str) -> Optional[Dict[str, Any]]:
+        """Look up a registration by ID"""
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM registrations WHERE id = ?", (registration_id,)
+            ).fetchone()
+        return dict(row) if row is not None else None
+
+    def search(
+        self,
+        status: Optional[str] = None,
+        email: Optional[str] = None,
+        submitted_from: Optional[str] = None,
+        submitted_to: Optional[str] = None,
+        sort: str = "-submitted_at",
+        limit: Optional[int] = None,
+        offset: int = 0,
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Filter, sort and paginate registrations.
+
+        ``submitted_from`` and ``submitted_to`` are ISO timestamps or dates;
+        a date as ``submitted_to`` includes that whole day.
+        ``sort`` is a column name, prefixed with "-" for descending order.
+        Returns the page of registrations and the total number of matches.
+        """
+        column = sort.lstrip("-")
+        if column not in SORTABLE_COLUMNS:
+            raise ValueError(f"Cannot sort by {column}")
+        direction = "DESC" if sort.startswith("-") else "ASC"
+
+        conditions, params = [], []
+        if status is not None:
+            conditions.append("status = ?")
+            params.append(status)
+        if email is not None:
+            conditions.append("email = ? COLLATE NOCASE")
+            params.append(email)
+        if submitted_from is not None:
+            conditions.append("submitted_at >= ?")
+            params.append(submitted_from)
+        if submitted_to is not None:
+            try:
+                day = date.fromisoformat(submitted_to)
+            except ValueError:
+                conditions.append("submitted_at <= ?")
+                params.append(submitted_to)
+            else:
+                # Timestamps on that day sort after the bare date
+                conditions.append("submitted_at < ?")
+                params.append((day + timedelta(days=1)).isoformat())
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        with self._lock:
+            total = self._conn.execute(
+                f"SELECT COUNT(*) FROM registrations {where}", params
+            ).fetchone()[0]
+            rows = self._conn.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM registrations {where} "
+                f"ORDER BY {column} {direction}, id LIMIT ? OFFSET ?",
+                [*params, -1 if limit is None else limit, offset],
+            ).fetchall()
+        return [dict(row) for row in rows], total
+
+    def synced_rows(self) -> int:
+        """Number of sheet rows already mirrored"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM sync_state WHERE key = 'synced_rows'"
+            ).fetchone()
+        return int(row[0]) if row is not None else 0
+
+    def apply_sheet_rows(self, records: List[Dict[str, Any]], synced_rows: int, replace: bool = False) -> None:
+        """
+        Upsert rows downloaded from the sheet and advance the sync offset.
+
+        With ``replace``, ``records`` is the whole sheet: registrations
+        mirrored from the sheet before that are no longer in it are
+        dropped. Registrations recorded locally and not synced yet are kept.
+        Rows without an ID are skipped until a full sync gave them one.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                if replace:
+                    self._conn.execute("DELETE FROM registrations WHERE row_number IS NOT NULL")
+                for record in records:
+                    if not record.get("id"):
+                        continue
+                    self._conn.execute(
+                        "INSERT INTO registrations "
+                        "(id, name, email, website, artist_statement, work_sample_urls, submitted_at, status, row_number) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                        "ON CONFLICT(id) DO UPDATE SET "
+                        "name = excluded.name, email = excluded.email, website = excluded.website, "
+                        "artist_statement = excluded.artist_statement, "
+                        "work_sample_urls = excluded.work_sample_urls, "
+                        "submitted_at = excluded.submitted_at, status = excluded.status, "
+                        "row_number = excluded.row_number",
+                        (
+                            record["id"],
+                            record.get("name", ""),
+                            record.get("email", ""),
+                            record.get("website", ""),
+                            record.get("artist_statement", ""),
+                            record.get("work_sample_urls", ""),
+                            record.get("submitted_at", ""),
+                            record.get("status") or "pending",
+                            record["row_number"],
+                        ),
+                    )
+                self._conn.execute(
+                    "INSERT INTO sync_state (key, value) VALUES ('synced_rows', ?) "
+                    "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                    (synced_rows,),
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    async def backfill_ids(self, records: List[Dict[str, Any]]) -> None:
+        """
+        Give sheet rows written before IDs were recorded an ID, in the sheet
+        and in ``records``, so they are mirrored like every other row.
+
+        The IDs are written by row number right after the rows were read;
+        if that fails, the rows are tried again on the next full sync.
+        """
+        missing = {record["row_number"]: str(uuid.uuid4()) for record in records if not record.get("id")}
+        if not missing:
+            return
+        try:
+            await google_sheets_service.set_registration_ids(missing)
+        except Exception as e:
+            print(f"Error writing IDs to {len(missing)} registration rows: {e}")
+            return
+        for record in records:
+            if record["row_number"] in missing:
+                record["id"] = missing[record["row_number"]]
+
+    async def sync(self, full: bool = False) -> int:
+        """
+        Pull new sheet rows into the mirror, returning how many were fetched.
+
+        A full sync re-reads the whole sheet and replaces what the mirror
+        holds from it, picking up edits (such as status changes), sorted
+        and deleted rows, and gives rows without an ID one.
+        """
+        offset = 0 if full else await blocking_io.run(STORAGE, self.synced_rows)
+        records = await google_sheets_service.get_rows_after(offset)
+        if full:
+            await self.backfill_ids(records)
+        await blocking_io.run(STORAGE, self.apply_sheet_rows, records, offset + len(records), full)
+
+        now = time.monotonic()
+        self._last_sync = now
+        if full:
+            self._last_full_sync = now
+        return len(records)
+
+    async def sync_if_stale(self) -> None:
+        """Sync when the mirror is older than the configured intervals"""
+        now = time.monotonic()
+        if self._last_full_sync is None or now - self._last_full_sync >= settings.REGISTRATION_FULL_SYNC_INTERVAL:
+            await self.sync(full=True)
+        elif now - self._last_sync >= settings.REGISTRATION_SYNC_INTERVAL:
+            await self.sync()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+# Initialize the store as a singleton
+registration_store = RegistrationStore()
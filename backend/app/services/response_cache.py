@@ -0,0 +1,82 @@
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional
+
+from app.config import settings
+
+
+class CachedResponse:
+    """
+    Final response bytes with the headers needed to revalidate them.
+
+    ``encoded`` holds the body compressed per content encoding, so a cached
+    response is compressed at most once per encoding.
+    """
+
+    __slots__ = ("body", "etag", "last_modified", "headers", "encoded")
+
+    def __init__(
+        self,
+        body: bytes,
+        etag: str,
+        last_modified: float,
+        headers: Optional[Dict[str, str]] = None,
+        encoded: Optional[Dict[str, bytes]] = None,
+    ):
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self.headers = headers or {}
+        self.encoded = encoded if encoded is not None else {}
+
+
+class ResponseCache:
+    """
+    Bounded LRU cache of serialized responses tied to a data version.
+
+    Entries are only valid for the version they were stored under; the
+    first lookup with a newer version drops everything, so the cache is
+    rebuilt only after the underlying data changes.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, CachedResponse]" = OrderedDict()
+        self._version: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, version: int) -> Optional[CachedResponse]:
+        """Get a cached response if one was stored for this version"""
+        if version != self._version:
+            self._entries.clear()
+            self._version = version
+
+        cached = self._entries.get(key)
+        if cached is None:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return cached
+
+    def put(self, key: Hashable, version: int, cached: CachedResponse) -> None:
+        """Store a response built from data at the given version"""
+        if self.max_entries <= 0 or version != self._version:
+            return
+
+        self._entries[key] = cached
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._version = None
+
+
+# Cache of list responses for the public exhibition endpoints
+list_response_cache = ResponseCache(settings.RESPONSE_CACHE_SIZE)
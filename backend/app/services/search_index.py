@@ -0,0 +1,210 @@
+import heapq
+import math
+import re
+import unicodedata
+from bisect import bisect_left, bisect_right, insort
+from operator import itemgetter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.models.exhibition import Exhibition
+
+_WORD = re.compile(r"\w+")
+# ASCII characters that are not word characters, for tokenizing ASCII text without the expression
+_ASCII_SEPARATORS = str.maketrans({chr(code): " " for code in range(128) if not _WORD.fullmatch(chr(code))})
+
+# Relative weight of a term depending on the field it occurs in
+FIELD_WEIGHTS = {
+    "title": 5.0,
+    "artist": 4.0,
+    "curator": 3.0,
+    "artwork_title": 3.0,
+    "location": 2.0,
+    "medium": 2.0,
+    "description": 1.0,
+    "bio": 1.0,
+    "artwork_description": 1.0,
+}
+
+# Matches on a longer term that merely starts with the query term count less
+PREFIX_FACTOR = 0.5
+# Query terms shorter than this only match whole terms
+MIN_PREFIX_LENGTH = 2
+# Most vocabulary terms a single prefix expands to
+MAX_EXPANSIONS = 16
+
+
+def _ranking(item: Tuple[str, float]) -> Tuple[float, str]:
+    """Sort key ordering by descending score, then key"""
+    return -item[1], item[0]
+
+
+def _size(sources: List[Tuple[Dict[str, float], float]]) -> int:
+    """Total number of postings a query term touches"""
+    return sum(len(postings) for postings, _ in sources)
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into case- and accent-insensitive terms"""
+    if text.isascii():
+        # The same terms without the expression or normalization; most text is plain ASCII
+        return text.lower().translate(_ASCII_SEPARATORS).split()
+    text = unicodedata.normalize("NFKD", text.casefold())
+    if not text.isascii():
+        text = "".join(char for char in text if not unicodedata.combining(char))
+    return _WORD.findall(text)
+
+
+def exhibition_fields(exhibition: Exhibition) -> Iterable[Tuple[str, Optional[str]]]:
+    """The searchable text of an exhibition, by field"""
+    yield "title", exhibition.title
+    yield "description", exhibition.description
+    yield "curator", exhibition.curator
+    yield "location", exhibition.location
+    for artist in exhibition.artists:
+        yield "artist", artist.name
+        yield "bio", artist.bio
+    for artwork in exhibition.artworks:
+        yield "artwork_title", artwork.title
+        yield "medium", artwork.medium
+        yield "artwork_description", artwork.description
+
+
+class SearchIndex:
+    """
+    Inverted index for ranked full-text search over exhibitions.
+
+    Each term maps to the documents containing it with a weight summed
+    over the fields it occurs in. A query returns the documents matching
+    every query term, either exactly or, with a lower score, as the prefix
+    of a longer term; scores are tf-idf style and weighted by field.
+    Documents are added and removed individually, so the index never has
+    to be rebuilt.
+    """
+
+    def __init__(self):
+        self._postings: Dict[str, Dict[str, float]] = {}
+        self._documents: Dict[str, Dict[str, float]] = {}
+        # Sorted vocabulary for prefix lookups
+        self._terms: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def add(self, key: str, exhibition: Exhibition) -> None:
+        """Index an exhibition, replacing any previous version"""
+        self.remove(key)
+
+        weights: Dict[str, float] = {}
+        for field, text in exhibition_fields(exhibition):
+            if not text:
+                continue
+            weight = FIELD_WEIGHTS[field]
+            for term in tokenize(text):
+                weights[term] = weights.get(term, 0.0) + weight
+
+        self._documents[key] = weights
+        for term, weight in weights.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = {}
+                insort(self._terms, term)
+            postings[key] = weight
+
+    def remove(self, key: str) -> None:
+        """Remove a document if present"""
+        weights = self._documents.pop(key, None)
+        if weights is None:
+            return
+
+        for term in weights:
+            postings = self._postings[term]
+            del postings[key]
+            if not postings:
+                del self._postings[term]
+                del self._terms[bisect_left(self._terms, term)]
+
+    def search(self, query: str, limit: Optional[int] = None) -> List[Tuple[str, float]]:
+        """Get (key, score) pairs for documents matching every query term, best first"""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+
+        sources = []
+        for term in terms:
+            term_sources = self._sources(term)
+            if not term_sources:
+                return []
+            sources.append(term_sources)
+
+        # Score the documents of the most selective term, then narrow them
+        # down term by term, either by probing each remaining candidate in
+        # the term's postings or, when that is cheaper, by scoring the term
+        # on its own and intersecting
+        sources.sort(key=_size)
+        total = self._scores(sources[0])
+        for term_sources in sources[1:]:
+            if _size(term_sources) < len(total) * len(term_sources):
+                scores = self._scores(term_sources)
+                total = {key: score + scores[key] for key, score in total.items() if key in scores}
+            else:
+                total = self._probe(total, term_sources)
+            if not total:
+                return []
+
+        if limit is not None and len(total) > limit:
+            # Cheap partial selection first; ties are then broken by key
+            return sorted(heapq.nlargest(limit, total.items(), key=itemgetter(1)), key=_ranking)
+        return sorted(total.items(), key=_ranking)
+
+    def _sources(self, term: str) -> List[Tuple[Dict[str, float], float]]:
+        """
+        Get the postings a query term matches with their score factors:
+        the term itself, and the (at most MAX_EXPANSIONS most common)
+        longer terms it is a prefix of.
+        """
+        count = len(self._documents)
+        sources = []
+
+        postings = self._postings.get(term)
+        if postings is not None:
+            sources.append((postings, math.log(1 + count / len(postings))))
+
+        if len(term) < MIN_PREFIX_LENGTH:
+            return sources
+
+        first = bisect_right(self._terms, term)
+        last = bisect_left(self._terms, term + "\uffff", first)
+        candidates = self._terms[first:last]
+        if len(candidates) > MAX_EXPANSIONS:
+            # Keep the expansions found in the most documents
+            candidates = heapq.nlargest(MAX_EXPANSIONS, candidates, key=lambda t: len(self._postings[t]))
+        for candidate in candidates:
+            postings = self._postings[candidate]
+            sources.append((postings, PREFIX_FACTOR * math.log(1 + count / len(postings))))
+        return sources
+
+    @staticmethod
+    def _probe(total: Dict[str, float], sources: List[Tuple[Dict[str, float], float]]) -> Dict[str, float]:
+        """Add each candidate's best match in the given postings, dropping candidates without one"""
+        scores = {}
+        for key, score in total.items():
+            best = 0.0
+            for postings, factor in sources:
+                weight = postings.get(key)
+                if weight is not None and weight * factor > best:
+                    best = weight * factor
+            if best:
+                scores[key] = score + best
+        return scores
+
+    @staticmethod
+    def _scores(sources: List[Tuple[Dict[str, float], float]]) -> Dict[str, float]:
+        """Score every document in the given postings, keeping its best match"""
+        (postings, factor), *rest = sources
+        scores = {key: weight * factor for key, weight in postings.items()}
+        for postings, factor in rest:
+            for key, weight in postings.items():
+                score = weight * factor
+                if score > scores.get(key, 0.0):
+                    scores[key] = score
+        return scores
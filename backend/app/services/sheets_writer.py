@@ -0,0 +1,102 @@
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from gspread.exceptions import APIError
+
+from app.config import settings
+from app.models.registration import ArtistRegistration
+from app.services.google_sheets import SheetsUnavailable, google_sheets_service
+from app.services.registration_queue import DeliveryRejected, DeliveryThrottled
+
+
+def is_quota_error(error: Exception) -> bool:
+    """Whether a Sheets API error is a rate-limit (HTTP 429) response"""
+    response = getattr(error, "response", None)
+    return isinstance(error, APIError) and getattr(response, "status_code", None) == 429
+
+
+def is_rejection(error: Exception) -> bool:
+    """Whether a Sheets API error rejects the data written (HTTP 400 or 413)"""
+    response = getattr(error, "response", None)
+    return isinstance(error, APIError) and getattr(response, "status_code", None) in (400, 413)
+
+
+class SheetsBatchWriter:
+    """
+    Writes batches of registrations to Google Sheets with one append_rows
+    call per batch.
+
+    When Sheets answers with 429 the batch is handed back to the queue with
+    a retry delay that doubles for every consecutive quota error and decays
+    again as writes succeed, so the writer settles just under the quota.
+    A batch Sheets rejects as invalid raises DeliveryRejected, so the queue
+    can find the registration at fault; other errors are retried as a
+    whole.
+    """
+
+    def __init__(
+        self,
+        append: Callable[[List[ArtistRegistration]], Awaitable[Any]],
+        base_backoff: Optional[float] = None,
+        max_backoff: Optional[float] = None,
+    ):
+        self.append = append
+        self.base_backoff = settings.SHEETS_QUOTA_BACKOFF_BASE if base_backoff is None else base_backoff
+        self.max_backoff = settings.SHEETS_QUOTA_BACKOFF_MAX if max_backoff is None else max_backoff
+        self.backoff = 0.0
+
+        # Metrics
+        self.flushes = 0
+        self.rows_written = 0
+        self.quota_errors = 0
+        self.errors = 0
+        self.last_flush_latency: Optional[float] = None
+        self.max_flush_latency = 0.0
+        self.total_flush_latency = 0.0
+
+    async def __call__(self, registrations: List[ArtistRegistration]) -> None:
+        """Flush a batch of registrations"""
+        started = time.perf_counter()
+        try:
+            await self.append(registrations)
+        except SheetsUnavailable as e:
+            # Not connected yet: wait for the reconnection rather than failing the batch
+            raise DeliveryThrottled(settings.SHEETS_RECONNECT_INTERVAL, str(e)) from e
+        except Exception as e:
+            if is_rejection(e):
+                self.errors += 1
+                raise DeliveryRejected(str(e)) from e
+            if not is_quota_error(e):
+                self.errors += 1
+                raise
+            self.quota_errors += 1
+            self.backoff = min(self.max_backoff, max(self.base_backoff, self.backoff * 2))
+            raise DeliveryThrottled(self.backoff, "Google Sheets quota exceeded") from e
+
+        latency = time.perf_counter() - started
+        self.flushes += 1
+        self.rows_written += len(registrations)
+        self.last_flush_latency = latency
+        self.max_flush_latency = max(self.max_flush_latency, latency)
+        self.total_flush_latency += latency
+        # Recover gradually so the next burst does not hit the quota again
+        self.backoff = self.backoff / 2 if self.backoff >= self.base_backoff else 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        """Flush metrics for monitoring"""
+        return {
+            "flushes": self.flushes,
+            "rows_written": self.rows_written,
+            "quota_errors": self.quota_errors,
+            "errors": self.errors,
+            "current_backoff_seconds": self.backoff,
+            "last_flush_latency_seconds": self.last_flush_latency,
+            "max_flush_latency_seconds": self.max_flush_latency,
+            "avg_flush_latency_seconds": (
+                self.total_flush_latency / self.flushes if self.flushes else None
+            ),
+        }
+
+
+# Initialize the writer as a singleton
+sheets_batch_writer = SheetsBatchWriter(google_sheets_service.add_registrations)
@@ -0,0 +1,434 @@
+"""
+Incremental, content-addressed snapshots of the backend's data.
+
+Usage (from backend/):
+    python -m app.services.snapshots create [--store PATH]
+    python -m app.services.snapshots list [--store PATH]
+    python -m app.services.snapshots restore SNAPSHOT [--exhibition ID ...] [--store PATH]
+    python -m app.services.snapshots restore SNAPSHOT --files [--target DIR] [--store PATH]
+    python -m app.services.snapshots prune [--keep N] [--store PATH]
+
+A snapshot is a manifest listing every exhibition and every other file in
+DATA_DIR by the SHA-256 of its content; the content itself is stored once
+per distinct value as a compressed chunk. Exhibitions and files whose stamp
+is unchanged since the previous snapshot are not even read, so a snapshot
+costs time and space in proportion to what changed. Exhibitions are read
+through the storage backend, then read again where they changed meanwhile
+while holding the storage lock exclusively, which waits for writes in
+progress; so every snapshot is a consistent point in time, and writers
+only wait for that short catch-up. SQLite databases are copied with SQLite's online backup.
+
+``restore`` writes exhibitions back through the storage backend, either
+the whole set (removing exhibitions created since) or the ones named, and
+running servers pick them up at once. ``restore --files`` writes the other
+files to DIR (by default DATA_DIR, which needs the backend stopped).
+SNAPSHOT may be ``latest``.
+"""
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import uuid
+import zlib
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from app.config import settings
+from app.services.coherence import SharedCounter, SharedLock, catalog_changes, exhibition_writers, storage_lock
+from app.services.exhibition_codec import decode_exhibition, encode_exhibition
+from app.services.storage_backends import StorageBackend, create_storage_backend
+
+# Files are stored in chunks of this size, so that a large file that changed
+# in places (such as a database) shares its unchanged chunks
+FILE_CHUNK_SIZE = 1024 * 1024
+# Never included: SQLite side files (databases are copied whole) and files being written
+EXCLUDED_SUFFIXES = ("-wal", "-shm", "-journal", ".tmp")
+SQLITE_SUFFIXES = (".db", ".sqlite", ".sqlite3")
+
+
+class SnapshotError(Exception):
+    """A snapshot or chunk is missing or damaged"""
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(temp_path, mode='wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+class ChunkStore:
+    """Compressed chunks named by the SHA-256 of their uncompressed content"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def path(self, digest: str) -> str:
+        return os.path.join(self.directory, digest[:2], digest)
+
+    def has(self, digest: str) -> bool:
+        return os.path.exists(self.path(digest))
+
+    def put(self, data: bytes) -> Tuple[str, int]:
+        """Store a chunk unless present, returning its digest and the bytes newly stored"""
+        digest = hashlib.sha256(data).hexdigest()
+        if self.has(digest):
+            return digest, 0
+        compressed = zlib.compress(data, 6)
+        _write_atomic(self.path(digest), compressed)
+        return digest, len(compressed)
+
+    def get(self, digest: str) -> bytes:
+        try:
+            with open(self.path(digest), mode='rb') as f:
+                data = zlib.decompress(f.read())
+        except (OSError, zlib.error) as e:
+            raise SnapshotError(f"Chunk {digest} is unreadable: {e}")
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise SnapshotError(f"Chunk {digest} is damaged")
+        return data
+
+    def digests(self) -> Iterator[Tuple[str, str]]:
+        """Every stored chunk's digest and path, including leftover temporary files"""
+        if not os.path.isdir(self.directory):
+            return
+        for prefix in os.listdir(self.directory):
+            directory = os.path.join(self.directory, prefix)
+            for name in os.listdir(directory):
+                yield name, os.path.join(directory, name)
+
+
+def _sqlite_copy(path: str) -> bytes:
+    """A consistent copy of a live SQLite database"""
+    with tempfile.TemporaryDirectory() as directory:
+        copy_path = os.path.join(directory, "copy.db")
+        source = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        target = sqlite3.connect(copy_path)
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
+        with open(copy_path, mode='rb') as f:
+            return f.read()
+
+
+class SnapshotStore:
+    """
+    Snapshots in a directory: ``snapshots/<id>.json`` manifests referring to
+    chunks in ``chunks/``.
+    """
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = directory or settings.SNAPSHOT_DIR
+        self.manifests_dir = os.path.join(self.directory, "snapshots")
+        self.chunks = ChunkStore(os.path.join(self.directory, "chunks"))
+
+    def ids(self) -> List[str]:
+        """Snapshot ids, oldest first"""
+        if not os.path.isdir(self.manifests_dir):
+            return []
+        return sorted(name[:-len(".json")] for name in os.listdir(self.manifests_dir) if name.endswith(".json"))
+
+    def load(self, snapshot_id: str) -> Dict[str, Any]:
+        ids = self.ids()
+        if snapshot_id == "latest":
+            if not ids:
+                raise SnapshotError(f"No snapshots in {self.directory}")
+            snapshot_id = ids[-1]
+        if snapshot_id not in ids:
+            raise SnapshotError(f"Snapshot not found: {snapshot_id}")
+        with open(os.path.join(self.manifests_dir, f"{snapshot_id}.json"), mode='r') as f:
+            return json.load(f)
+
+    def _new_id(self) -> str:
+        snapshot_id = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        taken = set(self.ids())
+        candidate, n = snapshot_id, 1
+        while candidate in taken:
+            candidate, n = f"{snapshot_id}-{n}", n + 1
+        return candidate
+
+    def _snapshot_exhibitions(
+        self, backend: StorageBackend, lock: SharedLock, previous: Dict[str, Any], stats: Dict[str, int]
+    ) -> Dict[str, Any]:
+        entries: Dict[str, Any] = {}
+        changed: Dict[str, bytes] = {}
+
+        def catch_up(locked: bool) -> None:
+            """Bring ``entries`` up to date with the backend, reading what changed since"""
+            stored = backend.scan()
+            for exhibition_id in entries.keys() - stored.keys():
+                del entries[exhibition_id]
+                changed.pop(exhibition_id, None)
+            for exhibition_id, stamp in sorted(stored.items()):
+                stamp = list(stamp)
+                if exhibition_id in entries and entries[exhibition_id]["stamp"] == stamp:
+                    continue
+                old = previous.get(exhibition_id)
+                if old is not None and old["stamp"] == stamp and self.chunks.has(old["chunk"]):
+                    entries[exhibition_id] = old
+                    changed.pop(exhibition_id, None)
+                    continue
+                try:
+                    data = encode_exhibition(backend.read(exhibition_id))
+                except Exception:
+                    if locked:
+                        raise
+                    # Being written or deleted: read again under the lock
+                    entries.pop(exhibition_id, None)
+                    changed.pop(exhibition_id, None)
+                    continue
+                changed[exhibition_id] = data
+                entries[exhibition_id] = {"stamp": stamp, "size": len(data)}
+
+        # Read without holding up writers, then hold the lock only while
+        # re-reading what was written meanwhile, for a consistent point in
+        # time. Chunks are written after it is released
+        catch_up(locked=False)
+        with lock.exclusive():
+            catch_up(locked=True)
+        for exhibition_id, data in changed.items():
+            entries[exhibition_id]["chunk"], stored = self.chunks.put(data)
+            stats["new_bytes"] += stored
+        stats["exhibitions_read"] = len(changed)
+        return entries
+
+    def _snapshot_files(
+        self, data_dir: str, excluded: Set[str], previous: Dict[str, Any], stats: Dict[str, int]
+    ) -> Dict[str, Any]:
+        entries: Dict[str, Any] = {}
+        for root, dirs, files in os.walk(data_dir):
+            dirs[:] = sorted(d for d in dirs if os.path.join(root, d) not in excluded)
+            for name in sorted(files):
+                path = os.path.join(root, name)
+                if path in excluded or name.endswith(EXCLUDED_SUFFIXES):
+                    continue
+                relative = os.path.relpath(path, data_dir)
+                try:
+                    stat = os.stat(path)
+                    stamp = [stat.st_mtime_ns, stat.st_size]
+                    old = previous.get(relative)
+                    is_database = name.endswith(SQLITE_SUFFIXES)
+                    # Databases change in their write-ahead log first, so their stamp is no guide
+                    if (not is_database and old is not None and old["stamp"] == stamp
+                            and all(self.chunks.has(digest) for digest in old["chunks"])):
+                        entries[relative] = old
+                        continue
+                    if is_database:
+                        data = _sqlite_copy(path)
+                    else:
+                        with open(path, mode='rb') as f:
+                            data = f.read()
+                except FileNotFoundError:
+                    # Removed while walking
+                    continue
+                chunks = []
+                for offset in range(0, len(data), FILE_CHUNK_SIZE):
+                    digest, stored = self.chunks.put(data[offset:offset + FILE_CHUNK_SIZE])
+                    chunks.append(digest)
+                    stats["new_bytes"] += stored
+                entries[relative] = {"stamp": stamp, "size": len(data), "chunks": chunks}
+                stats["files_read"] += 1
+        return entries
+
+    def create(
+        self,
+        backend: Optional[StorageBackend] = None,
+        lock: Optional[SharedLock] = None,
+        data_dir: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Take a snapshot of every exhibition and the other files in ``data_dir`` (blocking)"""
+        lock = lock or storage_lock
+        data_dir = data_dir or settings.DATA_DIR
+        ids = self.ids()
+        previous = self.load(ids[-1]) if ids else {"exhibitions": {}, "files": {}}
+        excluded = {
+            os.path.abspath(path) for path in (
+                # Exhibitions are snapshotted through the backend, not as files
+                settings.EXHIBITIONS_DIR,
+                settings.STORAGE_SQLITE_PATH,
+                # Runtime state of the worker processes
+                settings.SHARED_STATE_DIR,
+                settings.METRICS_DIR,
+                # Image derivatives are rendered again from their sources on
+                # demand; the small source records under sources/ are kept
+                os.path.join(settings.IMAGE_CACHE_DIR, "derivatives"),
+                self.directory,
+            )
+        }
+
+        stats = {"new_bytes": 0, "exhibitions_read": 0, "files_read": 0}
+        opened = backend is None
+        backend = backend or create_storage_backend()
+        try:
+            exhibitions = self._snapshot_exhibitions(backend, lock, previous["exhibitions"], stats)
+        finally:
+            if opened:
+                backend.close()
+        files = self._snapshot_files(os.path.abspath(data_dir), excluded, previous["files"], stats)
+        snapshot = {
+            "id": self._new_id(),
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "exhibitions": exhibitions,
+            "files": files,
+            "stats": {
+                "exhibitions": len(exhibitions),
+                "files": len(files),
+                "bytes": sum(entry["size"] for entry in (*exhibitions.values(), *files.values())),
+                **stats,
+            },
+        }
+        _write_atomic(
+            os.path.join(self.manifests_dir, f"{snapshot['id']}.json"),
+            json.dumps(snapshot, indent=1, sort_keys=True).encode(),
+        )
+        return snapshot
+
+    def restore_exhibitions(
+        self,
+        snapshot: Dict[str, Any],
+        exhibition_ids: Optional[List[str]] = None,
+        backend: Optional[StorageBackend] = None,
+        lock: Optional[SharedLock] = None,
+        changes: Optional[SharedCounter] = None,
+        writers: Optional[SharedLock] = None,
+    ) -> Dict[str, int]:
+        """
+        Write exhibitions from a snapshot back to storage (blocking).
+
+        Without ``exhibition_ids`` the whole set is restored, and exhibitions
+        not in the snapshot are deleted. Running servers' writes wait until
+        the restore is done and announced.
+        """
+        lock = lock or storage_lock
+        writers = writers or exhibition_writers
+        changes = changes or catalog_changes
+        entries = snapshot["exhibitions"]
+        missing = [exhibition_id for exhibition_id in exhibition_ids or [] if exhibition_id not in entries]
+        if missing:
+            raise SnapshotError(f"Not in snapshot {snapshot['id']}: {', '.join(missing)}")
+
+        exhibitions = [
+            decode_exhibition(self.chunks.get(entries[exhibition_id]["chunk"]))
+            for exhibition_id in (exhibition_ids or sorted(entries))
+        ]
+        deleted = 0
+        opened = backend is None
+        backend = backend or create_storage_backend()
+        try:
+            with writers.exclusive():
+                with lock.shared():
+                    backend.write_many(exhibitions)
+                    if exhibition_ids is None:
+                        for exhibition_id in backend.scan().keys() - entries.keys():
+                            deleted += backend.delete(exhibition_id)
+                # Running servers reload on their next request
+                changes.increment()
+        finally:
+            if opened:
+                backend.close()
+        return {"restored": len(exhibitions), "deleted": deleted}
+
+    def restore_files(self, snapshot: Dict[str, Any], target: str) -> int:
+        """Write a snapshot's files (other than exhibitions) under ``target`` (blocking)"""
+        for relative, entry in snapshot["files"].items():
+            data = b"".join(self.chunks.get(digest) for digest in entry["chunks"])
+            _write_atomic(os.path.join(target, relative), data)
+        return len(snapshot["files"])
+
+    def prune(self, keep: int) -> Dict[str, int]:
+        """Delete all but the newest ``keep`` snapshots and the chunks only they used"""
+        ids = self.ids()
+        removed = ids[:-keep] if keep > 0 else ids
+        for snapshot_id in removed:
+            os.remove(os.path.join(self.manifests_dir, f"{snapshot_id}.json"))
+
+        referenced: Set[str] = set()
+        for snapshot_id in self.ids():
+            snapshot = self.load(snapshot_id)
+            referenced.update(entry["chunk"] for entry in snapshot["exhibitions"].values())
+            for entry in snapshot["files"].values():
+                referenced.update(entry["chunks"])
+        chunks = freed = 0
+        for digest, path in list(self.chunks.digests()):
+            if digest not in referenced:
+                freed += os.path.getsize(path)
+                os.remove(path)
+                chunks += 1
+        return {"snapshots": len(removed), "chunks": chunks, "bytes": freed}
+
+
+def _size(count: int) -> str:
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if count < 1024 or unit == "GiB":
+            return f"{count:.0f} {unit}" if unit == "B" else f"{count:.1f} {unit}"
+        count /= 1024
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--store", default=None, help="defaults to SNAPSHOT_DIR")
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("create", parents=[common], help="take a snapshot")
+    commands.add_parser("list", parents=[common], help="list snapshots, oldest first")
+    restore_parser = commands.add_parser("restore", parents=[common], help="restore exhibitions or files from a snapshot")
+    restore_parser.add_argument("snapshot", help="snapshot id or 'latest'")
+    restore_parser.add_argument("--exhibition", action="append", dest="exhibitions", help="restore only this exhibition")
+    restore_parser.add_argument("--files", action="store_true", help="restore the files other than exhibitions")
+    restore_parser.add_argument("--target", default=None, help="where --files restores to; defaults to DATA_DIR")
+    prune_parser = commands.add_parser("prune", parents=[common], help="delete old snapshots and unused chunks")
+    prune_parser.add_argument("--keep", type=int, default=None, help="snapshots to keep; defaults to SNAPSHOT_KEEP")
+    args = parser.parse_args(argv)
+
+    store = SnapshotStore(args.store)
+    try:
+        if args.command == "create":
+            snapshot = store.create()
+            stats = snapshot["stats"]
+            print(f"Snapshot {snapshot['id']}: {stats['exhibitions']} exhibitions and {stats['files']} files "
+                  f"({_size(stats['bytes'])}); read {stats['exhibitions_read']} exhibitions and "
+                  f"{stats['files_read']} files, stored {_size(stats['new_bytes'])} new")
+        elif args.command == "list":
+            for snapshot_id in store.ids():
+                stats = store.load(snapshot_id)["stats"]
+                print(f"{snapshot_id}  {stats['exhibitions']:>6} exhibitions  {stats['files']:>6} files  "
+                      f"{_size(stats['bytes']):>10}  {_size(stats['new_bytes']):>10} new")
+        elif args.command == "restore":
+            snapshot = store.load(args.snapshot)
+            if args.files:
+                target = args.target or settings.DATA_DIR
+                count = store.restore_files(snapshot, target)
+                print(f"Restored {count} files from {snapshot['id']} to {target}")
+            else:
+                result = store.restore_exhibitions(snapshot, args.exhibitions)
+                print(f"Restored {result['restored']} exhibitions from {snapshot['id']}"
+                      + (f", deleted {result['deleted']} created since" if args.exhibitions is None else ""))
+        else:
+            keep = settings.SNAPSHOT_KEEP if args.keep is None else args.keep
+            result = store.prune(keep)
+            print(f"Deleted {result['snapshots']} snapshots and {result['chunks']} chunks ({_size(result['bytes'])})")
+    except SnapshotError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
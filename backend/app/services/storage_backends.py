@@ -0,0 +1,285 @@
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Dict, Iterable, List, Optional, Protocol, Union
+
+from app.config import settings
+from app.models.exhibition import Exhibition
+from app.services.exhibition_catalog import Stamp
+from app.services.exhibition_codec import decode_exhibition, encode_exhibition
+
+# Result of reading one exhibition of a batch: the exhibition, or why it could not be read
+ReadResult = Union[Exhibition, Exception]
+
+
+class StorageBackend(Protocol):
+    """
+    Where exhibitions are persisted.
+
+    ``scan`` must be cheap: the storage service calls it on every refresh
+    and only reads exhibitions whose stamp changed. Methods are blocking
+    and are called from the storage thread pool.
+    """
+
+    def scan(self) -> Dict[str, Stamp]:
+        """Get the stamp of every stored exhibition"""
+        ...
+
+    def read(self, exhibition_id: str) -> Exhibition:
+        """Read one exhibition, raising if it is missing or invalid"""
+        ...
+
+    def read_many(self, exhibition_ids: List[str]) -> Dict[str, ReadResult]:
+        """Read several exhibitions; one that is missing or invalid maps to the exception"""
+        ...
+
+    def write(self, exhibition: Exhibition) -> Stamp:
+        """Store an exhibition, returning its new stamp"""
+        ...
+
+    def write_many(self, exhibitions: Iterable[Exhibition]) -> Dict[str, Stamp]:
+        """Store several exhibitions, returning their new stamps"""
+        ...
+
+    def delete(self, exhibition_id: str) -> bool:
+        """Delete an exhibition, returning whether it existed"""
+        ...
+
+    def close(self) -> None:
+        ...
+
+
+class JSONDirectoryBackend:
+    """
+    One JSON file per exhibition, stamped by mtime and size.
+
+    Files are indented by ``indent`` spaces for people editing them by
+    hand; 0 writes them compact, which is smaller and faster to write.
+    """
+
+    def __init__(self, directory: Optional[str] = None, indent: Optional[int] = None):
+        self.directory = directory or settings.EXHIBITIONS_DIR
+        self.indent = settings.STORAGE_JSON_INDENT if indent is None else indent
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _file_path(self, exhibition_id: str) -> str:
+        return os.path.join(self.directory, f"{exhibition_id}.json")
+
+    def scan(self) -> Dict[str, Stamp]:
+        """Stat every exhibition file without reading it"""
+        stamps = {}
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if not entry.name.endswith('.json'):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    # Removed between listing and stat
+                    continue
+                stamps[entry.name[:-len('.json')]] = (stat.st_mtime_ns, stat.st_size)
+        return stamps
+
+    def read(self, exhibition_id: str) -> Exhibition:
+        with open(self._file_path(exhibition_id), mode='rb') as f:
+            return decode_exhibition(f.read())
+
+    def read_many(self, exhibition_ids: List[str]) -> Dict[str, ReadResult]:
+        results: Dict[str, ReadResult] = {}
+        for exhibition_id in exhibition_ids:
+            try:
+                results[exhibition_id] = self.read(exhibition_id)
+            except Exception as e:
+                results[exhibition_id] = e
+        return results
+
+    def write(self, exhibition: Exhibition) -> Stamp:
+        """
+        Replace the exhibition's file atomically.
+
+        The content goes to a temporary file in the same directory, is
+        flushed to disk and then renamed over the target, so readers see
+        either the old or the new file, never a partial one.
+        """
+        file_path = self._file_path(exhibition.id)
+        # Not a .json name, so scan ignores it while it is being written
+        temp_path = os.path.join(self.directory, f".{exhibition.id}.{uuid.uuid4().hex}.tmp")
+        try:
+            with open(temp_path, mode='wb') as f:
+                f.write(encode_exhibition(exhibition, self.indent))
+                f.flush()
+                os.fsync(f.fileno())
+            stat = os.stat(temp_path)
+            os.replace(temp_path, file_path)
+        except BaseException:
+            try:
+                os.remove(temp_path)
+            except FileNotFoundError:
+                pass
+            raise
+        return stat.st_mtime_ns, stat.st_size
+
+    def write_many(self, exhibitions: Iterable[Exhibition]) -> Dict[str, Stamp]:
+        return {exhibition.id: self.write(exhibition) for exhibition in exhibitions}
+
+    def delete(self, exhibition_id: str) -> bool:
+        try:
+            os.remove(self._file_path(exhibition_id))
+        except FileNotFoundError:
+            return False
+        return True
+
+    def close(self) -> None:
+        pass
+
+
+class SQLiteBackend:
+    """
+    All exhibitions in a single SQLite database.
+
+    Each exhibition is stored as compact JSON next to indexed columns for
+    the fields it is commonly filtered and sorted by. The database runs in
+    WAL mode, so readers never block the writer, and every write is a
+    transaction: an interrupted write leaves the previous version intact.
+
+    Stamps are (modification time in nanoseconds, payload size). ``scan``
+    asks SQLite whether another connection committed since the last scan
+    and otherwise answers from memory.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or settings.STORAGE_SQLITE_PATH
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS exhibitions (
+                id TEXT PRIMARY KEY,
+                data TEXT NOT NULL,
+                start_date TEXT NOT NULL,
+                end_date TEXT NOT NULL,
+                location TEXT NOT NULL,
+                is_archived INTEGER NOT NULL,
+                is_featured INTEGER NOT NULL,
+                modified_ns INTEGER NOT NULL,
+                size INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS exhibitions_dates ON exhibitions (start_date, end_date);
+            CREATE INDEX IF NOT EXISTS exhibitions_archived ON exhibitions (is_archived, start_date);
+            CREATE INDEX IF NOT EXISTS exhibitions_featured ON exhibitions (is_featured, start_date);
+            CREATE INDEX IF NOT EXISTS exhibitions_location ON exhibitions (location COLLATE NOCASE);
+            """
+        )
+        self._stamps: Optional[Dict[str, Stamp]] = None
+        self._data_version: Optional[int] = None
+
+    def scan(self) -> Dict[str, Stamp]:
+        with self._lock:
+            data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            if self._stamps is None or data_version != self._data_version:
+                rows = self._conn.execute("SELECT id, modified_ns, size FROM exhibitions").fetchall()
+                self._stamps = {exhibition_id: (modified, size) for exhibition_id, modified, size in rows}
+                self._data_version = data_version
+            return dict(self._stamps)
+
+    def read(self, exhibition_id: str) -> Exhibition:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM exhibitions WHERE id = ?", (exhibition_id,)
+            ).fetchone()
+        if row is None:
+            raise KeyError(exhibition_id)
+        return decode_exhibition(row[0])
+
+    def read_many(self, exhibition_ids: List[str]) -> Dict[str, ReadResult]:
+        """Read several exhibitions with one query per 500"""
+        rows = []
+        with self._lock:
+            for start in range(0, len(exhibition_ids), 500):
+                batch = exhibition_ids[start:start + 500]
+                rows += self._conn.execute(
+                    f"SELECT id, data FROM exhibitions WHERE id IN ({', '.join('?' * len(batch))})", batch
+                ).fetchall()
+        data = dict(rows)
+        results: Dict[str, ReadResult] = {}
+        for exhibition_id in exhibition_ids:
+            try:
+                results[exhibition_id] = decode_exhibition(data[exhibition_id])
+            except Exception as e:
+                results[exhibition_id] = e
+        return results
+
+    def write(self, exhibition: Exhibition) -> Stamp:
+        return self.write_many([exhibition])[exhibition.id]
+
+    def write_many(self, exhibitions: Iterable[Exhibition]) -> Dict[str, Stamp]:
+        """Store several exhibitions in one transaction"""
+        rows = []
+        stamps = {}
+        modified = time.time_ns()
+        for exhibition in exhibitions:
+            data = exhibition.model_dump_json()
+            # Keep stamps distinct even for writes within the clock resolution
+            modified += 1
+            stamps[exhibition.id] = (modified, len(data))
+            rows.append((
+                exhibition.id,
+                data,
+                exhibition.start_date.isoformat(),
+                exhibition.end_date.isoformat(),
+                exhibition.location,
+                int(exhibition.is_archived),
+                int(exhibition.is_featured),
+                modified,
+                len(data),
+            ))
+
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO exhibitions "
+                    "(id, data, start_date, end_date, location, is_archived, is_featured, modified_ns, size) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            if self._stamps is not None:
+                self._stamps.update(stamps)
+        return stamps
+
+    def delete(self, exhibition_id: str) -> bool:
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM exhibitions WHERE id = ?", (exhibition_id,))
+            if self._stamps is not None:
+                self._stamps.pop(exhibition_id, None)
+        return cursor.rowcount > 0
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+BACKENDS = {
+    "json": JSONDirectoryBackend,
+    "sqlite": SQLiteBackend,
+}
+
+
+def create_storage_backend(name: Optional[str] = None) -> StorageBackend:
+    """Create the storage backend selected by name or by STORAGE_BACKEND"""
+    name = name or settings.STORAGE_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown storage backend {name!r}, expected one of: {', '.join(BACKENDS)}")
+    return BACKENDS[name]()
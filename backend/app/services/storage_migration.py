@@ -0,0 +1,101 @@
+"""
+Copy exhibitions between storage backends and verify the copy.
+
+Usage (from backend/):
+    python -m app.services.storage_migration --from json --to sqlite
+    python -m app.services.storage_migration --from json --to sqlite --verify-only
+
+Exhibitions that cannot be read from the source are reported rather than
+silently skipped. Exits with status 1 if any exhibition could not be read
+or the target does not match the source.
+"""
+import argparse
+import sys
+from typing import Dict, List, Optional
+
+from app.services.storage_backends import BACKENDS, StorageBackend
+
+# Exhibitions written per transaction
+BATCH_SIZE = 500
+
+
+def migrate(source: StorageBackend, target: StorageBackend, batch_size: int = BATCH_SIZE) -> Dict[str, List[str]]:
+    """Copy every readable exhibition from source to target"""
+    copied, unreadable = [], []
+    batch = []
+    for exhibition_id in sorted(source.scan()):
+        try:
+            batch.append(source.read(exhibition_id))
+        except Exception as e:
+            print(f"Error reading exhibition {exhibition_id}: {e}")
+            unreadable.append(exhibition_id)
+            continue
+        if len(batch) >= batch_size:
+            copied.extend(target.write_many(batch))
+            batch = []
+    if batch:
+        copied.extend(target.write_many(batch))
+    return {"copied": copied, "unreadable": unreadable}
+
+
+def verify(source: StorageBackend, target: StorageBackend) -> Dict[str, List[str]]:
+    """Compare every exhibition in source and target"""
+    source_ids = source.scan().keys()
+    target_ids = target.scan().keys()
+    report: Dict[str, List[str]] = {
+        "missing": sorted(source_ids - target_ids),
+        "extra": sorted(target_ids - source_ids),
+        "different": [],
+        "unreadable": [],
+    }
+    for exhibition_id in sorted(source_ids & target_ids):
+        try:
+            expected = source.read(exhibition_id)
+        except Exception:
+            report["unreadable"].append(exhibition_id)
+            continue
+        try:
+            matches = target.read(exhibition_id) == expected
+        except Exception:
+            matches = False
+        if not matches:
+            report["different"].append(exhibition_id)
+    return report
+
+
+def open_backend(name: str, location: Optional[str]) -> StorageBackend:
+    return BACKENDS[name](location)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--from", dest="source", choices=BACKENDS, required=True)
+    parser.add_argument("--to", dest="target", choices=BACKENDS, required=True)
+    parser.add_argument("--source-path", help="directory or database to read (default: from settings)")
+    parser.add_argument("--target-path", help="directory or database to write (default: from settings)")
+    parser.add_argument("--verify-only", action="store_true", help="compare without copying")
+    args = parser.parse_args(argv)
+
+    source = open_backend(args.source, args.source_path)
+    target = open_backend(args.target, args.target_path)
+    failed = False
+    try:
+        if not args.verify_only:
+            result = migrate(source, target)
+            print(f"Copied {len(result['copied'])} exhibitions from {args.source} to {args.target}")
+            failed = bool(result["unreadable"])
+
+        report = verify(source, target)
+        for problem, ids in report.items():
+            if ids:
+                failed = True
+                print(f"{problem}: {len(ids)} ({', '.join(ids[:10])}{', ...' if len(ids) > 10 else ''})")
+        print("Verification failed" if failed else "Verification passed")
+    finally:
+        source.close()
+        target.close()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+import pytest
+
+from app.models.exhibition import Exhibition
+from app.services.admission import RegistrationAdmission
+from app.services.coherence import SharedCounter, SharedLock
+from app.services.exhibition_catalog import ExhibitionCatalog
+from app.services.json_storage import json_storage_service
+from app.api import admin, images, open_call
+from app.services.google_sheets import google_sheets_service
+from app.services.images import ImageService
+from app.services.profiling import profile_store
+from app.services.registration_backends import FakeWorksheet
+from app.services.registration_queue import RegistrationQueue, registration_worker
+from app.services.registration_store import RegistrationStore
+from app.services.response_cache import list_response_cache
+from app.services.storage_backends import JSONDirectoryBackend
+
+
+def make_exhibition(exhibition_id: str = "ex-1", **overrides) -> Exhibition:
+    """Build a valid exhibition for tests"""
+    data = {
+        "id": exhibition_id,
+        "title": f"Exhibition {exhibition_id}",
+        "description": "A test exhibition",
+        "start_date": "2024-01-01",
+        "end_date": "2024-02-01",
+        "location": "Main Gallery",
+    }
+    data.update(overrides)
+    return Exhibition(**data)
+
+
+@pytest.fixture
+def storage(tmp_path, tmp_path_factory, monkeypatch):
+    """Point the storage service singleton at an empty temporary directory"""
+    monkeypatch.setattr(json_storage_service, "backend", JSONDirectoryBackend(str(tmp_path)))
+    monkeypatch.setattr(json_storage_service, "refresh_interval", 0)
+    monkeypatch.setattr(json_storage_service, "catalog", ExhibitionCatalog())
+    monkeypatch.setattr(json_storage_service, "_loaded", False)
+    monkeypatch.setattr(json_storage_service, "last_error", None)
+    monkeypatch.setattr(json_storage_service, "changes", SharedCounter(str(tmp_path_factory.mktemp("shared") / "catalog.version")))
+    monkeypatch.setattr(json_storage_service, "_seen_changes", None)
+    monkeypatch.setattr(json_storage_service, "lock", SharedLock(str(tmp_path_factory.mktemp("shared") / "storage.lock")))
+    monkeypatch.setattr(json_storage_service, "writers", SharedLock(str(tmp_path_factory.mktemp("shared") / "writers.lock")))
+    list_response_cache.clear()
+    return json_storage_service
+
+
+@pytest.fixture
+def registration_queue(tmp_path, monkeypatch):
+    """Give the registration worker an empty journal in a temporary directory"""
+    queue = RegistrationQueue(str(tmp_path / "registration_queue.db"))
+    monkeypatch.setattr(registration_worker, "queue", queue)
+    # A single process: this worker drains what it journals
+    monkeypatch.setattr(registration_worker, "leader", None)
+    # Forget rates and counts of earlier tests
+    monkeypatch.setattr(open_call, "registration_admission", RegistrationAdmission())
+    yield queue
+    queue.close()
+
+
+@pytest.fixture
+def registration_store(tmp_path, monkeypatch):
+    """Serve registrations from an empty mirror of an empty in-memory sheet"""
+    store = RegistrationStore(str(tmp_path / "registrations.db"))
+    monkeypatch.setattr(open_call, "registration_store", store)
+    monkeypatch.setattr(admin, "registration_store", store)
+    monkeypatch.setattr(google_sheets_service, "worksheet", FakeWorksheet())
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def profiles(tmp_path, monkeypatch):
+    """Keep profiles in an empty temporary directory"""
+    monkeypatch.setattr(profile_store, "directory", str(tmp_path / "profiles"))
+    return profile_store
+
+
+@pytest.fixture
+def image_sources():
+    """Source images served to the image service, by URL"""
+    return {}
+
+
+@pytest.fixture
+def image_service(tmp_path, monkeypatch, image_sources):
+    """Generate derivatives into a temporary cache from ``image_sources``"""
+    service = ImageService(str(tmp_path / "image_cache"), widths=[100, 200], fetch=image_sources.__getitem__)
+    monkeypatch.setattr(images, "image_service", service)
+    monkeypatch.setattr(admin, "image_service", service)
+    return service
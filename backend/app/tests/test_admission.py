@@ -0,0 +1,175 @@
+from fastapi.testclient import TestClient
+
+from app.api import open_call
+from app.api.forwarded import client_address, trusted_networks
+from app.main import app
+from app.services.admission import RegistrationAdmission, TokenBucketLimiter
+
+client = TestClient(app)
+
+STATEMENT = "A statement that is comfortably longer than fifty characters."
+
+
+def registration(email: str = "artist@example.com", statement: str = STATEMENT) -> dict:
+    return {
+        "name": "Test Artist",
+        "email": email,
+        "artist_statement": statement,
+        "work_sample_urls": ["https://example.com/work"],
+    }
+
+
+def test_repeated_submissions_get_the_original_registration(registration_queue, registration_store, monkeypatch):
+    """Test retries are answered from the journal in any worker, and only to the client holding the key"""
+    first = client.post("/api/open-call/register", json=registration(), headers={"Idempotency-Key": "abc"})
+    assert first.status_code == 201
+    assert "Idempotent-Replayed" not in first.headers
+
+    # Another worker process: nothing is shared but the journal
+    monkeypatch.setattr(open_call, "registration_admission", RegistrationAdmission())
+    retry = client.post("/api/open-call/register", json=registration(), headers={"Idempotency-Key": "abc"})
+    assert retry.status_code == 201
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.json()["id"] == first.json()["id"]
+
+    # The same key with different content
+    reused = client.post(
+        "/api/open-call/register",
+        json=registration(statement="An edited statement that is still longer than fifty characters."),
+        headers={"Idempotency-Key": "abc"},
+    )
+    assert reused.status_code == 422
+    # Same email and statement, differing only in case and spacing, without the key
+    double = client.post(
+        "/api/open-call/register",
+        json=registration("Artist@Example.com", "A statement that is  comfortably longer than fifty characters. "),
+    )
+    assert double.status_code == 409
+    assert first.json()["id"] not in double.text
+    assert registration_queue.depth() == 1
+
+    other = client.post("/api/open-call/register", json=registration("other@example.com"))
+    assert other.json()["id"] != first.json()["id"]
+    assert registration_queue.depth() == 2
+
+
+def test_journal_records_one_of_concurrent_duplicates(tmp_path):
+    """Test connections of different processes journal a submission once, within the window"""
+    from app.services.registration_queue import RegistrationQueue
+    from app.tests.test_registration_queue import make_registration
+
+    path = str(tmp_path / "queue.db")
+    first, second = RegistrationQueue(path), RegistrationQueue(path)
+    assert first.enqueue(make_registration("reg-1"), ["key:a", "content:x"], "f1", window=60) is None
+    assert second.enqueue(make_registration("reg-2"), ["key:b", "content:x"], "f2", window=60) == ("content:x", "reg-1", "f1")
+    assert second.find_submission(["key:a", "content:x"], window=60) == ("key:a", "reg-1", "f1")
+    assert second.find_submission(["key:a"], window=0) is None
+    # Without a window nothing is remembered or checked
+    assert second.enqueue(make_registration("reg-3"), ["key:a"], "f3") is None
+    assert first.depth() == 2
+    first.close()
+    second.close()
+
+
+def test_slow_journal_writes_are_awaited(registration_queue, registration_store, monkeypatch):
+    """Test a journal write slower than the storage timeout is still acknowledged, not failed"""
+    import time
+    from app.services.executor import STORAGE, blocking_io
+
+    monkeypatch.setitem(blocking_io.timeouts, STORAGE, 0.01)
+    enqueue = registration_queue.enqueue
+
+    def slow_enqueue(*args):
+        time.sleep(0.1)
+        return enqueue(*args)
+
+    monkeypatch.setattr(registration_queue, "enqueue", slow_enqueue)
+    response = client.post("/api/open-call/register", json=registration())
+    assert response.status_code == 201
+    assert registration_queue.depth() == 1
+
+
+def test_slow_duplicate_checks_are_answered_with_retry_after(registration_queue, registration_store, monkeypatch):
+    """Test a duplicate check that times out is pending work and gets 503 with Retry-After"""
+    import time
+    from app.services.executor import STORAGE, blocking_io
+
+    monkeypatch.setitem(blocking_io.timeouts, STORAGE, 0.01)
+    find_submission = registration_queue.find_submission
+    pending = []
+
+    def slow_find_submission(*args):
+        pending.append(open_call.registration_admission.pending)
+        time.sleep(0.1)
+        return find_submission(*args)
+
+    monkeypatch.setattr(registration_queue, "find_submission", slow_find_submission)
+    response = client.post("/api/open-call/register", json=registration())
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == str(open_call.JOURNAL_BUSY_RETRY_AFTER)
+    assert pending == [1]
+    assert open_call.registration_admission.pending == 0
+    assert registration_queue.depth() == 0
+
+
+def test_registrations_are_rate_limited_and_shed(registration_queue, registration_store, monkeypatch):
+    """Test clients over their rate, and everyone during overload, get 429 with Retry-After"""
+    monkeypatch.setattr(open_call, "registration_admission", RegistrationAdmission(rate=0.5, burst=2, max_pending=5))
+    for i in range(2):
+        assert client.post("/api/open-call/register", json=registration(f"artist{i}@example.com")).status_code == 201
+    response = client.post("/api/open-call/register", json=registration("artist2@example.com"))
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "2"
+    assert registration_queue.depth() == 2
+
+    # Repeats are limited too, before the journal is read
+    assert client.post("/api/open-call/register", json=registration("artist0@example.com")).status_code == 429
+
+    open_call.registration_admission.pending = 5
+    open_call.registration_admission.limiter = TokenBucketLimiter(rate=0, burst=0, max_clients=0)
+    response = client.post("/api/open-call/register", json=registration("artist3@example.com"))
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "1"
+
+    limiter = TokenBucketLimiter(rate=1, burst=1, max_clients=1)
+    assert limiter.acquire("a", now=0) == 0
+    assert limiter.acquire("a", now=0.25) == 0.75
+    assert limiter.acquire("b", now=0.25) == 0
+    # "a" was forgotten to stay within max_clients
+    assert limiter.acquire("a", now=0.25) == 0
+
+
+def from_peer(peer: str) -> TestClient:
+    """A client whose requests arrive from the given address, such as a proxy's"""
+    async def asgi(scope, receive, send):
+        if scope["type"] == "http":
+            scope["client"] = (peer, 40000)
+        await app(scope, receive, send)
+    return TestClient(asgi)
+
+
+def test_clients_cannot_choose_their_rate_limit_key(registration_queue, registration_store, monkeypatch):
+    """Test a spoofed X-Forwarded-For neither evades the rate limit nor is trusted from outside the proxies"""
+    monkeypatch.setattr(open_call, "registration_admission", RegistrationAdmission(rate=0.5, burst=2))
+    proxy = from_peer("127.0.0.1")
+
+    def register(i: int, forwarded_for: str, via: TestClient = proxy) -> int:
+        return via.post(
+            "/api/open-call/register",
+            json=registration(f"artist{i}@example.com"),
+            headers={"X-Forwarded-For": forwarded_for},
+        ).status_code
+
+    # nginx appends the address it saw after whatever the client sent
+    assert [register(i, f"10.0.0.{i}, 203.0.113.7") for i in range(3)] == [201, 201, 429]
+    assert register(3, "10.0.0.3, 203.0.113.8") == 201
+
+    # From an untrusted peer the header is ignored
+    direct = from_peer("198.51.100.1")
+    assert [register(i, f"203.0.113.{i}", direct) for i in range(4, 7)] == [201, 201, 429]
+
+    networks = trusted_networks("127.0.0.1, 172.28.0.0/24")
+    assert client_address("172.28.0.3", "1.1.1.1, 203.0.113.9, 172.28.0.2", networks) == "203.0.113.9"
+    assert client_address("172.28.0.3", None, networks) == "172.28.0.3"
+    assert client_address("203.0.113.9", "1.1.1.1", networks) == "203.0.113.9"
+    assert client_address("203.0.113.9", "1.1.1.1", trusted_networks("*")) == "1.1.1.1"
@@ -2,6 +2,8 @@ import pytest
 from fastapi.testclient import TestClient
 
 from app.main import app
+from app.services.auth import create_access_token
+from app.services.google_sheets import google_sheets_service
 
 client = TestClient(app)
 
@@ -10,7 +12,22 @@ def test_health_check():
     """Test the health check endpoint"""
     response = client.get("/api/health")
     assert response.status_code == 200
-    assert response.json() == {"status": "healthy"}
+    body = response.json()
+    assert body["status"] in ("healthy", "degraded")
+    assert set(body["dependencies"]) == {"storage", "google_sheets", "registration_queue"}
+
+
+def test_readiness_waits_for_exhibitions(storage):
+    """Test /api/ready answers 503 until the catalog is loaded"""
+    response = client.get("/api/ready")
+    assert response.status_code == 503
+    assert response.json()["dependencies"]["storage"]["state"] == "loading"
+
+    # The first request loads the catalog
+    client.get("/api/exhibitions")
+    response = client.get("/api/ready")
+    assert response.status_code == 200
+    assert response.json()["dependencies"]["storage"]["state"] == "ready"
 
 
 def test_get_exhibitions():
@@ -37,4 +54,303 @@ def test_get_archived_exhibitions():
 def test_admin_auth_required():
     """Test that admin endpoints require authentication"""
     response = client.get("/api/admin/exhibitions")
-    assert response.status_code == 401  # Unauthorized 
\ No newline at end of file
+    assert response.status_code == 401  # Unauthorized 
+
+def test_get_exhibitions_filters(storage):
+    """Test filtering exhibitions with query parameters"""
+    import asyncio
+    from app.tests.conftest import make_exhibition
+
+    asyncio.run(storage.save_exhibition(make_exhibition("ex-1", location="Courtyard")))
+    asyncio.run(storage.save_exhibition(make_exhibition("ex-2", is_archived=True)))
+
+    response = client.get("/api/exhibitions", params={"location": "courtyard"})
+    assert response.status_code == 200
+    assert [ex["id"] for ex in response.json()] == ["ex-1"]
+
+    response = client.get("/api/archive", params={"date_from": "2024-01-10"})
+    assert [ex["id"] for ex in response.json()] == ["ex-2"]
+
+    response = client.get("/api/exhibitions", params={"period": "sometime"})
+    assert response.status_code == 422
+
+
+def test_get_exhibitions_pagination_and_fields(storage):
+    """Test cursor pagination and sparse field selection"""
+    import asyncio
+    from app.tests.conftest import make_exhibition
+
+    for i, start in enumerate(["2024-03-01", "2024-01-01", "2024-01-01", "2024-02-01", "2024-05-01"]):
+        asyncio.run(storage.save_exhibition(make_exhibition(
+            f"ex-{i}", start_date=start, artworks=[{"title": "Untitled"}]
+        )))
+
+    seen = []
+    params = {"limit": 2, "fields": "id,title,start_date"}
+    while True:
+        response = client.get("/api/exhibitions", params=params)
+        assert response.status_code == 200
+        page = response.json()
+        assert all(set(item) == {"id", "title", "start_date"} for item in page)
+        seen.extend(item["id"] for item in page)
+        if "X-Next-Cursor" not in response.headers:
+            break
+        params["cursor"] = response.headers["X-Next-Cursor"]
+
+    assert seen == ["ex-1", "ex-2", "ex-3", "ex-0", "ex-4"]
+
+    assert client.get("/api/exhibitions", params={"fields": "id,nope"}).status_code == 400
+    assert client.get("/api/exhibitions", params={"cursor": "!!"}).status_code == 400
+    assert "artworks" in client.get("/api/exhibitions").json()[0]
+
+
+def test_conditional_requests(storage):
+    """Test ETag / Last-Modified validators and 304 responses"""
+    import asyncio
+    from app.tests.conftest import make_exhibition
+
+    asyncio.run(storage.save_exhibition(make_exhibition("ex-1")))
+
+    for url in ("/api/exhibitions", "/api/exhibitions/ex-1"):
+        response = client.get(url)
+        assert response.status_code == 200
+        etag = response.headers["ETag"]
+        assert response.headers["Cache-Control"].startswith("public, max-age=")
+
+        response = client.get(url, headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["ETag"] == etag
+
+        last_modified = response.headers["Last-Modified"]
+        assert client.get(url, headers={"If-Modified-Since": last_modified}).status_code == 304
+
+    # An admin write changes the validators immediately
+    list_etag = client.get("/api/exhibitions").headers["ETag"]
+    asyncio.run(storage.save_exhibition(make_exhibition("ex-1", title="Changed")))
+    response = client.get("/api/exhibitions", headers={"If-None-Match": list_etag})
+    assert response.status_code == 200
+    assert response.json()[0]["title"] == "Changed"
+
+
+def test_search_exhibitions(storage):
+    """Test the full-text search endpoint"""
+    import asyncio
+    from app.tests.conftest import make_exhibition
+
+    asyncio.run(storage.save_exhibition(make_exhibition("ex-1", title="Light and shadow")))
+    asyncio.run(storage.save_exhibition(make_exhibition("ex-2", title="Shadow play", is_archived=True)))
+
+    response = client.get("/api/exhibitions/search", params={"q": "shadow"})
+    assert response.status_code == 200
+    assert {ex["id"] for ex in response.json()} == {"ex-1", "ex-2"}
+
+    response = client.get("/api/exhibitions/search", params={"q": "sha", "archived": "true", "fields": "id"})
+    assert response.json() == [{"id": "ex-2"}]
+    assert client.get("/api/exhibitions/search", params={"q": "nothing"}).json() == []
+    assert client.get("/api/exhibitions/search").status_code == 422
+
+
+def test_update_with_if_match(storage):
+    """Test that admin updates are checked against If-Match"""
+    import asyncio
+    from app.tests.conftest import make_exhibition
+
+    asyncio.run(storage.save_exhibition(make_exhibition("ex-1")))
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'admin'})}"}
+    etag = client.get("/api/exhibitions/ex-1").headers["ETag"]
+    assert etag.startswith('"v1-')
+
+    body = make_exhibition("ex-1", title="First edit").model_dump(mode="json")
+    response = client.put("/api/admin/exhibitions/ex-1", json=body, headers={**headers, "If-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["version"] == 2
+    assert response.headers["ETag"] == client.get("/api/exhibitions/ex-1").headers["ETag"]
+
+    # A second editor still holding the old ETag is rejected
+    body = make_exhibition("ex-1", title="Second edit").model_dump(mode="json")
+    response = client.put("/api/admin/exhibitions/ex-1", json=body, headers={**headers, "If-Match": etag})
+    assert response.status_code == 412
+    assert client.get("/api/exhibitions/ex-1").json()["title"] == "First edit"
+
+    response = client.put("/api/admin/exhibitions/ex-1", json=body, headers={**headers, "If-Match": "*"})
+    assert response.json()["version"] == 3
+
+
+def test_list_responses_are_cached_until_data_changes(storage, monkeypatch):
+    """Test that list bodies are served from the response cache"""
+    import asyncio
+    from app.tests.conftest import make_exhibition
+
+    asyncio.run(storage.save_exhibition(make_exhibition("ex-1", is_featured=True)))
+
+    calls = []
+    query_entries = storage.query_entries
+
+    async def counting_query(**filters):
+        calls.append(filters)
+        return await query_entries(**filters)
+
+    monkeypatch.setattr(storage, "query_entries", counting_query)
+
+    first = client.get("/api/exhibitions/featured")
+    second = client.get("/api/exhibitions/featured")
+    assert first.content == second.content
+    assert first.headers["content-type"] == "application/json"
+    assert len(calls) == 1
+
+    asyncio.run(storage.save_exhibition(make_exhibition("ex-2", is_featured=True)))
+    assert [ex["id"] for ex in client.get("/api/exhibitions/featured").json()] == ["ex-1", "ex-2"]
+    assert len(calls) == 2
+
+
+def test_period_listings_are_cached_per_day(storage, monkeypatch):
+    """Test that a cached period listing is not served after the day it was built"""
+    import asyncio
+    from datetime import date
+    from app.tests.conftest import make_exhibition
+
+    asyncio.run(storage.save_exhibition(make_exhibition("ex-1", start_date="2030-01-10", end_date="2030-02-01")))
+
+    class Today(date):
+        current = date(2030, 1, 9)
+
+        @classmethod
+        def today(cls):
+            return cls.current
+
+    monkeypatch.setattr("app.api.listing.date", Today)
+    monkeypatch.setattr("app.services.json_storage.date", Today)
+
+    def period(name):
+        return [ex["id"] for ex in client.get("/api/exhibitions", params={"period": name}).json()]
+
+    assert period("upcoming") == ["ex-1"]
+    assert period("current") == []
+    Today.current = date(2030, 1, 10)
+    assert period("upcoming") == []
+    assert period("current") == ["ex-1"]
+
+
+def test_register_artist_is_journaled(registration_queue, registration_store):
+    """Test that registrations are acknowledged once journaled"""
+    response = client.post("/api/open-call/register", json={
+        "name": "Test Artist",
+        "email": "artist@example.com",
+        "artist_statement": "A statement that is comfortably longer than fifty characters.",
+        "work_sample_urls": ["https://example.com/work"],
+    })
+    assert response.status_code == 201
+    assert registration_queue.depth() == 1
+    [(_, registration)] = registration_queue.claim(1, lease=60)
+    assert registration.id == response.json()["id"]
+
+    # Longer than a Google Sheets cell can hold
+    response = client.post("/api/open-call/register", json={
+        "name": "Test Artist",
+        "email": "artist@example.com",
+        "artist_statement": "x" * 50001,
+        "work_sample_urls": ["https://example.com/work"],
+    })
+    assert response.status_code == 422
+
+
+def test_registration_status_lookup(registration_queue, registration_store):
+    """Test that the status of a submitted registration can be looked up"""
+    response = client.post("/api/open-call/register", json={
+        "name": "Test Artist",
+        "email": "artist@example.com",
+        "artist_statement": "A statement that is comfortably longer than fifty characters.",
+        "work_sample_urls": ["https://example.com/work"],
+    })
+    registration_id = response.json()["id"]
+
+    response = client.get(f"/api/open-call/status/{registration_id}")
+    assert response.status_code == 200
+    assert response.json()["status"] == "pending"
+    assert client.get("/api/open-call/status/unknown").status_code == 404
+
+
+def test_admin_registrations_are_filtered_and_paginated(registration_store):
+    """Test admin registration reads served from the synced mirror"""
+    google_sheets_service.worksheet.append_rows([
+        ["Ann", "ann@example.com", "", "Statement", "", f"2024-05-0{day}T12:00:00", f"reg-{day}", status]
+        for day, status in [(1, "pending"), (2, "accepted"), (3, "pending"), (4, "pending")]
+    ])
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'admin'})}"}
+
+    response = client.get(
+        "/api/admin/registrations",
+        params={"status": "pending", "limit": 2},
+        headers=headers,
+    )
+    assert response.status_code == 200
+    assert response.headers["X-Total-Count"] == "3"
+    assert [r["id"] for r in response.json()] == ["reg-4", "reg-3"]
+
+    response = client.get(
+        "/api/admin/registrations",
+        params={"sort": "submitted_at", "submitted_from": "2024-05-02", "offset": 1},
+        headers=headers,
+    )
+    assert [r["id"] for r in response.json()] == ["reg-3", "reg-4"]
+
+    # A date includes registrations made later that day
+    response = client.get(
+        "/api/admin/registrations",
+        params={"submitted_from": "2024-05-02", "submitted_to": "2024-05-03"},
+        headers=headers,
+    )
+    assert [r["id"] for r in response.json()] == ["reg-3", "reg-2"]
+
+    response = client.get("/api/admin/registrations", params={"sort": "password"}, headers=headers)
+    assert response.status_code == 400
+
+
+def test_exhibition_export_and_import(storage, monkeypatch):
+    """Test NDJSON export and batched import with per-line errors"""
+    import json
+    from app.api import admin
+    from app.tests.conftest import make_exhibition
+
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'admin'})}"}
+    lines = [make_exhibition(f"ex-{i}").model_dump_json() for i in range(5)]
+    lines.insert(2, "{not json")
+    lines.insert(4, "")
+    lines.append(json.dumps({"id": "ex-bad", "title": "Missing fields"}))
+
+    monkeypatch.setattr(admin, "IMPORT_BATCH_SIZE", 2)
+    response = client.post(
+        "/api/admin/exhibitions/import", content="\n".join(lines).encode(), headers=headers
+    )
+    assert response.status_code == 200
+    report = response.json()
+    assert (report["created"], report["updated"], report["error_count"]) == (5, 0, 2)
+    assert [error["line"] for error in report["errors"]] == [3, 8]
+
+    response = client.get("/api/admin/exhibitions/export", headers=headers)
+    assert response.headers["content-type"] == "application/x-ndjson"
+    exported = [json.loads(line) for line in response.text.splitlines()]
+    assert [ex["id"] for ex in exported] == [f"ex-{i}" for i in range(5)]
+
+    # Re-importing the export updates every exhibition to its next version
+    response = client.post("/api/admin/exhibitions/import", content=response.content, headers=headers)
+    assert (response.json()["created"], response.json()["updated"]) == (0, 5)
+    assert client.get("/api/exhibitions/ex-0").json()["version"] == 2
+
+
+def test_ndjson_lines_bounds_line_length(monkeypatch):
+    """Test that oversized NDJSON lines are cut short and skipped"""
+    import asyncio
+    from app.api import ndjson
+
+    monkeypatch.setattr(ndjson, "MAX_LINE_BYTES", 8)
+
+    async def stream():
+        for chunk in (b'{"a"}\n12345', b"67890123", b"456\n\n", b"last"):
+            yield chunk
+
+    async def collect():
+        return [item async for item in ndjson.ndjson_lines(stream())]
+
+    assert asyncio.run(collect()) == [(1, b'{"a"}'), (2, b"12345678"), (4, b"last")]
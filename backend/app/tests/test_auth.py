@@ -0,0 +1,72 @@
+import json
+import time
+from datetime import timedelta
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import auth
+from app.services.auth import TokenCache, create_access_token, token_cache, user_from_token
+from app.services.coherence import SharedCounter
+from app.services.credentials import FileCredentialStore, hash_password, verify_password
+
+client = TestClient(app)
+
+
+def test_password_hashes_are_salted_and_verified():
+    """Test hashes differ per call, verify only the right password, and reject garbage"""
+    first = hash_password("correct horse")
+    assert first.startswith("scrypt$")
+    assert hash_password("correct horse") != first
+    assert verify_password("correct horse", first)
+    assert not verify_password("wrong horse", first)
+    assert not verify_password("correct horse", "scrypt$not$a$valid$hash$")
+    assert not verify_password("correct horse", "plaintext")
+
+
+def test_login_with_file_credential_store(tmp_path, monkeypatch):
+    """Test logins are checked against the configured store, which is re-read on change"""
+    path = tmp_path / "admins.json"
+    store = FileCredentialStore(str(path))
+    monkeypatch.setattr(auth, "credential_store", store)
+
+    form = {"username": "curator", "password": "s3cret"}
+    assert client.post("/api/admin/token", data=form).status_code == 401
+
+    store.set("curator", hash_password("s3cret"))
+    assert "s3cret" not in path.read_text()
+    assert json.loads(path.read_text())["curator"].startswith("scrypt$")
+    response = client.post("/api/admin/token", data=form)
+    assert response.status_code == 200
+    token = response.json()["access_token"]
+    assert client.get("/api/admin/profiles", headers={"Authorization": f"Bearer {token}"}).status_code == 200
+
+    response = client.post("/api/admin/token", data={"username": "curator", "password": "guess"})
+    assert response.status_code == 401
+
+
+def test_verified_tokens_are_cached_until_expiry_or_revocation(tmp_path, monkeypatch):
+    """Test a token is decoded once, expires on time, and stops working after logout"""
+    token_cache.clear()
+    monkeypatch.setattr(token_cache, "revocations_path", str(tmp_path / "revoked_tokens.json"))
+    monkeypatch.setattr(token_cache, "changes", SharedCounter(str(tmp_path / "revocations.version")))
+    decoded = []
+    decode = auth.decode_token
+    monkeypatch.setattr(auth, "decode_token", lambda token: decoded.append(token) or decode(token))
+
+    token = create_access_token({"sub": "admin"})
+    headers = {"Authorization": f"Bearer {token}"}
+    for _ in range(3):
+        assert client.get("/api/admin/profiles", headers=headers).status_code == 200
+    assert decoded == [token]
+
+    assert client.post("/api/admin/logout", headers=headers).status_code == 204
+    assert client.get("/api/admin/profiles", headers=headers).status_code == 401
+
+    # Cached entries expire with the token
+    cache = TokenCache(max_entries=2)
+    cache.put(cache.key("a"), {"username": "admin"}, time.time() - 1)
+    assert cache.get(cache.key("a")) is None
+    # An expired token is not accepted even though it was never cached
+    expired = create_access_token({"sub": "admin"}, expires_delta=timedelta(seconds=-1))
+    assert user_from_token(expired) is None
@@ -0,0 +1,122 @@
+import asyncio
+import threading
+
+from fastapi import HTTPException
+
+from app.services.coherence import LeaderLock, SharedCounter, SharedLock
+from app.services.json_storage import JSONStorageService
+from app.services.storage_backends import JSONDirectoryBackend
+from app.tests.conftest import make_exhibition
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_writes_in_one_worker_invalidate_the_others(tmp_path):
+    """Test a worker sees another worker's write at once, despite a long refresh interval"""
+    directory = str(tmp_path / "exhibitions")
+    counter_path = str(tmp_path / "shared" / "catalog.version")
+    first, second = (
+        JSONStorageService(JSONDirectoryBackend(directory), refresh_interval=3600, changes=SharedCounter(counter_path))
+        for _ in range(2)
+    )
+    run(first.load())
+    run(second.load())
+    assert run(second.get_all_exhibitions()) == []
+
+    run(first.save_exhibition(make_exhibition("ex-1")))
+    assert run(second.get_exhibition("ex-1")).title == "Exhibition ex-1"
+
+    run(second.save_exhibition(make_exhibition("ex-1", title="Renamed show")))
+    assert run(first.get_exhibition("ex-1")).title == "Renamed show"
+    run(second.delete_exhibition("ex-1"))
+    assert run(first.get_exhibition("ex-1")) is None
+
+    # Without further writes the others keep serving from memory
+    def fail_scan():
+        raise AssertionError("unexpected scan")
+
+    first.backend.scan = fail_scan
+    assert run(first.get_all_exhibitions()) == []
+
+
+def test_concurrent_saves_in_two_workers_do_not_lose_updates(tmp_path):
+    """Test a compare-and-swap in one worker sees a write another worker has in progress"""
+    directory = str(tmp_path / "exhibitions")
+    first, second = (
+        JSONStorageService(
+            JSONDirectoryBackend(directory),
+            refresh_interval=3600,
+            changes=SharedCounter(str(tmp_path / "shared" / "catalog.version")),
+            lock=SharedLock(str(tmp_path / "shared" / "storage.lock")),
+            writers=SharedLock(str(tmp_path / "shared" / "writers.lock")),
+        )
+        for _ in range(2)
+    )
+    run(first.save_exhibition(make_exhibition("ex-1")))
+    run(second.load())
+
+    def if_match(version):
+        return lambda current: current is not None and current.exhibition.version == version
+
+    # The first worker's write stalls after both workers read version 1
+    writing, release = threading.Event(), threading.Event()
+    write_many = first.backend.write_many
+
+    def stalled_write_many(exhibitions):
+        writing.set()
+        release.wait(5)
+        return write_many(exhibitions)
+
+    first.backend.write_many = stalled_write_many
+
+    async def scenario():
+        first_save = asyncio.create_task(first.save_exhibition(make_exhibition("ex-1", title="First"), if_match(1)))
+        await asyncio.get_running_loop().run_in_executor(None, writing.wait, 5)
+        second_save = asyncio.create_task(second.save_exhibition(make_exhibition("ex-1", title="Second"), if_match(1)))
+        await asyncio.sleep(0.1)
+        release.set()
+        return await asyncio.gather(first_save, second_save, return_exceptions=True)
+
+    saved, conflict = run(scenario())
+    assert saved.version == 2
+    assert isinstance(conflict, HTTPException) and conflict.status_code == 412
+    assert run(second.get_exhibition("ex-1")).title == "First"
+
+
+def test_leader_lock_is_exclusive(tmp_path):
+    """Test only one holder leads, and another takes over once it lets go"""
+    path = str(tmp_path / "leader.lock")
+    first, second = LeaderLock(path), LeaderLock(path)
+    assert first.try_acquire()
+    assert first.try_acquire()
+    assert not second.try_acquire()
+    assert not second.is_leader
+
+    first.release()
+    assert second.try_acquire()
+    assert second.is_leader
+    second.release()
+
+
+def test_writes_wait_for_a_snapshot_without_timing_out(storage, monkeypatch):
+    """A save waiting longer than the storage timeout for a snapshot's lock still succeeds"""
+    import time
+    from app.services.executor import STORAGE, blocking_io
+
+    monkeypatch.setitem(blocking_io.timeouts, STORAGE, 0.05)
+    asyncio.run(storage.load())
+    held = threading.Event()
+
+    def snapshot():
+        with storage.lock.exclusive():
+            held.set()
+            time.sleep(0.3)
+
+    thread = threading.Thread(target=snapshot)
+    thread.start()
+    held.wait(5)
+    saved = asyncio.run(storage.save_exhibition(make_exhibition("ex-1")))
+    thread.join()
+    assert saved.version == 1
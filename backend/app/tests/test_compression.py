@@ -0,0 +1,162 @@
+import asyncio
+import os
+
+import brotli
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.api.compression import CompressionMiddleware, PrecompressedStaticFiles, accepted_encodings
+from app.main import app
+from app.services.precompress import precompress
+from app.services.response_cache import list_response_cache
+from app.tests.conftest import make_exhibition
+
+client = TestClient(app)
+
+
+def test_accepted_encodings():
+    """Test Accept-Encoding negotiation honours q-values and prefers brotli on ties"""
+    assert accepted_encodings("gzip, deflate, br") == ("br", "gzip")
+    assert accepted_encodings("br;q=0.5, gzip") == ("gzip", "br")
+    assert accepted_encodings("gzip, br;q=0") == ("gzip",)
+    assert accepted_encodings("*") == ("br", "gzip")
+    assert accepted_encodings("identity") == ()
+    assert accepted_encodings(None) == ()
+
+
+def test_cached_list_is_compressed_once(storage, monkeypatch):
+    """Test cached list responses keep their compressed bytes"""
+    for i in range(20):
+        asyncio.run(storage.save_exhibition(make_exhibition(f"ex-{i}", description="Long text " * 50)))
+
+    compressions = []
+    from app.api import listing
+    original = listing.compress
+    monkeypatch.setattr(listing, "compress", lambda body, encoding: compressions.append(encoding) or original(body, encoding))
+
+    for _ in range(2):
+        response = client.get("/api/exhibitions", headers={"Accept-Encoding": "br"})
+        assert response.status_code == 200
+        assert response.headers["content-encoding"] == "br"
+        assert "accept-encoding" in response.headers["vary"].lower()
+        assert len(response.json()) == 20
+    response = client.get("/api/exhibitions", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert compressions == ["br", "gzip"]
+
+    response = client.get("/api/exhibitions", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
+    assert len(response.json()) == 20
+
+    # Small bodies are not worth compressing
+    response = client.get("/api/exhibitions", params={"limit": 1, "fields": "id"}, headers={"Accept-Encoding": "br"})
+    assert "content-encoding" not in response.headers
+    list_response_cache.clear()
+
+
+def test_middleware_compresses_streams_chunk_by_chunk():
+    """Test streamed responses are compressed incrementally"""
+    streaming = FastAPI()
+    streaming.add_middleware(CompressionMiddleware, minimum_size=100)
+
+    @streaming.get("/stream")
+    def stream():
+        return StreamingResponse((b'{"n": %d}\n' % i for i in range(100)), media_type="application/x-ndjson")
+
+    @streaming.get("/small")
+    def small():
+        return {"ok": True}
+
+    test_client = TestClient(streaming)
+    response = test_client.get("/stream", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert len(response.text.splitlines()) == 100
+
+    response = test_client.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+    assert response.headers["vary"] == "Accept-Encoding"
+
+
+def test_static_files_serve_precompressed_siblings(tmp_path):
+    """Test the build step writes siblings that the static mount prefers"""
+    script = "console.log('garazas');\n" * 100
+    (tmp_path / "app.js").write_text(script)
+    (tmp_path / "logo.png").write_bytes(os.urandom(1000))
+    (tmp_path / "old.css.gz").write_bytes(b"stale")
+    # Shipped archives are not siblings
+    (tmp_path / "dataset.csv.gz").write_bytes(b"archive")
+    (tmp_path / "fonts.tar.br").write_bytes(b"archive")
+
+    report = precompress(str(tmp_path))
+    assert sorted(os.path.basename(path) for path in report["written"]) == ["app.js.br", "app.js.gz"]
+    assert [os.path.basename(path) for path in report["removed"]] == ["old.css.gz"]
+    assert precompress(str(tmp_path))["written"] == []
+    assert (tmp_path / "dataset.csv.gz").exists() and (tmp_path / "fonts.tar.br").exists()
+
+    static = FastAPI()
+    static.mount("/static", PrecompressedStaticFiles(directory=str(tmp_path)))
+    test_client = TestClient(static)
+
+    response = test_client.get("/static/app.js", headers={"Accept-Encoding": "gzip, br"})
+    assert response.headers["content-encoding"] == "br"
+    assert response.headers["content-type"].startswith("text/javascript")
+    assert int(response.headers["content-length"]) == len(brotli.compress(script.encode(), quality=11))
+    assert response.text == script
+
+    response = test_client.get("/static/app.js", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.text == script
+
+    response = test_client.get("/static/app.js", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
+    assert response.headers["vary"] == "Accept-Encoding"
+
+    response = test_client.get("/static/logo.png", headers={"Accept-Encoding": "br"})
+    assert "content-encoding" not in response.headers
+
+
+def test_each_encoding_has_its_own_etag(storage, tmp_path):
+    """Test every encoding is revalidated against the ETag it was sent with"""
+    for i in range(20):
+        asyncio.run(storage.save_exhibition(make_exhibition(f"ex-{i}", description="Long text " * 50)))
+
+    etags = {}
+    for encoding in ("br", "gzip", "identity"):
+        response = client.get("/api/exhibitions", headers={"Accept-Encoding": encoding})
+        etags[encoding] = response.headers["etag"]
+        assert "accept-encoding" in response.headers["vary"].lower()
+    assert len(set(etags.values())) == 3
+
+    response = client.get("/api/exhibitions", headers={"Accept-Encoding": "br", "If-None-Match": etags["br"]})
+    assert response.status_code == 304
+    assert response.headers["etag"] == etags["br"]
+    response = client.get("/api/exhibitions", headers={"Accept-Encoding": "br", "If-None-Match": etags["identity"]})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "br"
+    list_response_cache.clear()
+
+    (tmp_path / "app.js").write_text("console.log('garazas');\n" * 100)
+    precompress(str(tmp_path))
+    static = FastAPI()
+    static.mount("/static", PrecompressedStaticFiles(directory=str(tmp_path)))
+    test_client = TestClient(static)
+
+    etags = {
+        encoding: test_client.get("/static/app.js", headers={"Accept-Encoding": encoding}).headers["etag"]
+        for encoding in ("br", "gzip", "identity")
+    }
+    assert etags["br"] == etags["identity"] + "-br"
+    assert etags["gzip"] == etags["identity"] + "-gzip"
+
+    response = test_client.get("/static/app.js", headers={"Accept-Encoding": "br", "If-None-Match": etags["br"]})
+    assert response.status_code == 304
+    assert response.headers["vary"] == "Accept-Encoding"
+    response = test_client.get("/static/app.js", headers={"Accept-Encoding": "br", "If-None-Match": etags["gzip"]})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "br"
+    response = test_client.get(
+        "/static/app.js", headers={"Accept-Encoding": "identity", "If-None-Match": etags["identity"]}
+    )
+    assert response.status_code == 304
@@ -0,0 +1,52 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from app.main import app
+from app.services.auth import create_access_token
+from app.services.executor import BlockingExecutor
+from app.services.google_sheets import google_sheets_service
+from app.services.registration_backends import FakeWorksheet
+
+
+def test_health_latency_is_flat_during_slow_sheets_call(registration_store, monkeypatch):
+    """A slow Sheets call in flight does not delay other requests"""
+    monkeypatch.setattr(google_sheets_service, "worksheet", FakeWorksheet(latency=0.5))
+    token = create_access_token({"sub": "admin"})
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            slow = asyncio.create_task(client.get(
+                "/api/admin/registrations", headers={"Authorization": f"Bearer {token}"}
+            ))
+            await asyncio.sleep(0.05)
+
+            latencies = []
+            for _ in range(5):
+                started = time.perf_counter()
+                response = await client.get("/api/health")
+                latencies.append(time.perf_counter() - started)
+                assert response.status_code == 200
+
+            assert not slow.done()
+            assert (await slow).status_code == 200
+            return latencies
+
+    latencies = asyncio.run(scenario())
+    assert max(latencies) < 0.1
+
+
+def test_calls_time_out():
+    """Calls exceeding the pool timeout raise TimeoutError"""
+    executor = BlockingExecutor(sizes={"slow": 1}, timeouts={"slow": 0.05})
+
+    async def scenario():
+        with pytest.raises(asyncio.TimeoutError):
+            await executor.run("slow", time.sleep, 0.3)
+        assert await executor.run("slow", sum, [1, 2], timeout=1) == 3
+
+    asyncio.run(scenario())
+    executor.shutdown()
@@ -0,0 +1,215 @@
+import asyncio
+import io
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from app.main import app
+from app.services import images
+from app.services.auth import create_access_token
+from app.config import settings
+from app.services.images import DerivativeCache, UnsafeSourceError, fetch_source, read_source, render
+from app.tests.conftest import make_exhibition
+
+client = TestClient(app)
+
+SOURCE_URL = "https://example.com/artwork.png"
+
+
+def make_image(width: int, height: int, fmt: str = "PNG", mode: str = "RGB") -> bytes:
+    out = io.BytesIO()
+    Image.new(mode, (width, height), "red").save(out, fmt)
+    return out.getvalue()
+
+
+def test_render_resizes_without_upscaling():
+    """Test derivatives keep the aspect ratio and are never wider than the source"""
+    results = render(make_image(300, 150, mode="RGBA"), [(100, "webp"), (100, "jpeg"), (600, "jpeg")], 80)
+
+    assert set(results) == {(100, "webp"), (100, "jpeg"), (600, "jpeg")}
+    with Image.open(io.BytesIO(results[(100, "webp")])) as image:
+        assert (image.format, image.size) == ("WEBP", (100, 50))
+    with Image.open(io.BytesIO(results[(600, "jpeg")])) as image:
+        assert (image.format, image.size) == ("JPEG", (300, 150))
+
+
+def test_derivative_cache_evicts_least_recently_used(tmp_path):
+    """Test the cache stays within its size bound, keeping recently read files"""
+    cache = DerivativeCache(str(tmp_path), max_bytes=250)
+    cache.put("aa-1.webp", b"x" * 100)
+    cache.put("bb-1.webp", b"x" * 100)
+    assert cache.get("aa-1.webp") is not None
+
+    cache.put("cc-1.webp", b"x" * 100)
+
+    assert cache.has("aa-1.webp") and cache.has("cc-1.webp")
+    assert not cache.has("bb-1.webp")
+    assert cache.stats()["bytes"] == 200
+
+    # Recency and size are read from the directory, which another process shares
+    other = DerivativeCache(str(tmp_path), max_bytes=250)
+    other.put("dd-1.webp", b"x" * 100)
+    assert not cache.has("aa-1.webp")
+    assert cache.stats()["bytes"] == 200
+
+
+def test_derivatives_generated_on_save_and_served_immutable(storage, image_service, image_sources):
+    """Test saving an exhibition prepares derivatives that are then served from the cache"""
+    image_sources[SOURCE_URL] = make_image(400, 200)
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'admin'})}"}
+    exhibition = make_exhibition("ex-1", featured_image_url=SOURCE_URL)
+
+    response = client.post("/api/admin/exhibitions", json=exhibition.model_dump(mode="json"), headers=headers)
+    assert response.status_code == 201
+    assert image_service.cache.stats()["files"] == 4
+
+    # The source is never fetched while serving
+    image_sources.clear()
+    response = client.get(
+        "/api/images/", params={"src": SOURCE_URL, "w": 150},
+        headers={"Accept": "image/webp,*/*"}, follow_redirects=False,
+    )
+    assert response.status_code == 302
+    assert response.headers["location"].endswith("-200.webp")
+    assert response.headers["vary"] == "Accept"
+
+    response = client.get(response.headers["location"])
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/webp"
+    assert response.headers["cache-control"] == "public, max-age=31536000, immutable"
+    with Image.open(io.BytesIO(response.content)) as image:
+        assert image.size == (200, 100)
+
+    response = client.get("/api/images/", params={"src": SOURCE_URL, "format": "jpeg"}, follow_redirects=False)
+    assert response.headers["location"].endswith("-200.jpeg")
+
+
+def test_unknown_images_are_not_fetched(image_service, image_sources):
+    """Test only images referenced by a saved exhibition are served"""
+    image_sources[SOURCE_URL] = make_image(100, 100)
+
+    response = client.get("/api/images/", params={"src": SOURCE_URL}, follow_redirects=False)
+    assert response.status_code == 404
+    assert image_service.cache.stats()["files"] == 0
+
+    response = client.get("/api/images/" + "0" * 64 + "-100.webp")
+    assert response.status_code == 404
+    response = client.get("/api/images/../config.py")
+    assert response.status_code == 404
+
+
+def test_evicted_derivative_is_regenerated(image_service, image_sources):
+    """Test a derivative evicted from the cache is generated again on request"""
+    image_sources[SOURCE_URL] = make_image(300, 300)
+    asyncio.run(image_service.prepare([make_exhibition("ex-1", featured_image_url=SOURCE_URL)]))
+    image_service.cache.max_bytes = 0
+    image_service.cache.put("ff-1.webp", b"x")
+    assert image_service.cache.stats()["files"] == 1
+    image_service.cache.max_bytes = 10 ** 9
+
+    response = client.get("/api/images/", params={"src": SOURCE_URL, "w": 100}, follow_redirects=False)
+    assert response.status_code == 302
+    assert client.get(response.headers["location"]).status_code == 200
+    # Only the requested derivative was rendered
+    assert image_service.cache.stats()["files"] == 2
+
+
+def test_slow_regeneration_redirects_to_the_source(image_service, image_sources, monkeypatch):
+    """Test a request does not wait long for an evicted derivative, which is still generated"""
+    image_sources[SOURCE_URL] = make_image(300, 300)
+    asyncio.run(image_service.prepare([make_exhibition("ex-1", featured_image_url=SOURCE_URL)]))
+    image_service.cache.max_bytes = 0
+    image_service.cache.put("ff-1.webp", b"x")
+    image_service.cache.max_bytes = 10 ** 9
+
+    fetch = image_service.fetch
+    fetched = []
+    release = threading.Event()
+
+    def slow_fetch(url):
+        fetched.append(url)
+        release.wait(5)
+        return fetch(url)
+
+    monkeypatch.setattr(image_service, "fetch", slow_fetch)
+    monkeypatch.setattr(settings, "IMAGE_RENDER_WAIT", 0.05)
+
+    async def request_while_rendering():
+        for _ in range(2):
+            with pytest.raises(asyncio.TimeoutError):
+                await image_service.derivative(SOURCE_URL, 100, "webp")
+        release.set()
+        monkeypatch.setattr(settings, "IMAGE_RENDER_WAIT", 5)
+        return await image_service.derivative(SOURCE_URL, 100, "webp")
+
+    assert image_service.cache.has(asyncio.run(request_while_rendering()))
+    # The requests shared one rendering
+    assert fetched == [SOURCE_URL]
+
+    async def rendering(url, width, fmt):
+        raise asyncio.TimeoutError
+
+    monkeypatch.setattr(image_service, "derivative", rendering)
+    response = client.get("/api/images/", params={"src": SOURCE_URL, "w": 100}, follow_redirects=False)
+    assert response.status_code == 302
+    assert response.headers["location"] == SOURCE_URL
+    assert response.headers["cache-control"] == "no-store"
+
+
+def test_static_sources_are_read_from_disk(tmp_path, monkeypatch):
+    """Test the site's own /static images are read from STATIC_DIR, and nothing outside it"""
+    (tmp_path / "static" / "images").mkdir(parents=True)
+    (tmp_path / "static" / "images" / "logo.png").write_bytes(b"logo")
+    (tmp_path / "secret.txt").write_text("secret")
+    monkeypatch.setattr(settings, "STATIC_DIR", str(tmp_path / "static"))
+    monkeypatch.setattr(settings, "SITE_HOSTS", ["garazas.art"])
+    monkeypatch.setattr(images, "fetch_source", lambda url: b"fetched")
+
+    assert read_source("https://garazas.art/static/images/logo.png") == b"logo"
+    assert read_source("/static/images/logo.png") == b"logo"
+    assert read_source("https://example.com/static/images/logo.png") == b"fetched"
+    for url in ("https://garazas.art/static/%2e%2e/secret.txt", "https://garazas.art/static//etc/passwd"):
+        with pytest.raises(UnsafeSourceError):
+            read_source(url)
+
+
+def test_sources_are_only_fetched_from_public_hosts(monkeypatch):
+    """Test source fetches refuse internal addresses, other schemes and redirects to other hosts"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            port = self.server.server_address[1]
+            location = {"/same": "/image.png", "/away": f"http://localhost:{port}/image.png"}.get(self.path)
+            self.send_response(302 if location else 200)
+            if location:
+                self.send_header("Location", location)
+            self.end_headers()
+            if not location:
+                self.wfile.write(b"image")
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        for url in (f"{base}/image.png", "http://169.254.169.254/latest/meta-data", "file:///etc/passwd"):
+            with pytest.raises(UnsafeSourceError):
+                fetch_source(url)
+
+        # Were the name to resolve to a public address first, the connection is still checked
+        monkeypatch.setattr(images, "_check_source_url", lambda url: None)
+        with pytest.raises(UnsafeSourceError):
+            fetch_source(f"{base}/image.png")
+
+        monkeypatch.setattr(images, "_is_public", lambda address: True)
+        assert fetch_source(f"{base}/same") == b"image"
+        with pytest.raises(UnsafeSourceError):
+            fetch_source(f"{base}/away")
+    finally:
+        server.shutdown()
+        server.server_close()
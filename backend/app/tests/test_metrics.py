@@ -0,0 +1,65 @@
+import json
+import os
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services.metrics import MetricsExporter, MetricsRegistry, metrics_exporter
+
+client = TestClient(app)
+
+
+def test_metrics_endpoint_reports_routes(storage, registration_queue, tmp_path, monkeypatch):
+    """Test requests are counted per route template and storage calls are timed"""
+    monkeypatch.setattr(metrics_exporter, "directory", str(tmp_path))
+
+    client.get("/api/exhibitions/missing")
+    client.get("/api/exhibitions")
+
+    response = client.get("/api/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = response.text
+    assert 'http_requests_total{method="GET",route="/api/exhibitions/{exhibition_id}",status="404"}' in text
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/api/exhibitions/",le="+Inf"}' in text
+    assert 'blocking_io_duration_seconds_count{pool="storage",operation="JSONDirectoryBackend.scan"}' in text
+    assert "registration_queue_depth 0" in text
+    assert "# TYPE response_cache_hits_total counter" in text
+
+
+def test_metrics_merge_worker_snapshots(tmp_path):
+    """Test snapshots of other workers are summed in, and stale ones ignored"""
+    registry = MetricsRegistry()
+    requests = registry.counter("requests_total", "Requests", ("route",))
+    depth = registry.gauge("queue_depth", "Depth", merge="max")
+    latency = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+
+    requests.inc("/a")
+    depth.set(3)
+    latency.observe(0.05)
+    latency.observe(5)
+
+    other = {
+        "requests_total": [[["/a"], 2], [["/b"], 1]],
+        "queue_depth": [[[], 3]],
+        "latency_seconds": [[[], [0, 1, 0, 0.5]]],
+    }
+    (tmp_path / "99999991.json").write_text(json.dumps(other))
+    stale = tmp_path / "99999992.json"
+    stale.write_text(json.dumps({"requests_total": [[["/a"], 100]]}))
+    os.utime(stale, (0, 0))
+
+    exporter = MetricsExporter(registry, str(tmp_path), interval=5)
+    lines = exporter.render().splitlines()
+
+    assert 'requests_total{route="/a"} 3' in lines
+    assert 'requests_total{route="/b"} 1' in lines
+    assert "queue_depth 3" in lines
+    assert 'latency_seconds_bucket{le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{le="1"} 2' in lines
+    assert 'latency_seconds_bucket{le="+Inf"} 3' in lines
+    assert "latency_seconds_sum 5.55" in lines
+    assert "latency_seconds_count 3" in lines
+
+    exporter.write()
+    assert json.loads((tmp_path / f"{os.getpid()}.json").read_text())["requests_total"] == [[["/a"], 1.0]]
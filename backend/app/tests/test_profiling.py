@@ -0,0 +1,122 @@
+import asyncio
+import os
+import threading
+import time
+from types import SimpleNamespace
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.profiling import ProfilingMiddleware
+from app.main import app
+from app.services.auth import create_access_token
+from app.services.executor import STORAGE, blocking_io
+from app.services.profiling import Profile, ProfileStore, Sampler
+
+client = TestClient(app)
+
+
+def test_admin_requested_profile(storage, profiles, monkeypatch):
+    """Test admins can profile a request with X-Profile and fetch the stacks"""
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'admin'})}"}
+
+    # Without a valid token the flag is ignored
+    response = client.get("/api/exhibitions", headers={"X-Profile": "1"})
+    assert response.status_code == 200
+    assert "x-profile-id" not in response.headers
+
+    response = client.get("/api/admin/exhibitions", headers={**headers, "X-Profile": "1"})
+    assert response.status_code == 200
+    profile_id = response.headers["x-profile-id"]
+
+    listed = client.get("/api/admin/profiles", headers=headers).json()
+    assert listed[0]["id"] == profile_id
+    assert listed[0]["trigger"] == "requested"
+    assert listed[0]["path"] == "/api/admin/exhibitions"
+    assert listed[0]["status"] == 200
+
+    response = client.get(f"/api/admin/profiles/{profile_id}", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert client.get("/api/admin/profiles/missing", headers=headers).status_code == 404
+    assert client.get("/api/admin/profiles").status_code == 401
+
+    # Another worker process finds the profile in the shared directory
+    other = ProfileStore(profiles.directory, size=50)
+    assert other.get(profile_id)["path"] == "/api/admin/exhibitions"
+
+
+def test_oldest_profiles_are_removed(profiles, monkeypatch):
+    """Test only the newest PROFILE_BUFFER_SIZE profiles are kept"""
+    monkeypatch.setattr(profiles, "size", 2)
+    for path in ("/a", "/b", "/c"):
+        profile = Profile(SimpleNamespace(get_loop=lambda: None), 0.01, "GET", path, "slow")
+        profiles.add(profile, 200, 0.5)
+        # Distinct modification times on coarse file systems
+        time.sleep(0.01)
+    assert [profile["path"] for profile in profiles.list()] == ["/c", "/b"]
+    assert len(os.listdir(profiles.directory)) == 2
+
+
+def test_slow_requests_are_kept_with_their_stacks(profiles):
+    """Test only requests over the threshold are stored, with loop and thread stacks"""
+    slow_app = FastAPI()
+
+    def read_slowly():
+        time.sleep(0.1)
+
+    @slow_app.get("/slow")
+    async def slow():
+        await blocking_io.run(STORAGE, read_slowly)
+        await asyncio.sleep(0.05)
+        return {}
+
+    @slow_app.get("/fast")
+    async def fast():
+        return {}
+
+    slow_app.add_middleware(ProfilingMiddleware, slow_threshold=0.1)
+    slow_client = TestClient(slow_app)
+    slow_client.get("/fast")
+    slow_client.get("/slow")
+
+    listed = profiles.list()
+    assert [profile["path"] for profile in listed] == ["/slow"]
+    assert listed[0]["trigger"] == "slow"
+    assert listed[0]["samples"] > 0
+
+    folded = profiles.get(listed[0]["id"])["folded"]
+    thread_lines = [line for line in folded.splitlines() if line.startswith("[thread];")]
+    assert any("read_slowly" in line for line in thread_lines)
+    assert any("[awaiting]" in line for line in folded.splitlines())
+
+
+def test_profiles_are_not_sampled_after_they_end():
+    """Test ending a profile waits for a sample in progress, so its stacks can be read safely"""
+
+    class SlowProfile:
+        path = "/slow"
+        interval = 0.001
+
+        def __init__(self):
+            self.next_due = time.perf_counter()
+            self.sampling = threading.Event()
+            self.in_sample = False
+            self.samples = 0
+
+        def sample(self, frames):
+            self.in_sample = True
+            self.sampling.set()
+            time.sleep(0.05)
+            self.samples += 1
+            self.in_sample = False
+
+    sampler = Sampler()
+    profile = SlowProfile()
+    sampler.begin(profile)
+    assert profile.sampling.wait(1)
+    sampler.end(profile)
+    assert not profile.in_sample
+    samples = profile.samples
+    time.sleep(0.1)
+    assert profile.samples == samples
@@ -0,0 +1,260 @@
+import asyncio
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+from gspread.exceptions import APIError
+
+from app.config import settings
+from app.main import app
+from app.models.registration import ArtistRegistration
+from app.services import google_sheets
+from app.services.auth import create_access_token
+from app.services.google_sheets import GoogleSheetsService
+from app.services.registration_backends import FakeWorksheet
+from app.services.registration_queue import (
+    DeliveryRejected,
+    DeliveryThrottled,
+    RegistrationQueue,
+    RegistrationQueueWorker,
+)
+from app.services.sheets_writer import SheetsBatchWriter, is_quota_error
+
+client = TestClient(app)
+
+
+def make_registration(registration_id: str = "reg-1") -> ArtistRegistration:
+    return ArtistRegistration(
+        id=registration_id,
+        submitted_at=datetime(2024, 5, 1, 12, 0),
+        name="Test Artist",
+        email="artist@example.com",
+        artist_statement="A statement that is comfortably longer than fifty characters.",
+        work_sample_urls=["https://example.com/work"],
+    )
+
+
+def test_journal_survives_reopen(tmp_path):
+    """Registrations are still queued after the journal is reopened"""
+    path = str(tmp_path / "queue.db")
+    queue = RegistrationQueue(path)
+    queue.enqueue(make_registration("reg-1"))
+    queue.enqueue(make_registration("reg-1"))  # duplicate IDs are ignored
+    queue.enqueue(make_registration("reg-2"))
+    queue.close()
+
+    reopened = RegistrationQueue(path)
+    assert reopened.depth() == 2
+    assert [r.id for _, r in reopened.claim(10, lease=60)] == ["reg-1", "reg-2"]
+    # Claimed entries are leased and not handed out twice
+    assert reopened.claim(10, lease=60) == []
+    reopened.close()
+
+
+def test_journal_is_opened_on_first_use(tmp_path):
+    """Creating the queue touches no files until it is used"""
+    path = tmp_path / "data" / "queue.db"
+    queue = RegistrationQueue(str(path))
+    assert not path.parent.exists()
+    assert queue.depth() == 0
+    assert path.exists()
+    queue.close()
+
+
+def test_worker_retries_failed_deliveries(registration_queue):
+    """Failed deliveries stay journaled until a retry succeeds"""
+    delivered = []
+    failing = {"reg-2"}
+
+    async def deliver(registrations):
+        if failing & {r.id for r in registrations}:
+            raise RuntimeError("sheets unavailable")
+        delivered.extend(r.id for r in registrations)
+
+    worker = RegistrationQueueWorker(registration_queue, deliver, batch_size=1)
+    for registration_id in ("reg-1", "reg-2", "reg-3"):
+        asyncio.run(worker.enqueue(make_registration(registration_id)))
+
+    assert asyncio.run(worker.drain_once()) == 2
+    assert delivered == ["reg-1", "reg-3"]
+    assert registration_queue.depth() == 1
+
+    # Make the failed entry due again and let the retry succeed
+    registration_queue._conn.execute("UPDATE registration_queue SET next_attempt_at = 0")
+    failing.clear()
+    assert asyncio.run(worker.drain_once()) == 1
+    assert registration_queue.depth() == 0
+
+
+def test_failed_batches_are_split_and_exhausted_registrations_dead_lettered(registration_queue, monkeypatch):
+    """One rejected registration does not hold back its batch, and is given up on after its last attempt"""
+    monkeypatch.setattr(settings, "REGISTRATION_MAX_ATTEMPTS", 2)
+    calls = []
+
+    async def deliver(registrations):
+        calls.append([r.id for r in registrations])
+        if "reg-3" in calls[-1]:
+            raise DeliveryRejected("cell too long")
+
+    worker = RegistrationQueueWorker(registration_queue, deliver, batch_size=5)
+    for i in range(1, 6):
+        asyncio.run(worker.enqueue(make_registration(f"reg-{i}")))
+
+    assert asyncio.run(worker.drain_once()) == 4
+    assert calls == [
+        ["reg-1", "reg-2", "reg-3", "reg-4", "reg-5"],
+        ["reg-1", "reg-2"],
+        ["reg-3", "reg-4", "reg-5"],
+        ["reg-3"],
+        ["reg-4", "reg-5"],
+    ]
+    assert registration_queue.depth() == 1
+    assert registration_queue.dead_letter_report()["count"] == 0
+
+    registration_queue._conn.execute("UPDATE registration_queue SET next_attempt_at = 0")
+    assert asyncio.run(worker.drain_once()) == 0
+    assert registration_queue.depth() == 0
+    report = registration_queue.dead_letter_report()
+    assert report["count"] == 1
+    assert report["recent"][0]["id"] == "reg-3"
+    assert report["recent"][0]["attempts"] == 2
+    assert report["recent"][0]["error"] == "cell too long"
+
+
+def test_failing_destinations_retry_whole_batches_and_dead_letters_can_be_redriven(registration_queue, monkeypatch):
+    """A server error is not split per registration, and given-up registrations can be queued again"""
+    monkeypatch.setattr(settings, "REGISTRATION_MAX_ATTEMPTS", 1)
+    calls = []
+    failing = True
+
+    async def deliver(registrations):
+        calls.append([r.id for r in registrations])
+        if failing:
+            raise APIError(SimpleNamespace(status_code=503, text="Backend Error", json=dict))
+
+    worker = RegistrationQueueWorker(registration_queue, SheetsBatchWriter(deliver), batch_size=5)
+    for i in range(1, 4):
+        asyncio.run(worker.enqueue(make_registration(f"reg-{i}")))
+
+    assert asyncio.run(worker.drain_once()) == 0
+    assert calls == [["reg-1", "reg-2", "reg-3"]]
+    assert registration_queue.dead_letter_report()["count"] == 3
+
+    failing = False
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'admin'})}"}
+    response = client.post("/api/admin/registrations/dead-letters/redrive", json={"ids": ["reg-2"]}, headers=headers)
+    assert response.json() == {"redriven": 1}
+    response = client.post("/api/admin/registrations/dead-letters/redrive", headers=headers)
+    assert response.json() == {"redriven": 2}
+    assert registration_queue.dead_letter_report()["count"] == 0
+
+    assert asyncio.run(worker.drain_once()) == 3
+    assert registration_queue.depth() == 0
+
+
+class QuotaLimitedWorksheet(FakeWorksheet):
+    """Worksheet stand-in that rejects the first few writes with HTTP 429"""
+
+    def __init__(self, rejections: int):
+        super().__init__()
+        self.rejections = rejections
+        self.calls = 0
+
+    def append_rows(self, values, **kwargs):
+        self.calls += 1
+        if self.rejections:
+            self.rejections -= 1
+            raise APIError(SimpleNamespace(status_code=429, text="Quota exceeded", json=dict))
+        super().append_rows(values, **kwargs)
+
+
+def test_batches_are_coalesced_and_throttled(registration_queue, monkeypatch):
+    """A burst is written with few append_rows calls and backs off on 429"""
+    monkeypatch.setenv("TESTING", "true")
+    worksheet = QuotaLimitedWorksheet(rejections=1)
+    service = GoogleSheetsService()
+    service.worksheet = worksheet
+    writer = SheetsBatchWriter(service.add_registrations, base_backoff=0.01, max_backoff=0.05)
+    worker = RegistrationQueueWorker(registration_queue, writer, batch_size=25)
+
+    for i in range(60):
+        asyncio.run(worker.enqueue(make_registration(f"reg-{i}")))
+
+    # The throttled batch is released and retried after the backoff
+    assert asyncio.run(worker.drain_once()) == 60
+    assert registration_queue.depth() == 0
+    assert len(worksheet.get_all_records()) == 60
+    assert worksheet.calls == 4
+    stats = writer.stats()
+    assert stats["flushes"] == 3
+    assert stats["quota_errors"] == 1
+    assert stats["rows_written"] == 60
+
+
+def test_fake_worksheet_enforces_quota_and_bounds():
+    """The fake backend rejects calls over quota and keeps only recent rows"""
+    worksheet = FakeWorksheet(quota_per_minute=3, max_rows=2)
+    for i in range(3):
+        worksheet.append_rows([[f"Artist {i}"]])
+
+    with pytest.raises(APIError) as excinfo:
+        worksheet.get_values("A2:H")
+    assert is_quota_error(excinfo.value)
+
+    assert worksheet.row_count() == 3
+    assert [row[0] for row in worksheet.rows[1:]] == ["Artist 1", "Artist 2"]
+    worksheet.quota_per_minute = 0
+    # Row numbers keep counting past dropped rows
+    assert worksheet.get_values("A4:H") == [["Artist 2"]]
+    assert worksheet.get_values("A2:H") == [["Artist 1"], ["Artist 2"]]
+
+
+def test_fake_worksheet_injects_errors():
+    """Injected errors are server errors, not quota errors"""
+    worksheet = FakeWorksheet(error_rate=1.0)
+    with pytest.raises(APIError) as excinfo:
+        worksheet.append_rows([["Artist"]])
+    assert excinfo.value.response.status_code == 500
+    assert not is_quota_error(excinfo.value)
+    assert worksheet.errors == 1
+    assert worksheet.row_count() == 0
+
+
+def test_registrations_wait_for_sheets_to_connect(registration_queue, monkeypatch):
+    """Deliveries pause while Sheets is unreachable and resume once it reconnects"""
+    monkeypatch.setenv("TESTING", "false")
+    monkeypatch.setattr(settings, "REGISTRATION_BACKEND", "google")
+    monkeypatch.setattr(settings, "SHEETS_RECONNECT_INTERVAL", 0.01)
+    worksheet = FakeWorksheet()
+    outcomes = [RuntimeError("credentials not found"), worksheet]
+
+    def connect():
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    monkeypatch.setattr(google_sheets, "google_backend", connect)
+    service = GoogleSheetsService()
+    assert service.status()["state"] == "disconnected"
+    writer = SheetsBatchWriter(service.add_registrations)
+    worker = RegistrationQueueWorker(registration_queue, writer)
+
+    async def scenario():
+        await worker.enqueue(make_registration())
+        assert not await service.connect()
+        assert service.status()["error"] == "credentials not found"
+        # Not connected: the batch is put back without counting as a failure
+        with pytest.raises(DeliveryThrottled):
+            await writer([make_registration()])
+
+        service.start()
+        await asyncio.wait_for(service._task, timeout=1)
+        return await worker.drain_once()
+
+    assert asyncio.run(scenario()) == 1
+    assert service.status()["state"] == "connected"
+    assert service.attempts == 2
+    assert writer.stats()["errors"] == 0
+    assert worksheet.row_count() == 1
@@ -0,0 +1,70 @@
+import asyncio
+
+from app.services.google_sheets import google_sheets_service
+
+
+def sheet_row(registration_id: str, status: str = "pending"):
+    return [
+        "Test Artist", "artist@example.com", "", "Statement", "",
+        "2024-05-01T12:00:00", registration_id, status,
+    ]
+
+
+def test_sync_downloads_only_new_rows(registration_store, monkeypatch):
+    """Incremental syncs fetch rows after the last synced one"""
+    worksheet = google_sheets_service.worksheet
+    worksheet.append_rows([sheet_row("reg-1"), sheet_row("reg-2")])
+
+    ranges = []
+    get_values = worksheet.get_values
+    monkeypatch.setattr(worksheet, "get_values", lambda range_name: ranges.append(range_name) or get_values(range_name))
+
+    assert asyncio.run(registration_store.sync()) == 2
+    worksheet.append_rows([sheet_row("reg-3")])
+    assert asyncio.run(registration_store.sync()) == 1
+    assert asyncio.run(registration_store.sync()) == 0
+
+    assert ranges == ["A2:H", "A4:H", "A5:H"]
+    assert registration_store.synced_rows() == 3
+    assert registration_store.get("reg-3")["row_number"] == 4
+
+
+def test_full_sync_picks_up_edited_rows(registration_store):
+    """A full sync refreshes rows that changed in the sheet"""
+    worksheet = google_sheets_service.worksheet
+    worksheet.append_rows([sheet_row("reg-1")])
+    asyncio.run(registration_store.sync())
+
+    worksheet.rows[1] = sheet_row("reg-1", status="accepted")
+    asyncio.run(registration_store.sync())
+    assert registration_store.get("reg-1")["status"] == "pending"
+
+    asyncio.run(registration_store.sync(full=True))
+    assert registration_store.get("reg-1")["status"] == "accepted"
+    assert registration_store.search(status="accepted") == ([registration_store.get("reg-1")], 1)
+
+
+def test_full_sync_backfills_ids_and_replaces_the_mirror(registration_store):
+    """Rows without an ID get one in the sheet, and rows gone from the sheet leave the mirror"""
+    from app.tests.test_registration_queue import make_registration
+
+    worksheet = google_sheets_service.worksheet
+    worksheet.append_rows([sheet_row("reg-1"), sheet_row(""), sheet_row("reg-3")])
+    # Accepted here, not delivered to the sheet yet
+    registration_store.add(make_registration("reg-4"))
+
+    assert asyncio.run(registration_store.sync(full=True)) == 3
+    legacy_id = worksheet.rows[2][6]
+    assert legacy_id
+    assert registration_store.get(legacy_id)["row_number"] == 3
+
+    # Sorted, and a row deleted
+    worksheet.rows[1:] = [worksheet.rows[3], worksheet.rows[2]]
+    asyncio.run(registration_store.sync(full=True))
+    rows, total = registration_store.search(sort="name")
+    assert sorted(row["id"] for row in rows) == sorted(["reg-3", legacy_id, "reg-4"])
+    assert total == 3
+    assert registration_store.get(legacy_id)["row_number"] == 3
+    assert registration_store.get("reg-1") is None
+    # The ID was written once
+    assert worksheet.rows[2][6] == legacy_id
@@ -0,0 +1,116 @@
+import os
+import sqlite3
+import threading
+
+import pytest
+
+from app.services.coherence import SharedCounter, SharedLock
+from app.services.snapshots import SnapshotError, SnapshotStore
+from app.services.storage_backends import JSONDirectoryBackend
+from app.tests.conftest import make_exhibition
+
+
+@pytest.fixture
+def data(tmp_path):
+    """Exhibitions in a backend, and a data directory with a database and a file"""
+    backend = JSONDirectoryBackend(str(tmp_path / "exhibitions"))
+    backend.write_many([make_exhibition("ex-1"), make_exhibition("ex-2")])
+    data_dir = tmp_path / "data"
+    (data_dir / "cache").mkdir(parents=True)
+    (data_dir / "cache" / "image.webp").write_bytes(os.urandom(3 * 1024 * 1024))
+    conn = sqlite3.connect(str(data_dir / "registration_queue.db"))
+    conn.execute("CREATE TABLE queue (id TEXT)")
+    conn.execute("INSERT INTO queue VALUES ('reg-1')")
+    conn.commit()
+    conn.close()
+    return {
+        "backend": backend,
+        "data_dir": str(data_dir),
+        "lock": SharedLock(str(tmp_path / "shared" / "storage.lock")),
+        "changes": SharedCounter(str(tmp_path / "shared" / "catalog.version")),
+        "store": SnapshotStore(str(tmp_path / "snapshots")),
+    }
+
+
+def test_snapshots_store_only_changes_and_restore(data):
+    """Test unchanged content is neither read nor stored again, and snapshots restore exactly"""
+    store, backend = data["store"], data["backend"]
+
+    def create():
+        return store.create(backend, data["lock"], data["data_dir"])
+
+    first = create()
+    assert first["stats"]["exhibitions"] == 2
+    assert set(first["files"]) == {"cache/image.webp", "registration_queue.db"}
+    assert len(first["files"]["cache/image.webp"]["chunks"]) == 3
+
+    second = create()
+    assert second["stats"]["exhibitions_read"] == 0
+    # Only the database is copied again, and it has not changed
+    assert second["stats"]["files_read"] == 1
+    assert second["stats"]["new_bytes"] == 0
+
+    backend.write(make_exhibition("ex-1", title="Renamed show"))
+    backend.write(make_exhibition("ex-3"))
+    third = create()
+    assert third["stats"]["exhibitions_read"] == 2
+    assert 0 < third["stats"]["new_bytes"] < 10_000
+
+    # One exhibition, then the whole set (removing what was created since)
+    result = store.restore_exhibitions(second, ["ex-1"], backend, data["lock"], data["changes"])
+    assert result == {"restored": 1, "deleted": 0}
+    assert backend.read("ex-1").title == "Exhibition ex-1"
+    assert data["changes"].value == 1
+    assert store.restore_exhibitions(store.load(first["id"]), None, backend, data["lock"], data["changes"]) == {
+        "restored": 2, "deleted": 1
+    }
+    assert set(backend.scan()) == {"ex-1", "ex-2"}
+    with pytest.raises(SnapshotError):
+        store.restore_exhibitions(first, ["ex-3"], backend, data["lock"], data["changes"])
+
+    # Pruning keeps what the remaining snapshots use
+    assert store.prune(keep=1)["snapshots"] == 2
+    assert store.ids() == [third["id"]]
+    target = os.path.join(data["data_dir"], "..", "restored")
+    assert store.restore_files(store.load("latest"), target) == 2
+    with open(os.path.join(target, "cache", "image.webp"), mode='rb') as restored, \
+            open(os.path.join(data["data_dir"], "cache", "image.webp"), mode='rb') as original:
+        assert restored.read() == original.read()
+    conn = sqlite3.connect(os.path.join(target, "registration_queue.db"))
+    assert conn.execute("SELECT id FROM queue").fetchall() == [("reg-1",)]
+    conn.close()
+    assert store.restore_exhibitions(store.load("latest"), None, backend, data["lock"], data["changes"])["restored"] == 3
+
+
+def test_snapshot_waits_for_writes_in_progress(data):
+    """Test a snapshot does not start reading while a writer holds the storage lock"""
+    store = data["store"]
+    snapshots = []
+    with data["lock"].shared():
+        thread = threading.Thread(
+            target=lambda: snapshots.append(store.create(data["backend"], data["lock"], data["data_dir"]))
+        )
+        thread.start()
+        thread.join(0.2)
+        assert thread.is_alive()
+        data["backend"].write(make_exhibition("ex-3"))
+    thread.join(5)
+    assert set(snapshots[0]["exhibitions"]) == {"ex-1", "ex-2", "ex-3"}
+
+
+def test_snapshots_skip_image_derivatives(data, monkeypatch):
+    """Test rendered image derivatives are left out, but the image source records are kept"""
+    from app.config import settings
+
+    cache_dir = os.path.join(data["data_dir"], "image_cache")
+    monkeypatch.setattr(settings, "IMAGE_CACHE_DIR", cache_dir)
+    os.makedirs(os.path.join(cache_dir, "derivatives"))
+    os.makedirs(os.path.join(cache_dir, "sources"))
+    with open(os.path.join(cache_dir, "derivatives", "abc-800.webp"), mode='wb') as f:
+        f.write(os.urandom(1024))
+    with open(os.path.join(cache_dir, "sources", "def"), mode='w') as f:
+        f.write("abc")
+
+    snapshot = data["store"].create(data["backend"], data["lock"], data["data_dir"])
+    assert "image_cache/sources/def" in snapshot["files"]
+    assert not any(path.startswith("image_cache/derivatives") for path in snapshot["files"])
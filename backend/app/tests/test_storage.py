@@ -0,0 +1,341 @@
+import asyncio
+import json
+import os
+from datetime import date
+
+from app.tests.conftest import make_exhibition
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_save_serves_from_catalog_without_disk_reads(storage, monkeypatch):
+    """Saved exhibitions are served from memory"""
+    run(storage.save_exhibition(make_exhibition("ex-1", is_featured=True)))
+    run(storage.save_exhibition(make_exhibition("ex-2", is_archived=True)))
+
+    def fail_read(exhibition_id):
+        raise AssertionError(f"unexpected read of {exhibition_id}")
+
+    monkeypatch.setattr(storage.backend, "read", fail_read)
+
+    assert {ex.id for ex in run(storage.get_all_exhibitions())} == {"ex-1", "ex-2"}
+    assert [ex.id for ex in run(storage.get_all_exhibitions(archived=True))] == ["ex-2"]
+    assert [ex.id for ex in run(storage.get_featured_exhibitions())] == ["ex-1"]
+
+
+def test_external_changes_are_picked_up(storage, tmp_path):
+    """Files added, modified or removed outside the service are detected"""
+    run(storage.save_exhibition(make_exhibition("ex-1")))
+    assert run(storage.get_exhibition("ex-1")).title == "Exhibition ex-1"
+
+    data = json.loads(make_exhibition("ex-2").model_dump_json())
+    (tmp_path / "ex-2.json").write_text(json.dumps(data))
+
+    data = json.loads(make_exhibition("ex-1", title="Renamed show").model_dump_json())
+    (tmp_path / "ex-1.json").write_text(json.dumps(data))
+
+    assert run(storage.get_exhibition("ex-1")).title == "Renamed show"
+    assert run(storage.get_exhibition("ex-2")) is not None
+
+    os.remove(tmp_path / "ex-2.json")
+    assert run(storage.get_exhibition("ex-2")) is None
+
+
+def test_delete_removes_from_catalog(storage):
+    """Deleted exhibitions disappear from every query"""
+    run(storage.save_exhibition(make_exhibition("ex-1")))
+
+    assert run(storage.delete_exhibition("ex-1")) is True
+    assert run(storage.get_exhibition("ex-1")) is None
+    assert run(storage.get_all_exhibitions()) == []
+    assert run(storage.delete_exhibition("ex-1")) is False
+
+
+def test_invalid_files_are_skipped(storage, tmp_path):
+    """A broken file does not prevent the rest of the catalog from loading"""
+    run(storage.save_exhibition(make_exhibition("ex-1")))
+    (tmp_path / "broken.json").write_text("{not json")
+
+    assert [ex.id for ex in run(storage.get_all_exhibitions())] == ["ex-1"]
+
+
+def test_interval_index_matches_linear_scan(monkeypatch):
+    """Overlap, starts-after and ends-before lookups agree with brute force"""
+    import random
+    from datetime import timedelta
+
+    from app.services import exhibition_catalog
+    from app.services.exhibition_catalog import IntervalIndex
+
+    # Small blocks, so that blocks are split and emptied
+    monkeypatch.setattr(exhibition_catalog, "BLOCK_SIZE", 4)
+    rng = random.Random(7)
+    base = date(2020, 1, 1)
+    index = IntervalIndex()
+    intervals = {}
+    for i in range(300):
+        start = base + timedelta(days=rng.randrange(1000))
+        end = start + timedelta(days=rng.randrange(120))
+        intervals[f"k{i}"] = (start, end)
+        index.add(f"k{i}", start, end)
+    for i in range(0, 300, 3):
+        del intervals[f"k{i}"]
+        index.remove(f"k{i}")
+
+    for _ in range(50):
+        low = base + timedelta(days=rng.randrange(1100))
+        high = low + timedelta(days=rng.randrange(60))
+        expected = {k for k, (s, e) in intervals.items() if s <= high and e >= low}
+        assert set(index.overlapping(low, high)) == expected
+        assert set(index.starting_after(low)) == {k for k, (s, _) in intervals.items() if s > low}
+        assert set(index.ending_before(low)) == {k for k, (_, e) in intervals.items() if e < low}
+        order = sorted((s, k) for k, (s, _) in intervals.items())
+        position = order[rng.randrange(len(order))]
+        assert index.ordered(position, 10) == [k for _, k in order[order.index(position) + 1:][:10]]
+    assert index.ordered() == [k for _, k in sorted((s, k) for k, (s, _) in intervals.items())]
+
+
+def test_query_uses_indexes(storage):
+    """Catalog queries combine flag, location, artist and date filters"""
+    run(storage.save_exhibition(make_exhibition(
+        "ex-1", location="Main Gallery", artists=[{"name": "Ona Vilk"}],
+        start_date="2023-01-01", end_date="2023-02-01", is_archived=True,
+    )))
+    run(storage.save_exhibition(make_exhibition(
+        "ex-2", location="Project Space", artists=[{"name": "Ona Vilk"}, {"name": "Jonas P"}],
+        start_date="2023-03-01", end_date="2023-04-01", is_featured=True,
+    )))
+    run(storage.save_exhibition(make_exhibition(
+        "ex-3", location="main gallery", start_date="2099-01-01", end_date="2099-02-01",
+    )))
+
+    def ids(**filters):
+        return [ex.id for ex in run(storage.query_exhibitions(**filters))]
+
+    assert ids() == ["ex-1", "ex-2", "ex-3"]
+    assert ids(location="MAIN gallery") == ["ex-1", "ex-3"]
+    assert ids(artist="ona vilk") == ["ex-1", "ex-2"]
+    assert ids(artist="ona vilk", archived=False) == ["ex-2"]
+    assert ids(featured=True) == ["ex-2"]
+    assert ids(period="upcoming") == ["ex-3"]
+    assert ids(period="past") == ["ex-1", "ex-2"]
+    assert ids(date_from=date(2023, 1, 15), date_to=date(2023, 3, 1)) == ["ex-1", "ex-2"]
+
+    # Flag-only filters page from a cursor
+    assert ids(archived=False) == ["ex-2", "ex-3"]
+    assert ids(archived=False, after=(date(2023, 3, 1), "ex-2")) == ["ex-3"]
+    assert ids(archived=False, featured=False, limit=1) == ["ex-3"]
+
+    # Updating an exhibition moves it between index buckets
+    run(storage.save_exhibition(make_exhibition("ex-2", location="Courtyard")))
+    assert ids(artist="ona vilk") == ["ex-1"]
+    assert ids(location="courtyard") == ["ex-2"]
+    assert ids(featured=True) == []
+
+
+def test_sqlite_backend_round_trip(tmp_path):
+    """The SQLite backend serves the catalog and sees other connections' writes"""
+    from app.services.json_storage import JSONStorageService
+    from app.services.storage_backends import SQLiteBackend
+
+    path = str(tmp_path / "exhibitions.db")
+    storage = JSONStorageService(backend=SQLiteBackend(path), refresh_interval=0)
+    run(storage.save_exhibition(make_exhibition("ex-1", is_featured=True)))
+    run(storage.save_exhibition(make_exhibition("ex-2", is_archived=True)))
+    assert [ex.id for ex in run(storage.get_featured_exhibitions())] == ["ex-1"]
+
+    other = SQLiteBackend(path)
+    other.write(make_exhibition("ex-1", title="Renamed show"))
+    other.delete("ex-2")
+    assert run(storage.get_exhibition("ex-1")).title == "Renamed show"
+    assert run(storage.get_exhibition("ex-2")) is None
+
+    assert run(storage.delete_exhibition("ex-1")) is True
+    assert other.scan() == {}
+    other.close()
+    storage.backend.close()
+
+
+def test_migration_copies_and_verifies(tmp_path):
+    """Migrating JSON files to SQLite copies valid exhibitions and reports the rest"""
+    from app.services.storage_backends import JSONDirectoryBackend, SQLiteBackend
+    from app.services.storage_migration import main, migrate, verify
+
+    source = JSONDirectoryBackend(str(tmp_path / "exhibitions"))
+    source.write_many([make_exhibition(f"ex-{i}") for i in range(5)])
+    target = SQLiteBackend(str(tmp_path / "exhibitions.db"))
+
+    result = migrate(source, target, batch_size=2)
+    assert sorted(result["copied"]) == [f"ex-{i}" for i in range(5)]
+    assert verify(source, target) == {"missing": [], "extra": [], "different": [], "unreadable": []}
+
+    target.write(make_exhibition("ex-0", title="Changed"))
+    (tmp_path / "exhibitions" / "broken.json").write_text("{not json")
+    report = verify(source, target)
+    assert report["different"] == ["ex-0"]
+    assert report["missing"] == ["broken"]
+    target.close()
+
+    args = ["--from", "json", "--to", "sqlite",
+            "--source-path", str(tmp_path / "exhibitions"), "--target-path", str(tmp_path / "exhibitions.db")]
+    # The broken file cannot be migrated
+    assert main(args) == 1
+    (tmp_path / "exhibitions" / "broken.json").unlink()
+    assert main(args) == 0
+    assert main(args + ["--verify-only"]) == 0
+
+
+def test_saves_are_versioned_compare_and_swap(storage):
+    """Concurrent conditional saves of the same version: exactly one wins"""
+    from fastapi import HTTPException
+
+    first = run(storage.save_exhibition(make_exhibition("ex-1")))
+    assert first.version == 1
+    read_version = first.version
+
+    async def edit(title):
+        try:
+            await storage.save_exhibition(
+                make_exhibition("ex-1", title=title),
+                lambda current: current.exhibition.version == read_version,
+            )
+        except HTTPException as e:
+            return e.status_code
+        return 200
+
+    async def both():
+        return await asyncio.gather(edit("A"), edit("B"))
+
+    assert sorted(run(both())) == [200, 412]
+    assert run(storage.get_exhibition("ex-1")).version == 2
+
+
+def test_interrupted_write_keeps_previous_file(storage, tmp_path, monkeypatch):
+    """A failed write leaves the old file and no temporary files behind"""
+    from fastapi import HTTPException
+    import pytest
+
+    run(storage.save_exhibition(make_exhibition("ex-1")))
+
+    def crash(fd):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(os, "fsync", crash)
+    with pytest.raises(HTTPException):
+        run(storage.save_exhibition(make_exhibition("ex-1", title="Lost")))
+
+    assert os.listdir(tmp_path) == ["ex-1.json"]
+    assert json.loads((tmp_path / "ex-1.json").read_text())["title"] == "Exhibition ex-1"
+
+
+def test_search_ranks_and_updates_incrementally(storage):
+    """Search matches prefixes across fields and follows saves and deletes"""
+    from app.models.exhibition import Artist, Artwork
+
+    run(storage.save_exhibition(make_exhibition(
+        "ex-1", title="Garažas Nights", artists=[Artist(name="Ona Kalnė")],
+    )))
+    run(storage.save_exhibition(make_exhibition(
+        "ex-2", title="Quiet rooms", description="Works made in a garage",
+        artworks=[Artwork(title="Untitled", medium="Oil on canvas")],
+    )))
+
+    assert [e.exhibition.id for e in run(storage.search_entries("garazas"))] == ["ex-1"]
+    # Prefix matches rank below exact ones
+    assert [e.exhibition.id for e in run(storage.search_entries("gara"))] == ["ex-1", "ex-2"]
+    assert [e.exhibition.id for e in run(storage.search_entries("kalne nig"))] == ["ex-1"]
+    assert [e.exhibition.id for e in run(storage.search_entries("oil canvas"))] == ["ex-2"]
+    assert run(storage.search_entries("oil garazas")) == []
+
+    run(storage.save_exhibition(make_exhibition("ex-1", title="Renamed")))
+    assert run(storage.search_entries("garazas")) == []
+    run(storage.delete_exhibition("ex-2"))
+    assert run(storage.search_entries("canvas")) == []
+
+
+
+def test_load_reads_in_concurrent_batches(storage, tmp_path, monkeypatch):
+    """A cold load reads compact and indented files in batches and skips broken ones"""
+    from app.config import settings
+    from app.services.search_index import tokenize
+    from app.services.storage_backends import JSONDirectoryBackend, SQLiteBackend
+
+    JSONDirectoryBackend(str(tmp_path)).write_many(make_exhibition(f"ex-{i}") for i in range(5))
+    compact = JSONDirectoryBackend(str(tmp_path), indent=0)
+    compact.write_many(make_exhibition(f"ex-{i}") for i in range(5, 10))
+    assert b"\n" not in (tmp_path / "ex-5.json").read_bytes()
+    assert b"\n" in (tmp_path / "ex-0.json").read_bytes()
+    (tmp_path / "broken.json").write_text("{not json")
+
+    results = compact.read_many(["ex-0", "ex-5", "broken", "missing"])
+    assert results["ex-0"] == make_exhibition("ex-0")
+    assert results["ex-5"] == make_exhibition("ex-5")
+    assert isinstance(results["broken"], ValueError)
+    assert isinstance(results["missing"], FileNotFoundError)
+
+    monkeypatch.setattr(settings, "STORAGE_READ_BATCH", 3)
+    monkeypatch.setattr(settings, "STORAGE_READ_CONCURRENCY", 2)
+    run(storage.load())
+    assert len(storage.catalog) == 10
+    assert run(storage.get_exhibition("ex-7")) == make_exhibition("ex-7")
+
+    sqlite = SQLiteBackend(str(tmp_path / "exhibitions.db"))
+    sqlite.write_many(make_exhibition(f"ex-{i}") for i in range(3))
+    results = sqlite.read_many(["ex-2", "missing"])
+    assert results["ex-2"] == make_exhibition("ex-2")
+    assert isinstance(results["missing"], KeyError)
+    sqlite.close()
+
+    # ASCII text is tokenized without the expression, to the same terms
+    assert tokenize("Hello, World! a_b-c 42\tx") == ["hello", "world", "a_b", "c", "42", "x"]
+    assert tokenize("Garažas, a_b-c") == ["garazas", "a_b", "c"]
+
+
+def test_refresh_does_not_overwrite_newer_saves(storage, monkeypatch):
+    """A batch read before a save does not replace the saved exhibition in the catalog"""
+    import threading
+
+    run(storage.load())
+    storage.backend.write(make_exhibition("ex-1", title="Old show"))
+    reading, release = threading.Event(), threading.Event()
+    read_many = storage.backend.read_many
+
+    def slow_first_read(exhibition_ids):
+        if not reading.is_set():
+            results = read_many(exhibition_ids)
+            reading.set()
+            release.wait(5)
+            return results
+        return read_many(exhibition_ids)
+
+    monkeypatch.setattr(storage.backend, "read_many", slow_first_read)
+
+    async def scenario():
+        refresh = asyncio.create_task(storage.refresh(force=True))
+        await asyncio.get_running_loop().run_in_executor(None, reading.wait, 5)
+        await storage.save_exhibition(make_exhibition("ex-1", title="Renamed show"))
+        release.set()
+        await refresh
+
+    run(scenario())
+    assert storage.catalog.get("ex-1").title == "Renamed show"
+
+
+def test_slow_writes_are_awaited(storage, monkeypatch):
+    """A write slower than the storage timeout is reported as saved, not failed"""
+    import time
+    from app.services.executor import STORAGE, blocking_io
+
+    run(storage.load())
+    monkeypatch.setitem(blocking_io.timeouts, STORAGE, 0.01)
+    write_many = storage.backend.write_many
+
+    def slow_write_many(exhibitions):
+        time.sleep(0.1)
+        return write_many(exhibitions)
+
+    monkeypatch.setattr(storage.backend, "write_many", slow_write_many)
+    assert run(storage.save_exhibition(make_exhibition("ex-1"))).version == 1
+    assert run(storage.save_exhibition(make_exhibition("ex-1"))).version == 2
@@ -0,0 +1,95 @@
+"""
+Time to load every exhibition into an empty catalog, before and after
+batched, concurrent reads and the orjson codec.
+
+"before" replays the original load: one storage thread call per file,
+awaited in turn, each parsing the file with ``json`` and validating it by
+calling the model. "after" is ``JSONStorageService.load``. Both index into
+the current catalog, so the difference is the read path alone. The corpus
+is loaded as generated (indented) and again rewritten compact.
+
+Usage (from backend/):
+    python -m benchmarks.bench_cold_load [--exhibitions 5000] [--runs 3]
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from typing import Awaitable, Callable
+
+from app.models.exhibition import Exhibition
+from app.services.coherence import SharedCounter, SharedLock
+from app.services.exhibition_catalog import ExhibitionCatalog
+from app.services.executor import STORAGE, blocking_io
+from app.services.json_storage import JSONStorageService
+from app.services.storage_backends import JSONDirectoryBackend
+from benchmarks.corpus import generate_corpus
+
+
+async def legacy_load(directory: str) -> int:
+    """Load the catalog the way the storage service did before batched reads"""
+    backend = JSONDirectoryBackend(directory)
+    catalog = ExhibitionCatalog()
+
+    def read(exhibition_id: str) -> Exhibition:
+        with open(os.path.join(directory, f"{exhibition_id}.json"), mode='r') as f:
+            return Exhibition(**json.load(f))
+
+    for exhibition_id, stamp in (await blocking_io.run(STORAGE, backend.scan)).items():
+        catalog.put(exhibition_id, await blocking_io.run(STORAGE, read, exhibition_id), stamp)
+    return len(catalog)
+
+
+async def current_load(directory: str, shared: str) -> int:
+    storage = JSONStorageService(
+        backend=JSONDirectoryBackend(directory),
+        changes=SharedCounter(os.path.join(shared, "catalog.version")),
+        lock=SharedLock(os.path.join(shared, "storage.lock")),
+    )
+    await storage.load()
+    return len(storage.catalog)
+
+
+async def best_of(runs: int, load: Callable[[], Awaitable[int]], count: int) -> float:
+    """Fastest of several loads, in seconds"""
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        loaded = await load()
+        timings.append(time.perf_counter() - started)
+        assert loaded == count, f"loaded {loaded} of {count} exhibitions"
+    return min(timings)
+
+
+def rewrite_compact(directory: str) -> None:
+    backend = JSONDirectoryBackend(directory, indent=0)
+    backend.write_many(backend.read(exhibition_id) for exhibition_id in backend.scan())
+
+
+def corpus_size(directory: str) -> int:
+    return sum(entry.stat().st_size for entry in os.scandir(directory) if entry.name.endswith('.json'))
+
+
+async def main(count: int, runs: int) -> None:
+    with tempfile.TemporaryDirectory() as directory, tempfile.TemporaryDirectory() as shared:
+        generate_corpus(directory, count)
+
+        print(f"{count} exhibitions, best of {runs} loads")
+        print(f"{'files':<10}{'size':>10}{'before s':>11}{'after s':>10}{'speedup':>10}")
+        for label in ("indented", "compact"):
+            if label == "compact":
+                rewrite_compact(directory)
+            before = await best_of(runs, lambda: legacy_load(directory), count)
+            after = await best_of(runs, lambda: current_load(directory, shared), count)
+            size = corpus_size(directory) / 1024 / 1024
+            print(f"{label:<10}{size:>7.1f} MiB{before:>11.2f}{after:>10.2f}{before / after:>9.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--exhibitions", type=int, default=5000)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+    asyncio.run(main(args.exhibitions, args.runs))
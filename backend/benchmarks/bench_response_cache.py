@@ -0,0 +1,96 @@
+"""
+Requests/sec for the public exhibition list endpoints, before and after
+the pre-serialized response cache.
+
+"before" replays the original request path: list the data directory,
+read and validate every file, and let FastAPI validate and serialize the
+result through ``response_model``. "after" is the current application.
+
+Usage (from backend/):
+    python -m benchmarks.bench_response_cache [--exhibitions 1000] [--requests 200]
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from typing import List, Optional
+
+import aiofiles
+import httpx
+from fastapi import FastAPI
+
+from app.models.exhibition import Exhibition
+from benchmarks.corpus import generate_corpus
+
+
+def legacy_app(directory: str) -> FastAPI:
+    """The list endpoints as they worked before the catalog and response cache"""
+    app = FastAPI()
+
+    async def load_all(archived: Optional[bool] = None) -> List[Exhibition]:
+        exhibitions = []
+        for filename in os.listdir(directory):
+            if filename.endswith('.json'):
+                async with aiofiles.open(os.path.join(directory, filename), mode='r') as f:
+                    exhibition = Exhibition(**json.loads(await f.read()))
+                if archived is not None and exhibition.is_archived != archived:
+                    continue
+                exhibitions.append(exhibition)
+        return exhibitions
+
+    @app.get("/api/exhibitions/", response_model=List[Exhibition])
+    async def get_exhibitions():
+        return await load_all()
+
+    @app.get("/api/exhibitions/featured", response_model=List[Exhibition])
+    async def get_featured():
+        return [ex for ex in await load_all(archived=False) if ex.is_featured]
+
+    @app.get("/api/archive/", response_model=List[Exhibition])
+    async def get_archive():
+        return await load_all(archived=True)
+
+    return app
+
+
+async def measure(app: FastAPI, path: str, requests: int) -> float:
+    """Return requests/sec for sequential in-process GETs of ``path``"""
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        response = await client.get(path)
+        assert response.status_code == 200, response.text
+        started = time.perf_counter()
+        for _ in range(requests):
+            await client.get(path)
+        return requests / (time.perf_counter() - started)
+
+
+async def main(count: int, requests: int) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        generate_corpus(directory, count)
+
+        from app.main import app
+        from app.services.json_storage import json_storage_service
+        from app.services.storage_backends import JSONDirectoryBackend
+
+        json_storage_service.backend = JSONDirectoryBackend(directory)
+        await json_storage_service.load()
+        before_app = legacy_app(directory)
+
+        print(f"{count} exhibitions, {requests} requests per endpoint")
+        print(f"{'endpoint':<28}{'before req/s':>14}{'after req/s':>14}{'speedup':>10}")
+        for path in ("/api/exhibitions/", "/api/exhibitions/featured", "/api/archive/"):
+            # The legacy path is far slower; fewer requests keep the run short
+            before = await measure(before_app, path, max(1, requests // 20))
+            after = await measure(app, path, requests)
+            print(f"{path:<28}{before:>14.1f}{after:>14.1f}{after / before:>9.0f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--exhibitions", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(main(args.exhibitions, args.requests))
@@ -0,0 +1,119 @@
+"""
+Query latency of the full-text exhibition search index.
+
+Builds a catalog of synthetic exhibitions whose text is drawn from a
+Zipf-distributed vocabulary (a few very common words, a long tail of
+rare ones), then times typical queries and incremental index updates.
+
+Usage (from backend/):
+    python -m benchmarks.bench_search [--exhibitions 5000] [--repeat 200]
+"""
+import argparse
+import itertools
+import random
+import statistics
+import time
+from datetime import date, timedelta
+from typing import Callable, List
+
+from app.models.exhibition import Artist, Artwork, Exhibition
+from app.services.exhibition_catalog import ExhibitionCatalog
+
+SYLLABLES = "ga ra zas ar ta li vi nus mo de ka lne so ve ro ne pa sa u ki ma".split()
+
+
+def vocabulary(size: int, rng: random.Random) -> List[str]:
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choices(SYLLABLES, k=rng.randint(2, 4))))
+    return sorted(words)
+
+
+def generate_exhibitions(count: int, seed: int = 1) -> List[Exhibition]:
+    """Build ``count`` exhibitions with realistic word frequencies"""
+    rng = random.Random(seed)
+    words = vocabulary(50000, rng)
+    rng.shuffle(words)
+    cum_weights = list(itertools.accumulate(1 / (rank + 1) ** 1.1 for rank in range(len(words))))
+
+    def text(k: int) -> str:
+        return " ".join(rng.choices(words, cum_weights=cum_weights, k=k))
+
+    exhibitions = []
+    for i in range(count):
+        start = date(2015, 1, 1) + timedelta(days=rng.randrange(4000))
+        exhibitions.append(Exhibition(
+            id=f"ex-{i:05d}",
+            title=text(3).title(),
+            description=text(80),
+            start_date=start,
+            end_date=start + timedelta(days=rng.randrange(10, 90)),
+            location=rng.choice(["Main Gallery", "Project Space", "Courtyard"]),
+            curator=text(2).title(),
+            artists=[Artist(name=text(2).title(), bio=text(30)) for _ in range(3)],
+            artworks=[
+                Artwork(title=text(3), medium=rng.choice(["Oil on canvas", "Video", "Installation"]),
+                        description=text(12))
+                for _ in range(5)
+            ],
+        ))
+    return exhibitions
+
+
+def timed(func: Callable[[], object], repeat: int) -> List[float]:
+    latencies = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def report(label: str, latencies: List[float]) -> None:
+    p50 = statistics.median(latencies) * 1000
+    p99 = statistics.quantiles(latencies, n=100)[98] * 1000
+    print(f"{label:<48}{p50:>10.3f}{p99:>10.3f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--exhibitions", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    exhibitions = generate_exhibitions(args.exhibitions)
+    catalog = ExhibitionCatalog()
+    started = time.perf_counter()
+    for exhibition in exhibitions:
+        catalog.put(exhibition.id, exhibition, (0, 0))
+    print(f"Indexed {len(exhibitions)} exhibitions in {time.perf_counter() - started:.2f}s")
+
+    sample = exhibitions[len(exhibitions) // 2]
+    title_words = sorted(sample.title.split(), key=lambda word: len(catalog.search(word)))
+    rare, common = title_words[0], title_words[-1]
+    artist = sample.artists[0].name
+    queries = {
+        f"rare title word ({rare})": rare,
+        f"common title word ({common})": common,
+        f"artist name ({artist})": artist,
+        f"prefix ({common[:3]})": common[:3],
+        f"title word + prefix ({common} {artist[:3]})": f"{common} {artist[:3]}",
+        "medium phrase (oil on canvas)": "oil on canvas",
+        "no match": "zzzzqqq",
+    }
+
+    print(f"\n{'query (limit 20)':<48}{'p50 ms':>10}{'p99 ms':>10}")
+    for label, query in queries.items():
+        hits = len(catalog.search(query))
+        report(f"{label} [{hits} hits]", timed(lambda: catalog.search(query, limit=20), args.repeat))
+
+    updates = iter(range(args.repeat))
+    report(
+        "update one exhibition (re-index)",
+        timed(lambda: catalog.put(sample.id, sample.model_copy(update={"title": f"Renamed {next(updates)}"}), (0, 0)),
+              args.repeat),
+    )
+
+
+if __name__ == "__main__":
+    main()
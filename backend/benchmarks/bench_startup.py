@@ -0,0 +1,111 @@
+"""
+Startup time of the API server: from launching the process to the first
+successful responses.
+
+Each run starts uvicorn in a fresh process against a temporary data
+directory with synthetic exhibitions, and polls until each endpoint first
+answers 200:
+
+- ``/api/health``: the server accepts connections
+- ``/api/ready``: exhibitions are loaded
+- ``/api/exhibitions/``: the first real response
+
+Google Sheets is configured with credentials that do not exist, so the runs
+also show that an unreachable dependency does not delay startup.
+
+Usage (from backend/):
+    python -m benchmarks.bench_startup [--exhibitions 1000] [--runs 5] [--json]
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+import httpx
+
+from benchmarks.corpus import generate_corpus
+
+ENDPOINTS = ("/api/health", "/api/ready", "/api/exhibitions/")
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def measure_once(data_dir: str, timeout: float) -> Dict[str, float]:
+    """Seconds from process launch to the first 200 of each endpoint"""
+    port = free_port()
+    env = {
+        **os.environ,
+        "DATA_DIR": data_dir,
+        "REGISTRATION_BACKEND": "google",
+        "GOOGLE_CREDENTIALS_FILE": os.path.join(data_dir, "missing-credentials.json"),
+        "METRICS_EXPORT_INTERVAL": "0",
+    }
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    timings: Dict[str, float] = {}
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=timeout) as client:
+            pending = list(ENDPOINTS)
+            while pending:
+                if time.perf_counter() - started > timeout:
+                    raise TimeoutError(f"No 200 from {', '.join(pending)} after {timeout}s")
+                try:
+                    if client.get(pending[0]).status_code == 200:
+                        timings[pending.pop(0)] = time.perf_counter() - started
+                        continue
+                except httpx.TransportError:
+                    pass
+                time.sleep(0.005)
+    finally:
+        server.terminate()
+        server.wait()
+    return timings
+
+
+def main(count: int, runs: int, timeout: float, as_json: bool) -> None:
+    results: Dict[str, List[float]] = {endpoint: [] for endpoint in ENDPOINTS}
+    with tempfile.TemporaryDirectory() as data_dir:
+        exhibitions_dir = os.path.join(data_dir, "exhibitions")
+        os.makedirs(exhibitions_dir)
+        generate_corpus(exhibitions_dir, count)
+        for _ in range(runs):
+            for endpoint, seconds in measure_once(data_dir, timeout).items():
+                results[endpoint].append(seconds)
+
+    summary = {
+        endpoint: {"min": min(times), "median": statistics.median(times), "max": max(times)}
+        for endpoint, times in results.items()
+    }
+    if as_json:
+        print(json.dumps({"exhibitions": count, "runs": runs, "seconds": summary}))
+        return
+
+    print(f"{count} exhibitions, {runs} runs, seconds from launch to first 200")
+    print(f"{'endpoint':<22}{'min':>8}{'median':>8}{'max':>8}")
+    for endpoint, stats in summary.items():
+        print(f"{endpoint:<22}{stats['min']:>8.2f}{stats['median']:>8.2f}{stats['max']:>8.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--exhibitions", type=int, default=1000)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--json", action="store_true", help="print one JSON line, for tracking over time")
+    args = parser.parse_args()
+    main(args.exhibitions, args.runs, args.timeout, args.json)
@@ -0,0 +1,101 @@
+"""
+Synthetic exhibition corpora for benchmarks.
+
+Writes ``--exhibitions`` JSON files in the storage layout of
+``JSONDirectoryBackend``, by default into EXHIBITIONS_DIR. The same
+arguments and ``--seed`` always produce the same files, so runs on
+different machines or releases measure the same data.
+
+Usage (from backend/):
+    python -m benchmarks.corpus [--exhibitions 1000] [--artists 3] [--artworks 5]
+        [--description-words 120] [--no-images] [--directory PATH] [--force]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+from datetime import date, timedelta
+from typing import List, Optional
+
+WORDS = "light form space memory archive signal noise garden concrete river".split()
+LOCATIONS = ["Main Gallery", "Project Space", "Courtyard"]
+
+
+def generate_corpus(
+    directory: str,
+    count: int,
+    seed: int = 1,
+    artists: int = 3,
+    artworks: int = 5,
+    description_words: int = 120,
+    images: bool = True,
+) -> None:
+    """
+    Write ``count`` synthetic exhibitions into ``directory``.
+
+    Artist biographies are half and artwork descriptions a third as long as
+    exhibition descriptions. Without ``images`` no image URLs are set, so
+    saving the exhibitions never fetches anything.
+    """
+    rng = random.Random(seed)
+    for i in range(count):
+        start = date(2015, 1, 1) + timedelta(days=rng.randrange(4000))
+        exhibition = {
+            "id": f"ex-{i:05d}",
+            "title": " ".join(rng.choices(WORDS, k=3)).title(),
+            "description": " ".join(rng.choices(WORDS, k=description_words)),
+            "start_date": start.isoformat(),
+            "end_date": (start + timedelta(days=rng.randrange(10, 90))).isoformat(),
+            "location": rng.choice(LOCATIONS),
+            "curator": "Curator Name",
+            "artists": [
+                {"name": f"Artist {rng.randrange(500)}",
+                 "bio": " ".join(rng.choices(WORDS, k=description_words // 2)),
+                 "website": "https://example.com/artist"}
+                for _ in range(artists)
+            ],
+            "artworks": [
+                {"title": f"Work {j}", "year": 2000 + j, "medium": "Mixed media",
+                 "description": " ".join(rng.choices(WORDS, k=description_words // 3)),
+                 **({"image_url": f"https://example.com/images/{i}/{j}.jpg"} if images else {})}
+                for j in range(artworks)
+            ],
+            **({"featured_image_url": f"https://example.com/images/{i}/cover.jpg"} if images else {}),
+            "is_featured": rng.random() < 0.05,
+            "is_archived": start < date(2023, 1, 1),
+        }
+        with open(os.path.join(directory, f"{exhibition['id']}.json"), "w") as f:
+            json.dump(exhibition, f, indent=2)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--exhibitions", type=int, default=1000)
+    parser.add_argument("--artists", type=int, default=3, help="artists per exhibition")
+    parser.add_argument("--artworks", type=int, default=5, help="artworks per exhibition")
+    parser.add_argument("--description-words", type=int, default=120, help="words per exhibition description")
+    parser.add_argument("--no-images", action="store_true", help="leave out image URLs")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--directory", default=None, help="defaults to EXHIBITIONS_DIR")
+    parser.add_argument("--force", action="store_true", help="write into a directory that already has exhibitions")
+    args = parser.parse_args(argv)
+
+    if args.directory is None:
+        from app.config import settings
+        args.directory = settings.EXHIBITIONS_DIR
+    os.makedirs(args.directory, exist_ok=True)
+    if not args.force and any(name.endswith(".json") for name in os.listdir(args.directory)):
+        print(f"{args.directory} already has exhibitions; pass --force to add to them", file=sys.stderr)
+        return 1
+
+    generate_corpus(
+        args.directory, args.exhibitions, args.seed,
+        args.artists, args.artworks, args.description_words, images=not args.no_images,
+    )
+    print(f"Wrote {args.exhibitions} exhibitions to {args.directory}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
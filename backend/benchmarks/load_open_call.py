@@ -0,0 +1,172 @@
+"""
+Load test for open-call registrations against a fake Google Sheets backend.
+
+Submits registrations to ``POST /api/open-call/register`` at a fixed rate
+(open loop: requests are sent on schedule whether or not earlier ones have
+finished) and reports request latency percentiles and loss. By default
+the application runs in-process with the fake registration backend, so
+no Google API is touched; the fake can be given latency, errors and a
+quota to rehearse an open call. After the run the queue is drained and
+registrations that never reached the sheet are counted as lost.
+
+With ``--url`` the requests go to a running server instead; only HTTP
+failures can be counted then. All requests come from one address, so
+start that server with REGISTRATION_RATE_LIMIT=0.
+
+Usage (from backend/):
+    python -m benchmarks.load_open_call --rps 50 --duration 20 \\
+        --latency 0.8 --jitter 0.4 --error-rate 0.02 --quota 60
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from typing import List, Optional
+
+
+def configure(data_dir: str, args: argparse.Namespace) -> None:
+    """Point the application at temporary data and the fake backend"""
+    os.environ.update({
+        "DATA_DIR": data_dir,
+        "REGISTRATION_QUEUE_PATH": os.path.join(data_dir, "registration_queue.db"),
+        "REGISTRATION_STORE_PATH": os.path.join(data_dir, "registrations.db"),
+        "REGISTRATION_BACKEND": "fake",
+        "FAKE_SHEETS_LATENCY": str(args.latency),
+        "FAKE_SHEETS_JITTER": str(args.jitter),
+        "FAKE_SHEETS_ERROR_RATE": str(args.error_rate),
+        "FAKE_SHEETS_QUOTA_PER_MINUTE": str(args.quota),
+        # Every request comes from this one client
+        "REGISTRATION_RATE_LIMIT": "0",
+        # Short retries so the drain finishes within the run
+        "REGISTRATION_RETRY_BASE_DELAY": "0.5",
+        "REGISTRATION_RETRY_MAX_DELAY": "5",
+        "SHEETS_QUOTA_BACKOFF_BASE": "1",
+        "SHEETS_QUOTA_BACKOFF_MAX": "10",
+    })
+
+
+def registration(i: int) -> dict:
+    return {
+        "name": f"Load Test Artist {i}",
+        "email": f"artist{i}@example.com",
+        "website": "https://example.com",
+        "artist_statement": "A statement written for the load test, comfortably over fifty characters.",
+        "work_sample_urls": [f"https://example.com/work/{i}"],
+    }
+
+
+async def drive(client, rps: float, duration: float, timeout: float) -> tuple:
+    """Send registrations at ``rps`` for ``duration`` seconds"""
+    latencies: List[float] = []
+    failures = 0
+
+    async def submit(i: int) -> None:
+        nonlocal failures
+        started = time.perf_counter()
+        try:
+            response = await client.post(
+                "/api/open-call/register", json=registration(i), timeout=timeout
+            )
+            ok = response.status_code == 201
+        except Exception:
+            ok = False
+        if ok:
+            latencies.append(time.perf_counter() - started)
+        else:
+            failures += 1
+
+    tasks = []
+    total = int(rps * duration)
+    started = time.perf_counter()
+    for i in range(total):
+        delay = started + i / rps - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(submit(i)))
+    await asyncio.gather(*tasks)
+    return total, latencies, failures
+
+
+def percentile(values: List[float], q: int) -> Optional[float]:
+    if len(values) < 2:
+        return values[0] if values else None
+    return statistics.quantiles(values, n=100)[q - 1]
+
+
+async def wait_for_delivery(worksheet, expected: int, timeout: float) -> float:
+    """Wait until ``expected`` rows reached the fake sheet, returning the wait"""
+    started = time.perf_counter()
+    while worksheet.row_count() < expected and time.perf_counter() - started < timeout:
+        await asyncio.sleep(0.1)
+    return time.perf_counter() - started
+
+
+async def run(args: argparse.Namespace) -> None:
+    import httpx
+
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url) as client:
+            total, latencies, failures = await drive(client, args.rps, args.duration, args.timeout)
+        report(args, total, latencies, failures)
+        return
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        configure(data_dir, args)
+        from app.main import app
+        from app.services.executor import blocking_io
+        from app.services.google_sheets import google_sheets_service
+        from app.services.registration_queue import registration_worker
+        from app.services.sheets_writer import sheets_batch_writer
+
+        registration_worker.start()
+        try:
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://load-test") as client:
+                total, latencies, failures = await drive(client, args.rps, args.duration, args.timeout)
+            accepted = total - failures
+            drain = await wait_for_delivery(google_sheets_service.worksheet, accepted, args.drain_timeout)
+        finally:
+            await registration_worker.stop()
+
+        worksheet = google_sheets_service.worksheet
+        report(args, total, latencies, failures)
+        delivered = worksheet.row_count()
+        print(f"delivered:      {delivered}/{accepted} to the fake sheet in {drain:.1f}s after the run")
+        print(f"undelivered:    {max(accepted - delivered, 0)}")
+        print(f"sheet requests: {worksheet.requests} "
+              f"({worksheet.quota_errors} over quota, {worksheet.errors} failed)")
+        stats = sheets_batch_writer.stats()
+        print(f"flushes:        {stats['flushes']} "
+              f"(avg {stats['avg_flush_latency_seconds'] or 0:.3f}s, max {stats['max_flush_latency_seconds']:.3f}s)")
+        blocking_io.shutdown()
+
+
+def report(args: argparse.Namespace, total: int, latencies: List[float], failures: int) -> None:
+    print(f"target:         {args.rps:g} req/s for {args.duration:g}s ({total} requests)")
+    for q in (50, 95, 99):
+        value = percentile(latencies, q)
+        print(f"p{q}:            " + (f"{value * 1000:.1f} ms" if value is not None else "n/a"))
+    print(f"lost:           {failures}/{total} ({failures / total:.1%}) requests failed or timed out"
+          if total else "lost:           n/a")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rps", type=float, default=20, help="requests per second")
+    parser.add_argument("--duration", type=float, default=10, help="seconds to send requests for")
+    parser.add_argument("--timeout", type=float, default=10, help="per-request timeout in seconds")
+    parser.add_argument("--url", help="target a running server instead of the in-process app")
+    parser.add_argument("--latency", type=float, default=0.5, help="fake Sheets latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.25, help="extra random fake Sheets latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of failing Sheets calls")
+    parser.add_argument("--quota", type=int, default=60, help="Sheets calls allowed per minute (0 = unlimited)")
+    parser.add_argument("--drain-timeout", type=float, default=60,
+                        help="seconds to wait for queued registrations to reach the sheet")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
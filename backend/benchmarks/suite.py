@@ -0,0 +1,452 @@
+"""
+Benchmark suite: throughput, latency and memory of every API route.
+
+``run`` writes a synthetic corpus (see ``benchmarks.corpus``) to a
+temporary data directory and sends ``--requests`` requests to each public
+and admin route, ``--concurrency`` at a time. The application runs
+in-process by default; with ``--http`` it is started as
+``python -m app.server`` and driven over real HTTP. Throughput, p50/p99
+latency, errors and peak RSS per route are written to a JSON results file
+(by default under data/benchmarks/).
+
+``compare`` reads two results files and lists the routes whose
+throughput dropped, or whose latency or peak RSS grew, by more than
+``--threshold``; it exits with status 1 if there are any.
+
+Routes run in a fixed order: reads first, then writes, which clean up
+after themselves except for the exhibitions imported. The image routes
+are left out: they fetch source images over the network, which would
+measure the network rather than the application. Profiles are kept per
+worker process, so with several workers some profile lookups are counted
+as errors. In-process, peak RSS is that of the benchmark process, client
+included; over HTTP it is the sum of the server's processes.
+
+Usage (from backend/):
+    python -m benchmarks.suite run [--exhibitions 1000] [--requests 200] [--concurrency 1]
+        [--http] [--workers 1] [--output PATH]
+    python -m benchmarks.suite compare BASELINE.json RESULTS.json [--threshold 0.1]
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Union
+
+import httpx
+
+from benchmarks.corpus import WORDS, generate_corpus
+from benchmarks.load_open_call import percentile, registration
+
+# Metrics compared by ``compare``: True where higher is better
+METRICS = {
+    "throughput": True,
+    "p50_ms": False,
+    "p99_ms": False,
+    "peak_rss_bytes": False,
+}
+
+
+class Route:
+    """
+    One benchmarked request.
+
+    ``url`` and any keyword argument for ``httpx.AsyncClient.request`` may
+    be a function of the request's index, for requests that must differ,
+    such as creating a new exhibition each time. ``share`` scales the
+    number of requests, for routes that are slow by design.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        method: str,
+        url: Union[str, Callable[[int], str]],
+        expect: int = 200,
+        share: float = 1.0,
+        **kwargs: Any,
+    ):
+        self.name = name
+        self.method = method
+        self.url = url
+        self.expect = expect
+        self.share = share
+        self.kwargs = kwargs
+
+    def request(self, i: int) -> Dict[str, Any]:
+        kwargs = {key: value(i) if callable(value) else value for key, value in self.kwargs.items()}
+        kwargs["url"] = self.url(i) if callable(self.url) else self.url
+        return kwargs
+
+
+def bench_exhibition(exhibition_id: str, title: str = "Benchmark exhibition") -> Dict[str, Any]:
+    return {
+        "id": exhibition_id,
+        "title": title,
+        "description": " ".join(WORDS * 12),
+        "start_date": "2024-05-01",
+        "end_date": "2024-06-30",
+        "location": "Project Space",
+        "artists": [{"name": "Benchmark Artist"}],
+        "artworks": [{"title": "Benchmark Work", "year": 2024}],
+    }
+
+
+def routes(context: Dict[str, Any]) -> List[Route]:
+    """Every benchmarked route, in the order they run"""
+    ids, archived = context["ids"], context["archived_ids"]
+    admin = {"Authorization": f"Bearer {context['token']}"}
+    import_body = "\n".join(json.dumps(bench_exhibition(f"bench-import-{j:02d}")) for j in range(20)) + "\n"
+
+    def fresh_token(i: int) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {context['create_token']()}"}
+
+    return [
+        Route("GET /api/health", "GET", "/api/health"),
+        Route("GET /api/ready", "GET", "/api/ready"),
+        Route("GET /api/metrics", "GET", "/api/metrics"),
+        Route("GET /api/exhibitions/", "GET", "/api/exhibitions/"),
+        Route("GET /api/exhibitions/?limit=20&fields=...", "GET",
+              "/api/exhibitions/?limit=20&fields=id,title,start_date,featured_image_url"),
+        Route("GET /api/exhibitions/featured", "GET", "/api/exhibitions/featured"),
+        Route("GET /api/exhibitions/search", "GET", lambda i: f"/api/exhibitions/search?q={WORDS[i % len(WORDS)]}"),
+        Route("GET /api/exhibitions/{exhibition_id}", "GET", lambda i: f"/api/exhibitions/{ids[i % len(ids)]}"),
+        Route("GET /api/archive/", "GET", "/api/archive/"),
+        Route("GET /api/archive/{exhibition_id}", "GET", lambda i: f"/api/archive/{archived[i % len(archived)]}"),
+        Route("POST /api/open-call/register", "POST", "/api/open-call/register", expect=201,
+              json=lambda i: registration(i + 1)),
+        Route("GET /api/open-call/status/{registration_id}", "GET",
+              f"/api/open-call/status/{context['registration_id']}"),
+        # Password checks take about 50 ms by design
+        Route("POST /api/admin/token", "POST", "/api/admin/token", share=0.1, data=context["credentials"]),
+        Route("GET /api/admin/registrations", "GET", "/api/admin/registrations?limit=50", headers=admin),
+        Route("GET /api/admin/registrations/queue", "GET", "/api/admin/registrations/queue", headers=admin),
+        Route("GET /api/admin/profiles", "GET", "/api/admin/profiles", headers=admin),
+        Route("GET /api/admin/profiles/{profile_id}", "GET", f"/api/admin/profiles/{context['profile_id']}",
+              headers=admin),
+        Route("GET /api/admin/exhibitions", "GET", "/api/admin/exhibitions", headers=admin),
+        Route("GET /api/admin/exhibitions/export", "GET", "/api/admin/exhibitions/export", headers=admin),
+        Route("POST /api/admin/exhibitions/import", "POST", "/api/admin/exhibitions/import", share=0.1,
+              content=import_body, headers={**admin, "Content-Type": "application/x-ndjson"}),
+        Route("POST /api/admin/exhibitions", "POST", "/api/admin/exhibitions", expect=201,
+              json=lambda i: bench_exhibition(f"bench-{i:05d}"), headers=admin),
+        Route("PUT /api/admin/exhibitions/{exhibition_id}", "PUT", lambda i: f"/api/admin/exhibitions/bench-{i:05d}",
+              json=lambda i: bench_exhibition(f"bench-{i:05d}", "Renamed benchmark exhibition"), headers=admin),
+        Route("DELETE /api/admin/exhibitions/{exhibition_id}", "DELETE",
+              lambda i: f"/api/admin/exhibitions/bench-{i:05d}", expect=204, headers=admin),
+        Route("POST /api/admin/logout", "POST", "/api/admin/logout", expect=204, headers=fresh_token),
+    ]
+
+
+def proc_peak_rss(pid: int) -> int:
+    """Peak RSS in bytes of a process and its children, from /proc"""
+    total = 0
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children", mode='r') as f:
+            children = [int(child) for child in f.read().split()]
+    except OSError:
+        children = []
+    for process in (pid, *children):
+        try:
+            with open(f"/proc/{process}/status", mode='r') as f:
+                for line in f:
+                    if line.startswith("VmHWM:"):
+                        total += int(line.split()[1]) * 1024
+        except OSError:
+            continue
+    return total
+
+
+def self_peak_rss() -> int:
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+async def measure(
+    client: httpx.AsyncClient, route: Route, requests: int, concurrency: int, peak_rss: Callable[[], int]
+) -> Dict[str, Any]:
+    """Send a route's requests, ``concurrency`` at a time, and summarize them"""
+    count = max(1, int(requests * route.share))
+    if route.method == "GET":
+        # Warm up caches, as a production server would be
+        await client.request(route.method, **route.request(0))
+
+    latencies: List[float] = []
+    errors = 0
+    remaining = iter(range(count))
+
+    async def send() -> None:
+        nonlocal errors
+        for i in remaining:
+            started = time.perf_counter()
+            try:
+                response = await client.request(route.method, **route.request(i))
+                ok = response.status_code == route.expect
+            except httpx.HTTPError:
+                ok = False
+            latencies.append(time.perf_counter() - started)
+            if not ok:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(send() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": count,
+        "errors": errors,
+        "throughput": count / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "peak_rss_bytes": peak_rss(),
+    }
+
+
+async def prepare(client: httpx.AsyncClient, create_token: Callable[[], str]) -> Dict[str, Any]:
+    """Log in and collect the ids the routes need"""
+    from app.config import settings
+    from app.services.credentials import DEVELOPMENT_PASSWORD
+
+    credentials = {"username": settings.ADMIN_USERNAME, "password": DEVELOPMENT_PASSWORD}
+    response = await client.post("/api/admin/token", data=credentials)
+    response.raise_for_status()
+    token = response.json()["access_token"]
+
+    response = await client.get("/api/exhibitions/?fields=id,is_archived")
+    response.raise_for_status()
+    exhibitions = response.json()
+
+    response = await client.post("/api/open-call/register", json=registration(0))
+    response.raise_for_status()
+    registration_id = response.json()["id"]
+
+    response = await client.get("/api/admin/profiles", headers={"Authorization": f"Bearer {token}", "X-Profile": "1"})
+    response.raise_for_status()
+
+    return {
+        "credentials": credentials,
+        "token": token,
+        "create_token": create_token,
+        "ids": [ex["id"] for ex in exhibitions],
+        "archived_ids": [ex["id"] for ex in exhibitions if ex["is_archived"]],
+        "registration_id": registration_id,
+        "profile_id": response.headers["X-Profile-Id"],
+    }
+
+
+async def drive(client: httpx.AsyncClient, args: argparse.Namespace, peak_rss: Callable[[], int]) -> Dict[str, Any]:
+    from app.config import settings
+    from app.services.auth import create_access_token
+
+    context = await prepare(client, lambda: create_access_token({"sub": settings.ADMIN_USERNAME}))
+    results = {}
+    for route in routes(context):
+        results[route.name] = stats = await measure(client, route, args.requests, args.concurrency, peak_rss)
+        print(f"{route.name:<52}{stats['throughput']:>10.1f}{stats['p50_ms']:>10.2f}"
+              f"{stats['p99_ms']:>10.2f}{stats['errors']:>8}")
+    return results
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def run_http(args: argparse.Namespace) -> Dict[str, Any]:
+    """Start ``app.server`` in a subprocess and drive it over HTTP"""
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "app.server", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(args.workers)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        limits = httpx.Limits(max_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=60) as client:
+            started = time.perf_counter()
+            while True:
+                try:
+                    if (await client.get("/api/ready")).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                if server.poll() is not None or time.perf_counter() - started > 60:
+                    raise RuntimeError("The server did not become ready")
+                await asyncio.sleep(0.05)
+            return await drive(client, args, lambda: proc_peak_rss(server.pid))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+async def run_in_process(args: argparse.Namespace) -> Dict[str, Any]:
+    from app.main import app
+    from app.services.executor import blocking_io
+    from app.services.json_storage import json_storage_service
+    from app.services.registration_queue import registration_worker
+
+    await json_storage_service.load()
+    registration_worker.start()
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            return await drive(client, args, self_peak_rss)
+    finally:
+        await registration_worker.stop()
+        blocking_io.shutdown()
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args: argparse.Namespace) -> int:
+    started_at = datetime.now(timezone.utc)
+    output = args.output or os.path.join("data", "benchmarks", f"{started_at:%Y%m%dT%H%M%SZ}.json")
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        exhibitions_dir = os.path.join(data_dir, "exhibitions")
+        os.makedirs(exhibitions_dir)
+        generate_corpus(
+            exhibitions_dir, args.exhibitions, args.seed,
+            args.artists, args.artworks, args.description_words, images=False,
+        )
+        # Read by the application on import, here and in the server process
+        os.environ.update({
+            "DATA_DIR": data_dir,
+            "ENVIRONMENT": "development",
+            "REGISTRATION_BACKEND": "fake",
+            "FAKE_SHEETS_LATENCY": "0",
+            "FAKE_SHEETS_JITTER": "0",
+            "FAKE_SHEETS_ERROR_RATE": "0",
+            "FAKE_SHEETS_QUOTA_PER_MINUTE": "0",
+            # Every request comes from this one client
+            "REGISTRATION_RATE_LIMIT": "0",
+            "ADMIN_CREDENTIALS_BACKEND": "env",
+            "ADMIN_PASSWORD_HASH": "",
+        })
+        for name in ("REGISTRATION_QUEUE_PATH", "REGISTRATION_STORE_PATH", "SHARED_STATE_DIR"):
+            os.environ.pop(name, None)
+
+        print(f"{args.exhibitions} exhibitions, {args.requests} requests per route, "
+              f"concurrency {args.concurrency}, " + (f"HTTP, {args.workers} worker(s)" if args.http else "in-process"))
+        print(f"{'route':<52}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}")
+        results = asyncio.run(run_http(args) if args.http else run_in_process(args))
+        peak = max(stats["peak_rss_bytes"] for stats in results.values())
+
+    document = {
+        "started_at": started_at.isoformat(),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "mode": "http" if args.http else "in-process",
+        "workers": args.workers if args.http else None,
+        "corpus": {
+            "exhibitions": args.exhibitions,
+            "artists": args.artists,
+            "artworks": args.artworks,
+            "description_words": args.description_words,
+            "seed": args.seed,
+        },
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "peak_rss_bytes": peak,
+        "routes": results,
+    }
+    directory = os.path.dirname(output)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(output, mode='w') as f:
+        json.dump(document, f, indent=2)
+    print(f"peak RSS {peak / 1024 / 1024:.0f} MiB; results written to {output}")
+    return 0
+
+
+def regressions(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float) -> List[str]:
+    """Describe every metric that got worse than the baseline by more than ``threshold``"""
+    found = []
+    for name, stats in current["routes"].items():
+        before = baseline["routes"].get(name)
+        if before is None:
+            continue
+        for metric, higher_is_better in METRICS.items():
+            old, new = before.get(metric), stats.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if (-change if higher_is_better else change) > threshold:
+                found.append(f"{name}: {metric} {old:.6g} -> {new:.6g} ({change:+.0%})")
+        if stats["errors"] > before["errors"]:
+            found.append(f"{name}: errors {before['errors']} -> {stats['errors']}")
+    return found
+
+
+def compare(args: argparse.Namespace) -> int:
+    with open(args.baseline, mode='r') as f:
+        baseline = json.load(f)
+    with open(args.current, mode='r') as f:
+        current = json.load(f)
+
+    for key in ("mode", "workers", "corpus", "requests", "concurrency"):
+        if baseline.get(key) != current.get(key):
+            print(f"Warning: the runs differ in {key}: {baseline.get(key)} vs {current.get(key)}")
+    missing = sorted(set(baseline["routes"]) ^ set(current["routes"]))
+    if missing:
+        print("Routes in only one run: " + ", ".join(missing))
+
+    print(f"{'route':<52}{'req/s':>18}{'p99 ms':>18}")
+    for name, stats in current["routes"].items():
+        before = baseline["routes"].get(name)
+        if before is not None:
+            print(f"{name:<52}{before['throughput']:>8.1f} ->{stats['throughput']:>7.1f}"
+                  f"{before['p99_ms']:>8.2f} ->{stats['p99_ms']:>7.2f}")
+
+    found = regressions(baseline, current, args.threshold)
+    if found:
+        print(f"\n{len(found)} regression(s) beyond {args.threshold:.0%}:")
+        for line in found:
+            print(f"  {line}")
+        return 1
+    print(f"\nNo regressions beyond {args.threshold:.0%}")
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="benchmark every route and write a results file")
+    run_parser.add_argument("--exhibitions", type=int, default=1000)
+    run_parser.add_argument("--artists", type=int, default=3, help="artists per exhibition")
+    run_parser.add_argument("--artworks", type=int, default=5, help="artworks per exhibition")
+    run_parser.add_argument("--description-words", type=int, default=120, help="words per exhibition description")
+    run_parser.add_argument("--seed", type=int, default=1)
+    run_parser.add_argument("--requests", type=int, default=200, help="requests per route")
+    run_parser.add_argument("--concurrency", type=int, default=1, help="requests in flight at a time")
+    run_parser.add_argument("--http", action="store_true", help="run app.server and send real HTTP requests")
+    run_parser.add_argument("--workers", type=int, default=1, help="server worker processes with --http")
+    run_parser.add_argument("--output", default=None, help="defaults to data/benchmarks/<time>.json")
+
+    compare_parser = commands.add_parser("compare", help="flag regressions between two results files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.1, help="relative change tolerated")
+
+    args = parser.parse_args(argv)
+    return run(args) if args.command == "run" else compare(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -43,12 +43,17 @@ BACKUP_PREFIX="garazas_backup_${BACKUP_DATE}"
 
 echo -e "${BLUE}Starting backup process...${NC}"
 
-# Backup backend data volume
+# Snapshot backend data: only what changed since the last snapshot is stored,
+# and the backend keeps serving (writes wait while exhibitions are read)
 if docker volume ls | grep -q "garazas_backend_data"; then
-    echo -e "${BLUE}Backing up backend data volume...${NC}"
-    docker run --rm -v garazas_backend_data:/data -v $BACKUP_PATH:/backup alpine \
-        tar -czf /backup/${BACKUP_PREFIX}_backend_data.tar.gz /data
-    echo -e "${GREEN}Backend data volume backed up to ${BACKUP_PATH}/${BACKUP_PREFIX}_backend_data.tar.gz${NC}"
+    echo -e "${BLUE}Taking a snapshot of backend data...${NC}"
+    SNAPSHOT_STORE="$(cd "$BACKUP_PATH" && pwd)/snapshots"
+    mkdir -p "$SNAPSHOT_STORE"
+    docker-compose -f docker-compose.prod.yaml run --rm --no-deps -v "$SNAPSHOT_STORE:/snapshots" backend \
+        python -m app.services.snapshots create --store /snapshots
+    docker-compose -f docker-compose.prod.yaml run --rm --no-deps -v "$SNAPSHOT_STORE:/snapshots" backend \
+        python -m app.services.snapshots prune --keep ${SNAPSHOT_KEEP:-14} --store /snapshots
+    echo -e "${GREEN}Backend data snapshot stored in ${SNAPSHOT_STORE}${NC}"
 else
     echo -e "${YELLOW}Warning: Backend data volume not found.${NC}"
 fi